@@ -32,6 +32,16 @@ def create_app(config_name='default'):
     app = Flask(__name__)
     app.config.from_object(config[config_name])
 
+    # Size the connection pool for the worker class (in-memory SQLite has one connection)
+    if app.config['SQLALCHEMY_DATABASE_URI'] not in ('sqlite://', 'sqlite:///:memory:'):
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+            'pool_size': app.config['DB_POOL_SIZE'],
+            'max_overflow': app.config['DB_MAX_OVERFLOW'],
+            'pool_timeout': app.config['DB_POOL_TIMEOUT'],
+            'pool_pre_ping': True,
+            **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+        }
+
     # Initialize extensions
     db.init_app(app)
     migrate.init_app(app, db)
@@ -55,6 +65,7 @@ def create_app(config_name='default'):
     from app.blueprints.shops import shops_bp
     from app.blueprints.products import products_bp
     from app.blueprints.templates import templates_bp
+    from app.blueprints.admin import admin_bp
 
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(users_bp, url_prefix='/api/users')
@@ -62,6 +73,7 @@ def create_app(config_name='default'):
     app.register_blueprint(shops_bp, url_prefix='/api/shops')
     app.register_blueprint(products_bp, url_prefix='/api/products')
     app.register_blueprint(templates_bp, url_prefix='/api/templates')
+    app.register_blueprint(admin_bp, url_prefix='/api/admin')
 
     # JWT error handlers
     @jwt.expired_token_loader
@@ -85,4 +97,15 @@ def create_app(config_name='default'):
     with app.app_context():
         db.create_all()
 
+        from app.services.schema import upgrade_schema
+        from app.services.search import init_search
+        from app.services.product_types import init_product_types
+        from app.services.http import init_http
+        from app.services.async_http import init_async_http
+        upgrade_schema(app)
+        init_search(app)
+        init_product_types(app)
+        init_http(app)
+        init_async_http(app)
+
     return app
@@ -0,0 +1,9 @@
+"""
+Admin blueprint.
+Handles administration of shared reference data.
+"""
+from flask import Blueprint
+
+admin_bp = Blueprint('admin', __name__)
+
+from app.blueprints.admin import routes
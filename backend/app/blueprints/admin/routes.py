@@ -0,0 +1,206 @@
+"""
+Admin routes.
+Manages product type mappings used for cross-supplier comparison.
+"""
+from functools import wraps
+from flask import request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from app import db
+from app.blueprints.admin import admin_bp
+from app.models import User, ProductTypeMapping, SupplierType
+from app.services.comparison import invalidate_product_comparisons
+from app.services.product_types import invalidate_product_type_cache, reindex_product_type_keys
+
+
+def admin_required(fn):
+    """Reject requests from users without admin rights."""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        user = User.query.get(get_jwt_identity())
+        if not user or not user.is_admin:
+            return jsonify({'error': 'Admin access required'}), 403
+        return fn(*args, **kwargs)
+    return wrapper
+
+
+@admin_bp.route('/product-types', methods=['GET'])
+@jwt_required()
+@admin_required
+def list_product_types():
+    """
+    List all product type mappings.
+
+    Returns:
+        Mappings in match priority order
+    """
+    mappings = ProductTypeMapping.query.order_by(ProductTypeMapping.id).all()
+
+    return jsonify({
+        'product_types': [m.to_dict() for m in mappings]
+    })
+
+
+@admin_bp.route('/product-types', methods=['POST'])
+@jwt_required()
+@admin_required
+def create_product_type():
+    """
+    Create a product type mapping.
+
+    Request body:
+        key: Normalized key (e.g. "next level 3600")
+        display_name: Display name (default: title-cased key)
+        aliases: Lowercase substrings identifying the type (default: [key])
+        supplier_products: Dict of supplier type -> base product ID
+
+    Returns:
+        Created mapping and number of re-keyed products
+    """
+    data = request.get_json()
+
+    if not data:
+        return jsonify({'error': 'No data provided'}), 400
+
+    key = (data.get('key') or '').strip().lower()
+    if not key:
+        return jsonify({'error': 'Key is required'}), 400
+
+    if ProductTypeMapping.query.filter_by(key=key).first():
+        return jsonify({'error': 'Product type already exists'}), 409
+
+    mapping = ProductTypeMapping(
+        key=key,
+        display_name=data.get('display_name') or key.title(),
+        is_active=data.get('is_active', True)
+    )
+
+    error = _apply_mapping_fields(mapping, data)
+    if error:
+        return jsonify({'error': error}), 400
+
+    db.session.add(mapping)
+    db.session.commit()
+
+    return jsonify({
+        'message': 'Product type created',
+        'product_type': mapping.to_dict(),
+        'products_rekeyed': _rekey_products()
+    }), 201
+
+
+@admin_bp.route('/product-types/<int:mapping_id>', methods=['PUT', 'PATCH'])
+@jwt_required()
+@admin_required
+def update_product_type(mapping_id):
+    """
+    Update a product type mapping.
+
+    Args:
+        mapping_id: Mapping ID
+
+    Request body:
+        display_name, aliases, supplier_products, is_active
+
+    Returns:
+        Updated mapping and number of re-keyed products
+    """
+    mapping = ProductTypeMapping.query.get(mapping_id)
+
+    if not mapping:
+        return jsonify({'error': 'Product type not found'}), 404
+
+    data = request.get_json()
+
+    if not data:
+        return jsonify({'error': 'No data provided'}), 400
+
+    if 'display_name' in data and data['display_name']:
+        mapping.display_name = data['display_name']
+    if 'is_active' in data:
+        mapping.is_active = bool(data['is_active'])
+
+    error = _apply_mapping_fields(mapping, data)
+    if error:
+        db.session.rollback()
+        return jsonify({'error': error}), 400
+
+    db.session.commit()
+
+    return jsonify({
+        'message': 'Product type updated',
+        'product_type': mapping.to_dict(),
+        'products_rekeyed': _rekey_products()
+    })
+
+
+@admin_bp.route('/product-types/<int:mapping_id>', methods=['DELETE'])
+@jwt_required()
+@admin_required
+def delete_product_type(mapping_id):
+    """
+    Delete a product type mapping.
+
+    Args:
+        mapping_id: Mapping ID
+
+    Returns:
+        Success message and number of re-keyed products
+    """
+    mapping = ProductTypeMapping.query.get(mapping_id)
+
+    if not mapping:
+        return jsonify({'error': 'Product type not found'}), 404
+
+    db.session.delete(mapping)
+    db.session.commit()
+
+    return jsonify({
+        'message': 'Product type deleted',
+        'products_rekeyed': _rekey_products()
+    })
+
+
+@admin_bp.route('/product-types/reindex', methods=['POST'])
+@jwt_required()
+@admin_required
+def reindex_product_types():
+    """
+    Recompute product_type_key for all products.
+
+    Returns:
+        Number of re-keyed products
+    """
+    return jsonify({
+        'message': 'Product types reindexed',
+        'products_rekeyed': _rekey_products()
+    })
+
+
+def _apply_mapping_fields(mapping, data):
+    """Validate and set aliases/supplier_products; returns an error message or None."""
+    if 'aliases' in data or mapping.aliases is None:
+        aliases = data.get('aliases') or [mapping.key]
+        if not isinstance(aliases, list) or not all(isinstance(a, str) and a.strip() for a in aliases):
+            return 'Aliases must be a list of non-empty strings'
+        mapping.aliases = [a.strip().lower() for a in aliases]
+
+    if 'supplier_products' in data or mapping.supplier_products is None:
+        supplier_products = data.get('supplier_products') or {}
+        if not isinstance(supplier_products, dict):
+            return 'Supplier products must be an object'
+
+        valid_suppliers = {s.value for s in SupplierType}
+        unknown = set(supplier_products) - valid_suppliers
+        if unknown:
+            return f"Unknown suppliers: {', '.join(sorted(unknown))}"
+
+        mapping.supplier_products = {k: str(v) for k, v in supplier_products.items() if v}
+
+    return None
+
+
+def _rekey_products():
+    """Reload cached mappings and re-key products after a mapping change."""
+    invalidate_product_comparisons()
+    invalidate_product_type_cache()
+    return reindex_product_type_keys()
@@ -544,6 +544,7 @@ def printify_callback():
         token_data = exchange_printify_code(code)
         access_token = token_data.get('access_token')
         refresh_token = token_data.get('refresh_token')
+        expires_in = token_data.get('expires_in')
 
         if not user_id:
             return redirect(f"{current_app.config['FRONTEND_URL']}/suppliers/callback?error=no_user")
@@ -566,6 +567,10 @@ def printify_callback():
 
         connection.access_token = access_token
         connection.refresh_token = refresh_token
+        connection.token_expires_at = (
+            datetime.utcnow() + timedelta(seconds=expires_in)
+            if expires_in else None
+        )
         connection.is_connected = True
         connection.connection_error = None
         connection.last_sync = datetime.utcnow()
@@ -619,6 +624,7 @@ def printful_callback():
         token_data = exchange_printful_code(code)
         access_token = token_data.get('access_token')
         refresh_token = token_data.get('refresh_token')
+        expires_in = token_data.get('expires_in')
 
         if not user_id:
             return redirect(f"{current_app.config['FRONTEND_URL']}/suppliers/callback?error=no_user")
@@ -642,6 +648,10 @@ def printful_callback():
 
         connection.access_token = access_token
         connection.refresh_token = refresh_token
+        connection.token_expires_at = (
+            datetime.utcnow() + timedelta(seconds=expires_in)
+            if expires_in else None
+        )
         connection.is_connected = True
         connection.connection_error = None
         connection.last_sync = datetime.utcnow()
@@ -7,26 +7,49 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import db
 from app.blueprints.products import products_bp
 from app.models import (
-    User, Product, Shop, SupplierConnection, SupplierProduct, SupplierType
+    User, Product, ProductComparison, Shop, SupplierConnection, SupplierProduct, SupplierType
 )
 from app.services.comparison import (
-    compare_product_prices,
+    DEFAULT_COUNTRY,
+    compare_product_variants,
     find_matching_supplier_products,
-    get_comparison_summary
+    get_comparison_summary,
+    refresh_country_quotes,
+    refresh_product_comparisons
 )
+from app.services.http import with_deadline
+from app.services.pagination import keyset_paginate
+from app.services.product_types import get_product_type_mappings, resolve_product_type_key
+from app.services.streaming import iter_batches, ndjson_response, wants_ndjson
 from app.services.switching import switch_product_supplier
 
 
 @products_bp.route('/compare', methods=['GET'])
 @jwt_required()
+@with_deadline
 def compare_products():
     """
     Get price comparison across suppliers for user's products.
 
+    Comparisons are stored per product and refreshed before the query, so
+    sorting, filtering and paging run in SQL. Supplier costs are the mean
+    over the listing's variants, weighted equally (no sales data is synced).
+
     Query params:
         product_type: Filter by product type (e.g., "Gildan 18000")
         shop_id: Filter by shop
         supplier: Current supplier to compare from
+        best_supplier: Only products whose cheapest supplier is this one
+        min_savings: Minimum potential savings per item
+        min_savings_percent: Minimum savings percent
+        sort: savings (default) or savings_percent
+        order: desc (default) or asc
+        cursor: Keyset cursor; pass an empty value for the first page
+        per_page: Items per page in cursor mode (default: 20, max: 100)
+        include_total: Also count matches in cursor mode (default: false)
+
+    Send "Accept: application/x-ndjson" to stream every matching comparison,
+    one JSON object per line, instead of a single list.
 
     Returns:
         List of products with price comparisons across suppliers
@@ -37,6 +60,20 @@ def compare_products():
     product_type = request.args.get('product_type', '')
     shop_id = request.args.get('shop_id', type=int)
     current_supplier = request.args.get('supplier', '')
+    best_supplier = request.args.get('best_supplier', '')
+    min_savings = request.args.get('min_savings', type=float)
+    min_savings_percent = request.args.get('min_savings_percent', type=float)
+
+    sort_columns = {
+        'savings': ProductComparison.potential_savings,
+        'savings_percent': ProductComparison.savings_percent
+    }
+    sort = request.args.get('sort', 'savings')
+    order = request.args.get('order', 'desc')
+    if sort not in sort_columns:
+        return jsonify({'error': f"Invalid sort. Must be one of: {', '.join(sort_columns)}"}), 400
+    if order not in ('asc', 'desc'):
+        return jsonify({'error': 'Invalid order. Must be asc or desc'}), 400
 
     # Get user's shops
     shops_query = Shop.query.filter_by(user_id=user_id, is_connected=True)
@@ -49,40 +86,80 @@ def compare_products():
 
     shop_ids = [s.id for s in shops]
 
-    # Get POD products from shops
-    query = Product.query.filter(
-        Product.shop_id.in_(shop_ids),
-        Product.supplier_type.isnot(None)
-    )
+    # Get user's supplier connections
+    connections = SupplierConnection.query.filter_by(
+        user_id=user_id,
+        is_connected=True
+    ).all()
+
+    connection_map = {c.supplier_type: c for c in connections}
+
+    refresh_product_comparisons(user_id, connection_map)
+
+    # Query stored comparisons of POD products from shops
+    query = ProductComparison.query.join(Product).filter(
+        ProductComparison.user_id == int(user_id),
+        ProductComparison.is_comparable == True,
+        Product.shop_id.in_(shop_ids)
+    ).options(db.contains_eager(ProductComparison.product))
 
     if product_type:
-        query = query.filter(Product.product_type.ilike(f'%{product_type}%'))
+        product_type_key = resolve_product_type_key(product_type)
+        if product_type_key:
+            query = query.filter(ProductComparison.product_type_key == product_type_key)
+        else:
+            query = query.filter(Product.product_type.ilike(f'%{product_type}%'))
 
     if current_supplier:
-        query = query.filter(Product.supplier_type == current_supplier)
+        query = query.filter(ProductComparison.current_supplier == current_supplier)
+    if best_supplier:
+        query = query.filter(ProductComparison.best_supplier == best_supplier)
+    if min_savings is not None:
+        query = query.filter(ProductComparison.potential_savings >= min_savings)
+    if min_savings_percent is not None:
+        query = query.filter(ProductComparison.savings_percent >= min_savings_percent)
+
+    sort_column = sort_columns[sort]
+    descending = order == 'desc'
+
+    if descending:
+        ordered = query.order_by(sort_column.desc(), ProductComparison.product_id.desc())
+    else:
+        ordered = query.order_by(sort_column, ProductComparison.product_id)
 
-    products = query.all()
+    if wants_ndjson():
+        return ndjson_response(c.to_dict() for batch in iter_batches(ordered) for c in batch)
+
+    if 'cursor' in request.args:
+        per_page = min(request.args.get('per_page', 20, type=int), 100)
+        include_total = request.args.get('include_total', 'false').lower() == 'true'
+
+        try:
+            comparisons, pagination = keyset_paginate(
+                query,
+                sort_column,
+                ProductComparison.product_id,
+                cursor=request.args.get('cursor') or None,
+                per_page=per_page,
+                include_total=include_total,
+                descending=descending
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
 
-    if not products:
         return jsonify({
-            'products': [],
-            'message': 'No POD products found'
+            'products': [c.to_dict() for c in comparisons],
+            'pagination': pagination,
+            'suppliers_connected': list(connection_map.keys())
         })
 
-    # Get user's supplier connections
-    connections = SupplierConnection.query.filter_by(
-        user_id=user_id,
-        is_connected=True
-    ).all()
-
-    connection_map = {c.supplier_type: c for c in connections}
+    comparisons = [c.to_dict() for c in ordered.all()]
 
-    # Build comparison data
-    comparisons = []
-    for product in products:
-        comparison = compare_product_prices(product, connection_map)
-        if comparison:
-            comparisons.append(comparison)
+    if not comparisons:
+        return jsonify({
+            'products': [],
+            'message': 'No POD products found'
+        })
 
     return jsonify({
         'products': comparisons,
@@ -93,28 +170,40 @@ def compare_products():
 
 @products_bp.route('/compare/summary', methods=['GET'])
 @jwt_required()
+@with_deadline
 def get_comparison_overview():
     """
     Get summary of potential savings across all products.
 
+    Aggregated from stored comparisons and quotes without calling the
+    suppliers. Quote a what-if country with POST /compare/quotes first;
+    suppliers not yet quoted for it are listed in unquoted_suppliers.
+    Every listing counts once at its equal-weight variant mean cost.
+
+    Query params:
+        exclude: Comma-separated suppliers not to switch to (e.g. "gelato")
+        country: Destination country code (default: US)
+
     Returns:
         Summary with total potential savings and products by supplier
     """
     user_id = get_jwt_identity()
 
+    exclude = [s.strip() for s in request.args.get('exclude', '').split(',') if s.strip()]
+    valid_suppliers = [s.value for s in SupplierType]
+    unknown = [s for s in exclude if s not in valid_suppliers]
+    if unknown:
+        return jsonify({'error': f"Unknown suppliers: {', '.join(unknown)}"}), 400
+
+    country = request.args.get('country', DEFAULT_COUNTRY).strip().upper()
+    if len(country) != 2 or not country.isalpha():
+        return jsonify({'error': 'Country must be a 2-letter code'}), 400
+
     # Get user's shops
     shops = Shop.query.filter_by(user_id=user_id, is_connected=True).all()
     if not shops:
         return jsonify({'error': 'No connected shops found'}), 404
 
-    shop_ids = [s.id for s in shops]
-
-    # Get all POD products
-    products = Product.query.filter(
-        Product.shop_id.in_(shop_ids),
-        Product.supplier_type.isnot(None)
-    ).all()
-
     # Get supplier connections
     connections = SupplierConnection.query.filter_by(
         user_id=user_id,
@@ -122,13 +211,50 @@ def get_comparison_overview():
     ).all()
     connection_map = {c.supplier_type: c for c in connections}
 
-    summary = get_comparison_summary(products, connection_map)
+    summary = get_comparison_summary(
+        user_id, connection_map, exclude_suppliers=exclude, country=country
+    )
 
     return jsonify(summary)
 
 
+@products_bp.route('/compare/quotes', methods=['POST'])
+@jwt_required()
+@with_deadline
+def refresh_comparison_quotes():
+    """
+    Fetch supplier quotes for a destination country.
+
+    Request body:
+        country: Destination country code (default: US)
+
+    Returns:
+        Number of stored quotes for the country
+    """
+    user_id = get_jwt_identity()
+    data = request.get_json(silent=True) or {}
+
+    country = data.get('country') or DEFAULT_COUNTRY
+    if not isinstance(country, str) or len(country.strip()) != 2 or not country.strip().isalpha():
+        return jsonify({'error': 'Country must be a 2-letter code'}), 400
+    country = country.strip().upper()
+
+    connections = SupplierConnection.query.filter_by(
+        user_id=user_id,
+        is_connected=True
+    ).all()
+    connection_map = {c.supplier_type: c for c in connections}
+    if not connection_map:
+        return jsonify({'error': 'No connected suppliers found'}), 404
+
+    quotes = refresh_country_quotes(user_id, connection_map, country)
+
+    return jsonify({'country': country, 'quotes': quotes})
+
+
 @products_bp.route('/compare/<int:product_id>', methods=['GET'])
 @jwt_required()
+@with_deadline
 def compare_single_product(product_id):
     """
     Get detailed price comparison for a single product.
@@ -137,7 +263,7 @@ def compare_single_product(product_id):
         product_id: Product ID
 
     Returns:
-        Detailed comparison across all connected suppliers
+        Comparison across all connected suppliers with per-variant costs
     """
     user_id = get_jwt_identity()
 
@@ -157,7 +283,7 @@ def compare_single_product(product_id):
     ).all()
     connection_map = {c.supplier_type: c for c in connections}
 
-    comparison = compare_product_prices(product, connection_map, detailed=True)
+    comparison = compare_product_variants(product, connection_map)
 
     if not comparison:
         return jsonify({'error': 'Unable to compare product'}), 400
@@ -319,6 +445,9 @@ def get_product_types():
     """
     Get unique product types from user's products.
 
+    Products are grouped by their normalized product_type_key; products
+    without a known type are grouped by their raw product type.
+
     Returns:
         List of product types with counts
     """
@@ -328,30 +457,48 @@ def get_product_types():
     shops = Shop.query.filter_by(user_id=user_id).all()
     shop_ids = [s.id for s in shops]
 
+    # Raw type only matters for unmapped products
+    unmapped_type = db.case(
+        (Product.product_type_key.is_(None), Product.product_type),
+        else_=None
+    )
+
     # Get distinct product types with counts
     results = db.session.query(
-        Product.product_type,
+        Product.product_type_key,
+        unmapped_type,
         Product.supplier_type,
         db.func.count(Product.id)
     ).filter(
         Product.shop_id.in_(shop_ids),
         Product.product_type.isnot(None)
     ).group_by(
-        Product.product_type,
+        Product.product_type_key,
+        unmapped_type,
         Product.supplier_type
     ).all()
 
+    mappings = get_product_type_mappings()
+
     # Organize by product type
     types = {}
-    for product_type, supplier, count in results:
-        if product_type not in types:
-            types[product_type] = {
+    for product_type_key, raw_type, supplier, count in results:
+        if product_type_key:
+            mapping = mappings.get(product_type_key)
+            product_type = mapping['display_name'] if mapping else product_type_key
+        else:
+            product_type = raw_type
+
+        group = product_type_key or raw_type
+        if group not in types:
+            types[group] = {
                 'product_type': product_type,
+                'product_type_key': product_type_key,
                 'total': 0,
                 'by_supplier': {}
             }
-        types[product_type]['total'] += count
-        types[product_type]['by_supplier'][supplier] = count
+        types[group]['total'] += count
+        types[group]['by_supplier'][supplier] = count
 
     return jsonify({
         'product_types': list(types.values())
@@ -367,8 +514,11 @@ def find_matching_products(product_id):
     Args:
         product_id: Product ID to find matches for
 
+    Query params:
+        limit: Matches per supplier (default 5, max 50)
+
     Returns:
-        List of matching products from connected suppliers
+        List of matching products from connected suppliers, best first
     """
     user_id = get_jwt_identity()
 
@@ -387,7 +537,9 @@ def find_matching_products(product_id):
         is_connected=True
     ).all()
 
-    matches = find_matching_supplier_products(product, connections)
+    limit = min(max(request.args.get('limit', 5, type=int), 1), 50)
+
+    matches = find_matching_supplier_products(product, connections, limit=limit)
 
     return jsonify({
         'product': product.to_dict(),
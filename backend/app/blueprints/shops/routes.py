@@ -2,12 +2,15 @@
 Shop management routes.
 Handles connecting, managing, and syncing Etsy/Shopify shops.
 """
-from datetime import datetime
+from datetime import datetime, timedelta
 from flask import request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import db
 from app.blueprints.shops import shops_bp
 from app.models import Shop, ShopType, Product, ProductVariant
+from app.services.pagination import keyset_paginate
+from app.services.search import search_products
+from app.services.streaming import iter_batches, ndjson_response, wants_ndjson
 from app.services.shops import (
     get_etsy_shops, get_shopify_shop_info,
     sync_etsy_listings, sync_shopify_products
@@ -61,6 +64,7 @@ def connect_etsy_shop():
     Request body:
         access_token: Etsy OAuth access token
         refresh_token: Etsy OAuth refresh token
+        expires_in: Optional seconds until the access token expires
         shop_id: Optional specific shop ID (if user has multiple)
 
     Returns:
@@ -74,6 +78,8 @@ def connect_etsy_shop():
 
     access_token = data.get('access_token')
     refresh_token = data.get('refresh_token')
+    expires_in = data.get('expires_in')
+    token_expires_at = datetime.utcnow() + timedelta(seconds=int(expires_in)) if expires_in else None
     shop_id = data.get('shop_id')
 
     if not access_token:
@@ -111,6 +117,7 @@ def connect_etsy_shop():
             # Update tokens
             existing.access_token = access_token
             existing.refresh_token = refresh_token
+            existing.token_expires_at = token_expires_at
             existing.is_connected = True
             existing.connection_error = None
             db.session.commit()
@@ -128,6 +135,7 @@ def connect_etsy_shop():
             shop_url=etsy_shop.get('url'),
             access_token=access_token,
             refresh_token=refresh_token,
+            token_expires_at=token_expires_at,
             is_connected=True,
             is_active=True
         )
@@ -326,11 +334,17 @@ def get_shop_products(shop_id):
         shop_id: Shop ID
 
     Query params:
-        page: Page number (default 1)
+        cursor: Keyset cursor; pass empty for the first page, then the
+            returned next_cursor (switches to keyset pagination)
+        include_total: With cursor, also return the total count
+        page: Page number (default 1, ignored with cursor)
         per_page: Items per page (default 20)
         supplier: Filter by supplier type
         search: Search in title/SKU
 
+    Send "Accept: application/x-ndjson" to stream every matching product,
+    one JSON object per line, instead of a page.
+
     Returns:
         Paginated list of products
     """
@@ -351,21 +365,33 @@ def get_shop_products(shop_id):
     if supplier:
         query = query.filter(Product.supplier_type == supplier)
 
+    rank = None
     if search:
-        query = query.filter(
-            db.or_(
-                Product.title.ilike(f'%{search}%'),
-                Product.sku.ilike(f'%{search}%')
+        # Keyset pages keep their sort order, page mode ranks by relevance
+        query, rank = search_products(query, search, ranked='cursor' not in request.args)
+
+    # Best matches first when searching
+    order_by = [Product.title, Product.id] if rank is None else [rank, Product.title, Product.id]
+
+    if wants_ndjson():
+        return ndjson_response(_product_rows(query.order_by(*order_by)))
+
+    if 'cursor' in request.args:
+        try:
+            items, page_info = keyset_paginate(
+                query, Product.title, Product.id,
+                cursor=request.args.get('cursor'),
+                per_page=per_page,
+                include_total=request.args.get('include_total', 'false').lower() == 'true'
             )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+    else:
+        pagination = query.order_by(*order_by).paginate(
+            page=page, per_page=per_page, error_out=False
         )
-
-    pagination = query.order_by(Product.title).paginate(
-        page=page, per_page=per_page, error_out=False
-    )
-
-    return jsonify({
-        'products': [p.to_dict(include_variants=True) for p in pagination.items],
-        'pagination': {
+        items = pagination.items
+        page_info = {
             'page': page,
             'per_page': per_page,
             'total': pagination.total,
@@ -373,9 +399,27 @@ def get_shop_products(shop_id):
             'has_next': pagination.has_next,
             'has_prev': pagination.has_prev
         }
+
+    # Load the whole page's variants with one query
+    variants = ProductVariant.group_by_product([p.id for p in items])
+
+    return jsonify({
+        'products': [
+            p.to_dict(include_variants=True, variants=variants[p.id])
+            for p in items
+        ],
+        'pagination': page_info
     })
 
 
+def _product_rows(query):
+    """Serialize products with their variants, loading variants per batch."""
+    for batch in iter_batches(query):
+        variants = ProductVariant.group_by_product([p.id for p in batch])
+        for product in batch:
+            yield product.to_dict(include_variants=True, variants=variants[product.id])
+
+
 @shops_bp.route('/<int:shop_id>/products/<int:product_id>', methods=['GET'])
 @jwt_required()
 def get_shop_product(shop_id, product_id):
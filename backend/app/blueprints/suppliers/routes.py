@@ -14,6 +14,11 @@ from app.services.suppliers import (
     validate_printful_connection,
     sync_supplier_products
 )
+from app.services.comparison import invalidate_product_comparisons, invalidate_supplier_quotes
+from app.services.http import get_breaker
+from app.services.pagination import keyset_paginate
+from app.services.search import search_supplier_products
+from app.services.streaming import iter_batches, ndjson_response, wants_ndjson
 
 
 @suppliers_bp.route('', methods=['GET'])
@@ -145,6 +150,9 @@ def connect_supplier(supplier_type):
     connection.connection_error = None
     connection.updated_at = datetime.utcnow()
 
+    # Prices may differ per account, and comparisons gain a supplier
+    invalidate_supplier_quotes(connection)
+
     db.session.commit()
 
     return jsonify({
@@ -186,6 +194,8 @@ def disconnect_supplier(supplier_type):
     connection.is_connected = False
     connection.connection_error = None
 
+    invalidate_supplier_quotes(connection)
+
     db.session.commit()
 
     return jsonify({'message': f'{supplier_type.capitalize()} disconnected successfully'})
@@ -222,11 +232,16 @@ def sync_supplier(supplier_type):
 
         connection.last_sync = datetime.utcnow()
         connection.connection_error = None
+
+        # Catalog variant costs feed stored comparisons
+        if result.get('count'):
+            invalidate_product_comparisons(user_id)
         db.session.commit()
 
         return jsonify({
             'message': 'Sync completed',
             'products_synced': result.get('count', 0),
+            'products_unchanged': result.get('unchanged', 0),
             'last_sync': connection.last_sync.isoformat()
         })
 
@@ -246,11 +261,17 @@ def get_supplier_products(supplier_type):
         supplier_type: Type of supplier (gelato, printify, printful)
 
     Query params:
-        page: Page number (default 1)
+        cursor: Keyset cursor; pass empty for the first page, then the
+            returned next_cursor (switches to keyset pagination)
+        include_total: With cursor, also return the total count
+        page: Page number (default 1, ignored with cursor)
         per_page: Items per page (default 20)
         search: Search term for product name/type
         category: Filter by category
 
+    Send "Accept: application/x-ndjson" to stream every matching product,
+    one JSON object per line, instead of a page.
+
     Returns:
         Paginated list of supplier products
     """
@@ -279,19 +300,41 @@ def get_supplier_products(supplier_type):
         is_active=True
     )
 
+    rank = None
     if search:
-        query = query.filter(
-            db.or_(
-                SupplierProduct.name.ilike(f'%{search}%'),
-                SupplierProduct.product_type.ilike(f'%{search}%'),
-                SupplierProduct.brand.ilike(f'%{search}%')
-            )
-        )
+        # Keyset pages keep their sort order, page mode ranks by relevance
+        query, rank = search_supplier_products(query, search, ranked='cursor' not in request.args)
 
     if category:
         query = query.filter(SupplierProduct.category == category)
 
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+    # Best matches first when searching
+    order_by = [SupplierProduct.name, SupplierProduct.id] if rank is None else [rank, SupplierProduct.name, SupplierProduct.id]
+
+    if wants_ndjson():
+        return ndjson_response(
+            p.to_dict() for batch in iter_batches(query.order_by(*order_by)) for p in batch
+        )
+
+    if 'cursor' in request.args:
+        try:
+            items, page_info = keyset_paginate(
+                query, SupplierProduct.name, SupplierProduct.id,
+                cursor=request.args.get('cursor'),
+                per_page=per_page,
+                include_total=request.args.get('include_total', 'false').lower() == 'true'
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        return jsonify({
+            'products': [p.to_dict() for p in items],
+            'pagination': page_info
+        })
+
+    pagination = query.order_by(*order_by).paginate(
+        page=page, per_page=per_page, error_out=False
+    )
 
     return jsonify({
         'products': [p.to_dict() for p in pagination.items],
@@ -351,7 +394,7 @@ def get_all_supplier_status():
     Get connection status for all supported suppliers.
 
     Returns:
-        Status of each supplier type
+        Status of each supplier type, including its API circuit breaker state
     """
     user_id = get_jwt_identity()
 
@@ -365,7 +408,8 @@ def get_all_supplier_status():
             'is_connected': conn.is_connected if conn else False,
             'last_sync': conn.last_sync.isoformat() if conn and conn.last_sync else None,
             'has_error': bool(conn.connection_error) if conn else False,
-            'error': conn.connection_error if conn else None
+            'error': conn.connection_error if conn else None,
+            'circuit': get_breaker(supplier.value).state
         }
 
     return jsonify({'suppliers': status})
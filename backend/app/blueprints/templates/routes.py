@@ -10,7 +10,11 @@ from app.models import (
     ListingTemplate, TemplateProduct, TemplateColor,
     SupplierProduct, SupplierConnection, Shop
 )
-from app.services.templates import create_listing_from_template
+from app.services.templates import (
+    create_listing_from_template, bump_template_version, get_template_preview,
+    apply_template_document
+)
+from app.services.publishing import create_publish_job, start_publish_job, get_publish_job
 
 
 @templates_bp.route('', methods=['GET'])
@@ -73,6 +77,7 @@ def create_template():
         default_description: Default listing description
         default_tags: List of default tags
         default_price_markup: Percentage markup (e.g., 50 for 50%)
+        price_ending: Cents ending for marked-up prices (e.g., 0.99)
         target_platforms: List of platforms ['etsy', 'shopify']
         etsy_category: Etsy category ID
         shopify_category: Shopify collection name
@@ -99,6 +104,7 @@ def create_template():
         default_tags=data.get('default_tags', []),
         default_price_markup=data.get('default_price_markup', 0),
         default_price_fixed=data.get('default_price_fixed'),
+        price_ending=data.get('price_ending'),
         target_platforms=data.get('target_platforms', ['etsy']),
         etsy_category=data.get('etsy_category'),
         shopify_category=data.get('shopify_category'),
@@ -146,7 +152,7 @@ def update_template(template_id):
     # Updatable fields
     allowed_fields = [
         'name', 'description', 'default_title', 'default_description',
-        'default_tags', 'default_price_markup', 'default_price_fixed',
+        'default_tags', 'default_price_markup', 'default_price_fixed', 'price_ending',
         'target_platforms', 'etsy_category', 'shopify_category', 'is_active'
     ]
 
@@ -154,6 +160,7 @@ def update_template(template_id):
         if field in data:
             setattr(template, field, data[field])
 
+    bump_template_version(template)
     db.session.commit()
 
     return jsonify({
@@ -162,6 +169,50 @@ def update_template(template_id):
     })
 
 
+@templates_bp.route('/<int:template_id>/document', methods=['PUT'])
+@jwt_required()
+def replace_template_document(template_id):
+    """
+    Save a whole template document in one transaction.
+
+    Args:
+        template_id: Template ID
+
+    Request body:
+        Any template fields to update
+        products: Full list of template products; items with an id are
+            updated, items without one are added and missing ones removed.
+            Each product may carry a full colors list with the same rules.
+
+    Returns:
+        Updated template with products and change counts
+    """
+    user_id = get_jwt_identity()
+
+    template = ListingTemplate.query.filter_by(
+        id=template_id,
+        user_id=user_id
+    ).first()
+
+    if not template:
+        return jsonify({'error': 'Template not found'}), 404
+
+    data = request.get_json()
+    if not data:
+        return jsonify({'error': 'No data provided'}), 400
+
+    try:
+        changes = apply_template_document(template, data, user_id)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({
+        'message': 'Template saved',
+        'template': template.to_dict(include_products=True),
+        'changes': changes
+    })
+
+
 @templates_bp.route('/<int:template_id>', methods=['DELETE'])
 @jwt_required()
 def delete_template(template_id):
@@ -186,6 +237,7 @@ def delete_template(template_id):
 
     # Soft delete
     template.is_active = False
+    bump_template_version(template)
     db.session.commit()
 
     return jsonify({'message': 'Template deleted'})
@@ -273,6 +325,7 @@ def add_template_product(template_id):
     )
 
     db.session.add(template_product)
+    bump_template_version(template)
     db.session.commit()
 
     return jsonify({
@@ -326,6 +379,7 @@ def update_template_product(template_id, product_id):
         if field in data:
             setattr(template_product, field, data[field])
 
+    bump_template_version(template, template_product)
     db.session.commit()
 
     return jsonify({
@@ -366,6 +420,7 @@ def delete_template_product(template_id, product_id):
         return jsonify({'error': 'Product not found'}), 404
 
     db.session.delete(template_product)
+    bump_template_version(template)
     db.session.commit()
 
     return jsonify({'message': 'Product removed from template'})
@@ -426,6 +481,7 @@ def add_template_color(template_id, product_id):
     )
 
     db.session.add(color)
+    bump_template_version(template, template_product)
     db.session.commit()
 
     return jsonify({
@@ -473,6 +529,7 @@ def delete_template_color(template_id, product_id, color_id):
         return jsonify({'error': 'Color not found'}), 404
 
     db.session.delete(color)
+    bump_template_version(template, template_product)
     db.session.commit()
 
     return jsonify({'message': 'Color removed'})
@@ -545,6 +602,107 @@ def create_listing(template_id):
         return jsonify({'error': f'Failed to create listing: {str(e)}'}), 500
 
 
+@templates_bp.route('/<int:template_id>/publish', methods=['POST'])
+@jwt_required()
+def publish_template(template_id):
+    """
+    Publish a template to many shops and designs in one batch.
+
+    Args:
+        template_id: Template ID
+
+    Request body:
+        shop_ids: List of target shop IDs
+        designs: List of designs, each with title, description, price, tags, images
+        wait: Wait for all listings before responding (default false: the job
+            runs in the background; poll GET /publish/<job_id>)
+
+    Returns:
+        Publish job with per-listing outcome
+    """
+    user_id = get_jwt_identity()
+
+    template = ListingTemplate.query.filter_by(
+        id=template_id,
+        user_id=user_id
+    ).first()
+
+    if not template:
+        return jsonify({'error': 'Template not found'}), 404
+
+    data = request.get_json()
+    if not data:
+        return jsonify({'error': 'No data provided'}), 400
+
+    shop_ids = data.get('shop_ids', [])
+    designs = data.get('designs', [])
+
+    if not shop_ids:
+        return jsonify({'error': 'shop_ids is required'}), 400
+
+    if not isinstance(shop_ids, list) or not all(
+            isinstance(shop_id, int) and not isinstance(shop_id, bool) for shop_id in shop_ids):
+        return jsonify({'error': 'shop_ids must be a list of shop IDs'}), 400
+
+    if not designs:
+        return jsonify({'error': 'designs is required'}), 400
+
+    shops = Shop.query.filter(
+        Shop.id.in_(shop_ids),
+        Shop.user_id == user_id,
+        Shop.is_connected.is_(True)
+    ).all()
+
+    missing = set(shop_ids) - {s.id for s in shops}
+    if missing:
+        return jsonify({
+            'error': 'Shop not found or not connected',
+            'shop_ids': sorted(missing)
+        }), 404
+
+    wait = data.get('wait', False)
+    if isinstance(wait, str):
+        wait = wait.lower() == 'true'
+    wait = bool(wait)
+
+    try:
+        job, tasks = create_publish_job(template, shops, designs)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    start_publish_job(job, tasks, wait=wait)
+
+    job_data = job.to_dict()
+    if not wait:
+        return jsonify({'message': 'Publish started', 'job': job_data}), 202
+
+    return jsonify({
+        'message': f"Published {job_data['succeeded']} of {job_data['total']} listings",
+        'job': job_data
+    }), 201 if job_data['failed'] == 0 else 207
+
+
+@templates_bp.route('/publish/<job_id>', methods=['GET'])
+@jwt_required()
+def get_publish_status(job_id):
+    """
+    Get progress of a batch publish.
+
+    Args:
+        job_id: Publish job ID
+
+    Returns:
+        Publish job with per-listing outcome
+    """
+    user_id = get_jwt_identity()
+
+    job = get_publish_job(job_id, user_id)
+    if not job:
+        return jsonify({'error': 'Publish job not found'}), 404
+
+    return jsonify({'job': job.to_dict()})
+
+
 @templates_bp.route('/<int:template_id>/preview', methods=['POST'])
 @jwt_required()
 def preview_listing(template_id):
@@ -572,35 +730,15 @@ def preview_listing(template_id):
 
     data = request.get_json() or {}
 
-    # Build preview
+    # Products and variants come from the versioned preview cache
+    cached = get_template_preview(template)
+
     preview = {
         'title': data.get('title') or template.default_title or '',
         'description': data.get('description') or template.default_description or '',
         'tags': data.get('tags') or template.default_tags or [],
-        'products': [],
-        'variants': []
+        'products': cached['products'],
+        'variants': cached['variants']
     }
 
-    # Add products from template
-    for tp in template.template_products.filter_by(is_active=True):
-        product_info = {
-            'supplier': tp.supplier_type,
-            'product_name': tp.product_name,
-            'product_type': tp.product_type,
-            'sizes': tp.selected_sizes,
-            'colors': [c.to_dict() for c in tp.colors.filter_by(is_active=True)]
-        }
-        preview['products'].append(product_info)
-
-        # Generate variant combinations
-        for size in tp.selected_sizes or ['One Size']:
-            for color in tp.colors.filter_by(is_active=True):
-                preview['variants'].append({
-                    'supplier': tp.supplier_type,
-                    'product': tp.product_name,
-                    'size': size,
-                    'color': color.display_name or color.color_name,
-                    'sku': f"{tp.supplier_type[:3].upper()}_{tp.id}_{size}_{color.color_name}".replace(' ', '_')
-                })
-
     return jsonify({'preview': preview})
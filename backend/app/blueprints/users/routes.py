@@ -6,7 +6,8 @@ from flask import request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import db
 from app.blueprints.users import users_bp
-from app.models import User
+from app.models import User, SkuRule, SupplierType
+from app.services.sku_classifier import invalidate_sku_classifier, validate_rule_pattern
 
 
 @users_bp.route('/me', methods=['GET'])
@@ -242,3 +243,113 @@ def get_user_summary():
             'templates_count': user.templates.count()
         }
     })
+
+
+@users_bp.route('/me/sku-rules', methods=['GET'])
+@jwt_required()
+def list_sku_rules():
+    """
+    List the current user's SKU classification rules.
+
+    Returns:
+        Rules in evaluation order
+    """
+    user_id = get_jwt_identity()
+    rules = SkuRule.query.filter_by(user_id=user_id).order_by(SkuRule.priority, SkuRule.id).all()
+
+    return jsonify({
+        'rules': [r.to_dict() for r in rules]
+    })
+
+
+@users_bp.route('/me/sku-rules', methods=['POST'])
+@jwt_required()
+def create_sku_rule():
+    """
+    Add a SKU classification rule, checked before the built-in rules.
+
+    Request body:
+        rule_type: 'supplier' or 'product_type'
+        pattern: Regex matched against the lowercased SKU (at most 100
+            characters, without nested repeats)
+        supplier: Supplier type (supplier rules)
+        label: SKU pattern label stored on products (supplier rules, optional)
+        product_type: Product type name (product_type rules)
+        priority: Lower runs first (default 0)
+
+    Returns:
+        Created rule
+    """
+    user_id = get_jwt_identity()
+    data = request.get_json()
+
+    if not data:
+        return jsonify({'error': 'No data provided'}), 400
+
+    rule_type = data.get('rule_type')
+    pattern = (data.get('pattern') or '').strip()
+
+    if rule_type not in ('supplier', 'product_type'):
+        return jsonify({'error': "Rule type must be 'supplier' or 'product_type'"}), 400
+
+    if not pattern:
+        return jsonify({'error': 'Pattern is required'}), 400
+
+    error = validate_rule_pattern(pattern)
+    if error:
+        return jsonify({'error': error}), 400
+
+    if rule_type == 'supplier' and data.get('supplier') not in [s.value for s in SupplierType]:
+        return jsonify({'error': 'Invalid supplier type'}), 400
+
+    if rule_type == 'product_type' and not data.get('product_type'):
+        return jsonify({'error': 'Product type is required'}), 400
+
+    priority = data.get('priority', 0)
+    if not isinstance(priority, int) or isinstance(priority, bool) or abs(priority) > 1000000:
+        return jsonify({'error': 'Priority must be an integer between -1000000 and 1000000'}), 400
+
+    rule = SkuRule(
+        user_id=user_id,
+        rule_type=rule_type,
+        pattern=pattern,
+        supplier=data.get('supplier') if rule_type == 'supplier' else None,
+        label=data.get('label') if rule_type == 'supplier' else None,
+        product_type=data.get('product_type') if rule_type == 'product_type' else None,
+        priority=priority
+    )
+    db.session.add(rule)
+    db.session.commit()
+
+    invalidate_sku_classifier(user_id)
+
+    return jsonify({
+        'message': 'SKU rule created',
+        'rule': rule.to_dict()
+    }), 201
+
+
+@users_bp.route('/me/sku-rules/<int:rule_id>', methods=['DELETE'])
+@jwt_required()
+def delete_sku_rule(rule_id):
+    """
+    Delete a SKU classification rule.
+
+    Args:
+        rule_id: Rule ID
+
+    Returns:
+        Success message
+    """
+    user_id = get_jwt_identity()
+    rule = SkuRule.query.filter_by(id=rule_id, user_id=user_id).first()
+
+    if not rule:
+        return jsonify({'error': 'SKU rule not found'}), 404
+
+    db.session.delete(rule)
+    db.session.commit()
+
+    invalidate_sku_classifier(user_id)
+
+    return jsonify({'message': 'SKU rule deleted'})
@@ -5,8 +5,15 @@ Exports all models for easy importing.
 from app.models.user import User
 from app.models.supplier import SupplierConnection, SupplierType
 from app.models.shop import Shop, ShopType
-from app.models.product import Product, ProductVariant, SupplierProduct
+from app.models.product import (
+    Product, ProductVariant, SupplierProduct, SupplierVariantPrice, SupplierProductToken
+)
+from app.models.comparison import SupplierQuote, ProductComparison
+from app.models.shipping import ShippingRate
+from app.models.product_type import ProductTypeMapping
+from app.models.sku_rule import SkuRule
 from app.models.template import ListingTemplate, TemplateProduct, TemplateColor
+from app.models.publishing import PublishJob, PublishJobListing
 
 __all__ = [
     'User',
@@ -17,7 +24,16 @@ __all__ = [
     'Product',
     'ProductVariant',
     'SupplierProduct',
+    'SupplierVariantPrice',
+    'SupplierProductToken',
+    'SupplierQuote',
+    'ProductComparison',
+    'ShippingRate',
+    'ProductTypeMapping',
+    'SkuRule',
     'ListingTemplate',
     'TemplateProduct',
-    'TemplateColor'
+    'TemplateColor',
+    'PublishJob',
+    'PublishJobListing'
 ]
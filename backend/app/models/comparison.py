@@ -0,0 +1,123 @@
+"""
+Comparison models.
+Persisted supplier quotes and per-product price comparisons.
+"""
+from datetime import datetime
+from app import db
+
+
+class SupplierQuote(db.Model):
+    """
+    Model for a supplier's price quote on a base product.
+    Quotes are shared by every listing of the same product type and
+    destination country.
+    """
+
+    __tablename__ = 'supplier_quotes'
+
+    id = db.Column(db.Integer, primary_key=True)
+    supplier_connection_id = db.Column(db.Integer, db.ForeignKey('supplier_connections.id'),
+                                       nullable=False)
+    supplier_product_id = db.Column(db.String(255), nullable=False)
+    country = db.Column(db.String(2), nullable=False, default='US')  # Destination country
+
+    # Null base_price: priced from the synced catalog, or the lookup failed
+    base_price = db.Column(db.Float, nullable=True)
+    shipping_first_item = db.Column(db.Float, nullable=True)
+    shipping_additional_item = db.Column(db.Float, nullable=True)
+    currency = db.Column(db.String(10), default='USD')
+    print_provider_id = db.Column(db.String(50), nullable=True)  # Printify provider quoted
+
+    fetched_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('supplier_connection_id', 'supplier_product_id', 'country',
+                            name='unique_connection_quote'),
+    )
+
+    @property
+    def total(self):
+        """Cost of one item shipped alone."""
+        return (self.base_price or 0) + (self.shipping_first_item or 0)
+
+    def to_dict(self):
+        """Convert quote to the pricing dictionary used in comparisons."""
+        return {
+            'supplier_product_id': self.supplier_product_id,
+            'base_price': self.base_price,
+            'currency': self.currency,
+            'shipping_first_item': self.shipping_first_item,
+            'shipping_additional_item': self.shipping_additional_item,
+            'print_provider_id': self.print_provider_id
+        }
+
+    def __repr__(self):
+        return f'<SupplierQuote {self.supplier_connection_id}:{self.supplier_product_id}>'
+
+
+class ProductComparison(db.Model):
+    """
+    Model for a listing's stored price comparison.
+    Recomputed when the listing, its supplier quotes or the user's supplier
+    connections change.
+    """
+
+    __tablename__ = 'product_comparisons'
+
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False, unique=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+
+    product_type_key = db.Column(db.String(100), nullable=True)
+    is_comparable = db.Column(db.Boolean, default=False)  # Product type has a mapping
+
+    # Results
+    current_supplier = db.Column(db.String(50), nullable=True)
+    best_supplier = db.Column(db.String(50), nullable=True)
+    current_total = db.Column(db.Float, nullable=True)
+    best_total = db.Column(db.Float, nullable=True)
+    potential_savings = db.Column(db.Float, nullable=False, default=0)
+    savings_percent = db.Column(db.Float, nullable=False, default=0)
+    suppliers = db.Column(db.JSON, default=dict)  # Supplier type -> pricing
+
+    # Cost of one shipped item per supplier, aggregated by the summary in SQL
+    gelato_total = db.Column(db.Float, nullable=True)
+    printify_total = db.Column(db.Float, nullable=True)
+    printful_total = db.Column(db.Float, nullable=True)
+
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_product_comparisons_user_savings', 'user_id', 'potential_savings', 'product_id'),
+        db.Index('ix_product_comparisons_user_percent', 'user_id', 'savings_percent', 'product_id'),
+        db.Index('ix_product_comparisons_user_type', 'user_id', 'product_type_key'),
+        db.Index('ix_product_comparisons_user_costs', 'user_id', 'product_type_key', 'current_supplier',
+                 'gelato_total', 'printify_total', 'printful_total'),
+    )
+
+    def to_dict(self):
+        """Convert comparison to dictionary (requires the product loaded)."""
+        product = self.product
+        data = {
+            'product_id': self.product_id,
+            'title': product.title,
+            'product_type': product.product_type,
+            'product_type_key': self.product_type_key,
+            'current_supplier': self.current_supplier,
+            'current_sku': product.sku,
+            'listing_price': product.price,
+            'suppliers': self.suppliers or {}
+        }
+
+        if self.suppliers:
+            data['best_supplier'] = self.best_supplier
+            data['best_total_cost'] = self.best_total
+            data['potential_savings'] = self.potential_savings
+            data['savings_percent'] = self.savings_percent
+
+        data['computed_at'] = self.computed_at.isoformat() if self.computed_at else None
+
+        return data
+
+    def __repr__(self):
+        return f'<ProductComparison {self.product_id}>'
@@ -35,6 +35,7 @@ class Product(db.Model):
 
     # Product details
     product_type = db.Column(db.String(255), nullable=True)  # e.g., "Gildan 18000"
+    product_type_key = db.Column(db.String(100), nullable=True, index=True)  # ProductTypeMapping.key
     category = db.Column(db.String(255), nullable=True)
 
     # Images
@@ -54,13 +55,26 @@ class Product(db.Model):
     # Relationships
     variants = db.relationship('ProductVariant', backref='product', lazy='dynamic',
                                cascade='all, delete-orphan')
+    comparison = db.relationship('ProductComparison', backref='product', uselist=False,
+                                 cascade='all, delete-orphan')
 
     __table_args__ = (
         db.UniqueConstraint('shop_id', 'listing_id', name='unique_shop_listing'),
+        db.Index('ix_products_shop_title_id', 'shop_id', 'title', 'id'),
+        db.Index('ix_products_shop_type_supplier', 'shop_id', 'product_type_key', 'supplier_type'),
     )
 
-    def to_dict(self, include_variants=False):
-        """Convert product to dictionary."""
+    def to_dict(self, include_variants=False, variants=None):
+        """
+        Convert product to dictionary.
+
+        Args:
+            include_variants: Include product variants
+            variants: Preloaded variants (avoids a query per product)
+
+        Returns:
+            Dictionary representation
+        """
         data = {
             'id': self.id,
             'shop_id': self.shop_id,
@@ -74,6 +88,7 @@ class Product(db.Model):
             'price': self.price,
             'currency': self.currency,
             'product_type': self.product_type,
+            'product_type_key': self.product_type_key,
             'category': self.category,
             'thumbnail_url': self.thumbnail_url,
             'images': self.images,
@@ -85,7 +100,9 @@ class Product(db.Model):
         }
 
         if include_variants:
-            data['variants'] = [v.to_dict() for v in self.variants]
+            if variants is None:
+                variants = self.variants
+            data['variants'] = [v.to_dict() for v in variants]
 
         return data
 
@@ -122,6 +139,29 @@ class ProductVariant(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    @classmethod
+    def group_by_product(cls, product_ids):
+        """
+        Load variants for many products with a single IN query.
+
+        Args:
+            product_ids: List of product IDs
+
+        Returns:
+            Dict of product_id -> list of variants
+        """
+        grouped = {product_id: [] for product_id in product_ids}
+        if not grouped:
+            return grouped
+
+        variants = cls.query.filter(cls.product_id.in_(grouped.keys())).order_by(
+            cls.product_id, cls.id
+        )
+        for variant in variants:
+            grouped[variant.product_id].append(variant)
+
+        return grouped
+
     def to_dict(self):
         """Convert variant to dictionary."""
         return {
@@ -157,6 +197,7 @@ class SupplierProduct(db.Model):
     supplier_product_id = db.Column(db.String(255), nullable=False)
     blueprint_id = db.Column(db.String(255), nullable=True)  # Printify blueprint
     catalog_id = db.Column(db.String(255), nullable=True)  # Gelato catalog
+    print_provider_id = db.Column(db.String(50), nullable=True)  # Cheapest Printify provider
 
     # Product info
     name = db.Column(db.String(500), nullable=False)
@@ -189,9 +230,17 @@ class SupplierProduct(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # Relationships
+    variant_prices = db.relationship('SupplierVariantPrice', backref='supplier_product',
+                                     lazy='dynamic', cascade='all, delete-orphan')
+    tokens = db.relationship('SupplierProductToken', backref='supplier_product',
+                             lazy='dynamic', cascade='all, delete-orphan')
+
     __table_args__ = (
         db.UniqueConstraint('supplier_connection_id', 'supplier_product_id',
                             name='unique_supplier_product'),
+        db.Index('ix_supplier_products_connection_name_id',
+                 'supplier_connection_id', 'name', 'id'),
     )
 
     def to_dict(self):
@@ -202,6 +251,7 @@ class SupplierProduct(db.Model):
             'supplier_product_id': self.supplier_product_id,
             'blueprint_id': self.blueprint_id,
             'catalog_id': self.catalog_id,
+            'print_provider_id': self.print_provider_id,
             'name': self.name,
             'description': self.description,
             'product_type': self.product_type,
@@ -223,3 +273,71 @@ class SupplierProduct(db.Model):
 
     def __repr__(self):
         return f'<SupplierProduct {self.name}>'
+
+
+class SupplierVariantPrice(db.Model):
+    """
+    Cached supplier cost for one size/color of a supplier product.
+    Filled during catalog sync so pricing never needs a live API call.
+    """
+
+    __tablename__ = 'supplier_variant_prices'
+
+    id = db.Column(db.Integer, primary_key=True)
+    supplier_product_id = db.Column(db.Integer, db.ForeignKey('supplier_products.id'),
+                                    nullable=False, index=True)
+
+    # Variant identification
+    supplier_variant_id = db.Column(db.String(255), nullable=True)  # Supplier's variant ID
+    print_provider_id = db.Column(db.String(50), nullable=True)  # Printify provider
+    size = db.Column(db.String(50), nullable=True)
+    color = db.Column(db.String(100), nullable=True)
+
+    # Pricing
+    price = db.Column(db.Float, nullable=False)
+    currency = db.Column(db.String(10), default='USD')
+
+    # Timestamps
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        """Convert variant price to dictionary."""
+        return {
+            'id': self.id,
+            'supplier_product_id': self.supplier_product_id,
+            'supplier_variant_id': self.supplier_variant_id,
+            'print_provider_id': self.print_provider_id,
+            'size': self.size,
+            'color': self.color,
+            'price': self.price,
+            'currency': self.currency
+        }
+
+    def __repr__(self):
+        return f'<SupplierVariantPrice {self.size} {self.color} {self.price}>'
+
+
+class SupplierProductToken(db.Model):
+    """
+    Inverted index entry for supplier product matching.
+    One row per distinct token of a supplier product, maintained by catalog sync.
+    """
+
+    __tablename__ = 'supplier_product_tokens'
+
+    id = db.Column(db.Integer, primary_key=True)
+    supplier_product_id = db.Column(db.Integer, db.ForeignKey('supplier_products.id'),
+                                    nullable=False, index=True)
+    supplier_connection_id = db.Column(db.Integer, db.ForeignKey('supplier_connections.id'),
+                                       nullable=False)
+
+    # Normalized token and where it came from: model, brand or word
+    token = db.Column(db.String(100), nullable=False)
+    kind = db.Column(db.String(10), nullable=False, default='word')
+
+    __table_args__ = (
+        db.Index('ix_supplier_product_tokens_lookup', 'token', 'supplier_connection_id'),
+    )
+
+    def __repr__(self):
+        return f'<SupplierProductToken {self.kind}:{self.token}>'
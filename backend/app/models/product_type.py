@@ -0,0 +1,49 @@
+"""
+Product type mapping model.
+Maps normalized product types to each supplier's base product.
+"""
+from datetime import datetime
+from app import db
+
+
+class ProductTypeMapping(db.Model):
+    """
+    Model for a known product type (e.g. Gildan 18000).
+    Products are keyed to a mapping at sync time through its aliases.
+    """
+
+    __tablename__ = 'product_type_mappings'
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    # Normalized key stored on products (e.g. "gildan 18000")
+    key = db.Column(db.String(100), unique=True, nullable=False, index=True)
+    display_name = db.Column(db.String(255), nullable=False)
+
+    # Lowercase substrings that identify this type; earlier mappings win
+    aliases = db.Column(db.JSON, default=list)
+
+    # Supplier type -> supplier base product ID (Gelato UID, Printify blueprint, Printful product)
+    supplier_products = db.Column(db.JSON, default=dict)
+
+    is_active = db.Column(db.Boolean, default=True)
+
+    # Timestamps
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        """Convert product type mapping to dictionary."""
+        return {
+            'id': self.id,
+            'key': self.key,
+            'display_name': self.display_name,
+            'aliases': self.aliases or [],
+            'supplier_products': self.supplier_products or {},
+            'is_active': self.is_active,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+    def __repr__(self):
+        return f'<ProductTypeMapping {self.key}>'
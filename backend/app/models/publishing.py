@@ -0,0 +1,92 @@
+"""
+Publish job models.
+Progress of batch template publishes, stored so any worker can report it.
+"""
+from datetime import datetime
+from app import db
+
+
+class PublishJob(db.Model):
+    """
+    Model for a batch publish of one template to many shops and designs.
+    """
+
+    __tablename__ = 'publish_jobs'
+
+    id = db.Column(db.String(32), primary_key=True)  # UUID hex
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    template_id = db.Column(db.Integer, db.ForeignKey('listing_templates.id'), nullable=True)
+
+    # queued, running, then completed, partial (some listings failed) or failed
+    status = db.Column(db.String(20), nullable=False, default='queued')
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)  # Last progress
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    listings = db.relationship('PublishJobListing', backref='job', lazy='dynamic',
+                               cascade='all, delete-orphan', order_by='PublishJobListing.index')
+
+    def to_dict(self):
+        """Convert publish job to dictionary."""
+        listings = [listing.to_dict() for listing in self.listings]
+
+        succeeded = sum(1 for r in listings if r['status'] == 'created')
+        failed = sum(1 for r in listings if r['status'] == 'failed')
+
+        return {
+            'id': self.id,
+            'template_id': self.template_id,
+            'status': self.status,
+            'total': len(listings),
+            'completed': succeeded + failed,
+            'succeeded': succeeded,
+            'failed': failed,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'listings': listings
+        }
+
+    def __repr__(self):
+        return f'<PublishJob {self.id}>'
+
+
+class PublishJobListing(db.Model):
+    """
+    Model for the outcome of one listing in a publish job.
+    """
+
+    __tablename__ = 'publish_job_listings'
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.String(32), db.ForeignKey('publish_jobs.id'), nullable=False, index=True)
+    index = db.Column(db.Integer, nullable=False)  # Position in the job
+
+    shop_id = db.Column(db.Integer, nullable=False)
+    shop_type = db.Column(db.String(50), nullable=False)
+    design = db.Column(db.Integer, nullable=False)
+    title = db.Column(db.String(500), nullable=True)
+
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, running, created, failed
+    listing = db.Column(db.JSON, nullable=True)  # Created listing summary
+    error = db.Column(db.Text, nullable=True)
+
+    def to_dict(self):
+        """Convert listing outcome to dictionary."""
+        data = {
+            'index': self.index,
+            'shop_id': self.shop_id,
+            'shop_type': self.shop_type,
+            'design': self.design,
+            'title': self.title,
+            'status': self.status
+        }
+        if self.listing is not None:
+            data['listing'] = self.listing
+        if self.error is not None:
+            data['error'] = self.error
+        return data
+
+    def __repr__(self):
+        return f'<PublishJobListing {self.job_id}:{self.index}>'
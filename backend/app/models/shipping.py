@@ -0,0 +1,55 @@
+"""
+Shipping rate model.
+Locally stored supplier shipping rates per product and destination.
+"""
+from datetime import datetime
+from app import db
+
+
+class ShippingRate(db.Model):
+    """
+    Model for a supplier's shipping rate to one destination.
+    Rates are loaded a whole table at a time and answered locally. A rate
+    without first_item records that the supplier returned none there.
+    """
+
+    __tablename__ = 'shipping_rates'
+
+    # Wildcards for rates that apply to every product or every other country
+    ANY_PRODUCT = '*'
+    REST_OF_WORLD = '*'
+
+    id = db.Column(db.Integer, primary_key=True)
+    supplier_connection_id = db.Column(db.Integer, db.ForeignKey('supplier_connections.id'),
+                                       nullable=False)
+    supplier_product_id = db.Column(db.String(255), nullable=False)  # Product, 'blueprint:provider' or '*'
+    country = db.Column(db.String(2), nullable=False)  # ISO code or '*'
+
+    # Quantity tiers: the first item and each additional item in the order
+    first_item = db.Column(db.Float, nullable=True)  # None: supplier does not ship there
+    additional_item = db.Column(db.Float, nullable=True)
+    currency = db.Column(db.String(10), default='USD')
+    method = db.Column(db.String(100), nullable=True)
+    handling_days = db.Column(db.Integer, nullable=True)  # Production time before dispatch
+
+    fetched_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('supplier_connection_id', 'supplier_product_id', 'country',
+                            name='unique_shipping_rate'),
+    )
+
+    def to_dict(self):
+        """Convert shipping rate to dictionary."""
+        return {
+            'supplier_product_id': self.supplier_product_id,
+            'country': self.country,
+            'first_item': self.first_item,
+            'additional_item': self.additional_item,
+            'currency': self.currency,
+            'method': self.method,
+            'handling_days': self.handling_days
+        }
+
+    def __repr__(self):
+        return f'<ShippingRate {self.supplier_connection_id}:{self.supplier_product_id}:{self.country}>'
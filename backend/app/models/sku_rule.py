@@ -0,0 +1,50 @@
+"""
+SKU rule model.
+User-defined SKU patterns for supplier and product type detection.
+"""
+from datetime import datetime
+from app import db
+
+
+class SkuRule(db.Model):
+    """
+    Model for a user-defined SKU classification rule.
+    User rules are checked before the built-in rules, lowest priority first.
+    """
+
+    __tablename__ = 'sku_rules'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+
+    # 'supplier' rules set supplier/label, 'product_type' rules set product_type
+    rule_type = db.Column(db.String(20), nullable=False)
+    pattern = db.Column(db.String(255), nullable=False)  # Regex, matched against the lowercased SKU
+
+    supplier = db.Column(db.String(50), nullable=True)
+    label = db.Column(db.String(100), nullable=True)  # Stored as Product.sku_pattern
+    product_type = db.Column(db.String(255), nullable=True)
+
+    priority = db.Column(db.Integer, default=0)
+    is_active = db.Column(db.Boolean, default=True)
+
+    # Timestamps
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        """Convert SKU rule to dictionary."""
+        return {
+            'id': self.id,
+            'rule_type': self.rule_type,
+            'pattern': self.pattern,
+            'supplier': self.supplier,
+            'label': self.label,
+            'product_type': self.product_type,
+            'priority': self.priority,
+            'is_active': self.is_active,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+    def __repr__(self):
+        return f'<SkuRule {self.rule_type}:{self.pattern}>'
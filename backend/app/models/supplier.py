@@ -46,6 +46,10 @@ class SupplierConnection(db.Model):
     # Relationships
     products = db.relationship('SupplierProduct', backref='supplier_connection', lazy='dynamic',
                                cascade='all, delete-orphan')
+    quotes = db.relationship('SupplierQuote', backref='supplier_connection', lazy='dynamic',
+                             cascade='all, delete-orphan')
+    shipping_rates = db.relationship('ShippingRate', backref='supplier_connection', lazy='dynamic',
+                                     cascade='all, delete-orphan')
 
     __table_args__ = (
         db.UniqueConstraint('user_id', 'supplier_type', name='unique_user_supplier'),
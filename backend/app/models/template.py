@@ -26,6 +26,7 @@ class ListingTemplate(db.Model):
     default_tags = db.Column(db.JSON, default=list)
     default_price_markup = db.Column(db.Float, default=0)  # Percentage markup
     default_price_fixed = db.Column(db.Float, nullable=True)  # Fixed price override
+    price_ending = db.Column(db.Float, nullable=True)  # e.g. 0.99; None uses app default
 
     # Target platforms
     target_platforms = db.Column(db.JSON, default=list)  # ['etsy', 'shopify']
@@ -37,6 +38,9 @@ class ListingTemplate(db.Model):
     # Status
     is_active = db.Column(db.Boolean, default=True)
 
+    # Bumped on every template, product or color change (preview caching)
+    version = db.Column(db.Integer, nullable=False, default=1)
+
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -57,10 +61,12 @@ class ListingTemplate(db.Model):
             'default_tags': self.default_tags,
             'default_price_markup': self.default_price_markup,
             'default_price_fixed': self.default_price_fixed,
+            'price_ending': self.price_ending,
             'target_platforms': self.target_platforms,
             'etsy_category': self.etsy_category,
             'shopify_category': self.shopify_category,
             'is_active': self.is_active,
+            'version': self.version,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
@@ -108,6 +114,9 @@ class TemplateProduct(db.Model):
     # Status
     is_active = db.Column(db.Boolean, default=True)
 
+    # Bumped on every change to this product or its colors (preview caching)
+    version = db.Column(db.Integer, nullable=False, default=1)
+
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -132,6 +141,7 @@ class TemplateProduct(db.Model):
             'price_markup': self.price_markup,
             'display_order': self.display_order,
             'is_active': self.is_active,
+            'version': self.version,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
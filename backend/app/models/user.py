@@ -26,6 +26,7 @@ class User(db.Model):
     # Account status
     is_active = db.Column(db.Boolean, default=True)
     is_verified = db.Column(db.Boolean, default=False)
+    is_admin = db.Column(db.Boolean, default=False)
 
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -38,6 +39,8 @@ class User(db.Model):
     shops = db.relationship('Shop', backref='user', lazy='dynamic', cascade='all, delete-orphan')
     templates = db.relationship('ListingTemplate', backref='user', lazy='dynamic',
                                 cascade='all, delete-orphan')
+    sku_rules = db.relationship('SkuRule', backref='user', lazy='dynamic',
+                                cascade='all, delete-orphan')
 
     def set_password(self, password):
         """Hash and set the user's password."""
@@ -69,6 +72,7 @@ class User(db.Model):
             'oauth_provider': self.oauth_provider,
             'is_active': self.is_active,
             'is_verified': self.is_verified,
+            'is_admin': self.is_admin,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'last_login': self.last_login.isoformat() if self.last_login else None
         }
@@ -0,0 +1,281 @@
+"""
+Async supplier and marketplace HTTP transport.
+Sends API calls from one event loop per process over a shared connection
+pool, so a fan-out of hundreds of calls needs no thread per call. Calls go
+through the same circuit breakers and deadlines as the sync transport and
+are rate limited per API.
+"""
+import asyncio
+import concurrent.futures
+import os
+import threading
+import time
+import requests
+from app.services.http import SupplierUnavailable, _call_key, get_breaker
+from app.services.http import _settings as _http_settings
+
+try:
+    import httpx
+except ImportError:  # Fan-outs fall back to threads
+    httpx = None
+
+try:
+    from gevent import monkey
+except ImportError:
+    monkey = None
+
+
+# Used until init_async_http() loads the app config
+_settings = {
+    'max_connections': 200,
+    'max_in_flight': 100,
+    'rate_limits': {}
+}
+
+# Event loop of this process; the state below is only used on its thread
+_loop = None
+_loop_pid = None
+_loop_lock = threading.Lock()
+
+_client = None
+_semaphores = {}
+_limiter = None
+
+# Call key -> task of GETs in flight
+_inflight = {}
+
+
+class AsyncRateLimiter:
+    """
+    Spaces out calls per API.
+
+    Up to burst calls go out at once, then calls are spaced at the API's
+    rate. Only used on the event loop thread, so it needs no lock.
+    """
+
+    def __init__(self, limits):
+        """
+        Initialize rate limiter.
+
+        Args:
+            limits: Dict of API -> (max calls per second, burst)
+        """
+        self.limits = limits
+        self._next_slot = {}
+
+    async def wait(self, api):
+        """Wait until the API may receive its next call."""
+        rate, burst = self.limits.get(api) or (None, None)
+        if not rate:
+            return
+
+        interval = 1.0 / rate
+        now = time.monotonic()
+        slot = max(now - (burst - 1) * interval, self._next_slot.get(api, now))
+        self._next_slot[api] = slot + interval
+
+        delay = slot - now
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def init_async_http(app):
+    """
+    Load async transport settings from the app config.
+
+    Args:
+        app: Flask application
+    """
+    global _limiter
+
+    config = app.config
+    _settings.update({
+        'max_connections': config.get('ASYNC_HTTP_MAX_CONNECTIONS', _settings['max_connections']),
+        'max_in_flight': config.get('ASYNC_HTTP_MAX_IN_FLIGHT', _settings['max_in_flight']),
+        'rate_limits': config.get('ASYNC_HTTP_RATE_LIMITS', _settings['rate_limits'])
+    })
+    _limiter = None
+    _semaphores.clear()
+
+
+def async_available():
+    """
+    Check whether the async transport can be used.
+
+    It needs httpx, and is not used in gevent workers: there the fan-out
+    threads are greenlets, which already wait on I/O cooperatively.
+    """
+    if httpx is None:
+        return False
+    return monkey is None or not monkey.is_module_patched('threading')
+
+
+def run_async(coro, timeout=None):
+    """
+    Run a coroutine on the transport's event loop and wait for its result.
+
+    This is the bridge for sync code: Flask views, worker threads and
+    scripts call it to run a fan-out of async client calls. Every caller
+    shares the loop and so its connection pool and rate limits.
+
+    Args:
+        coro: Coroutine to run
+        timeout: Seconds to wait, or None
+
+    Returns:
+        The coroutine's result
+
+    Raises:
+        SupplierUnavailable: Timed out
+        RuntimeError: Called from a coroutine on the transport's loop
+    """
+    loop = _get_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        coro.close()
+        raise RuntimeError('run_async() called on the transport loop; await the coroutine instead')
+
+    future = asyncio.run_coroutine_threadsafe(coro, loop)
+    try:
+        return future.result(timeout)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        raise SupplierUnavailable('async calls timed out')
+
+
+async def send_request_async(api, method, url, deadline=None, **kwargs):
+    """
+    Send an API call on the async transport.
+
+    GETs identical to one already in flight share its response. Catalog
+    GETs are not revalidated or streamed here; code relying on those uses
+    the sync send_request().
+
+    Args:
+        api: Supplier or marketplace type, the breaker and rate limit key
+        method: HTTP method
+        url: Request URL
+        deadline: time.monotonic() deadline of the calling request, or None
+        **kwargs: Additional request arguments (params, json, data, headers)
+
+    Returns:
+        httpx.Response
+
+    Raises:
+        SupplierUnavailable: Circuit open or deadline passed
+        requests.RequestException: Call failed
+    """
+    if method.upper() != 'GET':
+        return await _send(api, method, url, deadline, kwargs)
+
+    key = _call_key(api, url, kwargs)
+    task = _inflight.get(key)
+    if task is None:
+        task = _inflight[key] = asyncio.ensure_future(_send(api, method, url, deadline, kwargs))
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+
+    # A waiter cancelled by its caller must not cancel the shared call
+    return await asyncio.shield(task)
+
+
+def raise_for_status(response):
+    """
+    Raise requests.HTTPError for an error response.
+
+    Callers handle async responses with the same except clauses as sync
+    ones; e.response.status_code works on both.
+    """
+    if response.is_error:
+        raise requests.HTTPError(
+            f'{response.status_code} Error: {response.reason_phrase} for url: {response.url}',
+            response=response
+        )
+
+
+async def _send(api, method, url, deadline, kwargs):
+    """Send one call through the API's in-flight limit, rate limit and circuit breaker."""
+    async with _semaphore(api):
+        await _rate_limiter().wait(api)
+
+        read_timeout = _http_settings['read_timeout']
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise SupplierUnavailable(f'{api}: request deadline exceeded')
+            read_timeout = min(read_timeout, remaining)
+        timeout = httpx.Timeout(read_timeout, connect=min(_http_settings['connect_timeout'], read_timeout))
+
+        breaker = get_breaker(api)
+        if not breaker.allow():
+            raise SupplierUnavailable(f'{api}: circuit open')
+
+        started = time.monotonic()
+        try:
+            response = await _get_client().request(method, url, timeout=timeout, **kwargs)
+        except httpx.TimeoutException as e:
+            breaker.record(True, time.monotonic() - started)
+            raise requests.Timeout(str(e)) from e
+        except httpx.HTTPError as e:
+            breaker.record(True, time.monotonic() - started)
+            raise requests.ConnectionError(str(e)) from e
+        except BaseException:
+            # Cancelled (run_async timed out): a half-open probe must always be recorded
+            breaker.record(True, time.monotonic() - started)
+            raise
+
+        failed = response.status_code >= 500 or response.status_code == 429
+        breaker.record(failed, time.monotonic() - started)
+        return response
+
+
+def _get_loop():
+    """Get the event loop of this process, starting its thread on first use or after a fork."""
+    global _loop, _loop_pid, _client, _limiter
+
+    with _loop_lock:
+        if _loop is None or _loop_pid != os.getpid():
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name='async-http', daemon=True).start()
+
+            # Clients and locks of a parent process's loop are unusable here
+            _client = None
+            _limiter = None
+            _semaphores.clear()
+            _inflight.clear()
+            _loop, _loop_pid = loop, os.getpid()
+        return _loop
+
+
+def _get_client():
+    """Get the shared client, whose connection pool serves every API."""
+    global _client
+
+    if _client is None:
+        if httpx is None:
+            raise RuntimeError('httpx is required for the async transport')
+        _client = httpx.AsyncClient(limits=httpx.Limits(
+            max_connections=_settings['max_connections'],
+            max_keepalive_connections=_settings['max_connections']
+        ))
+    return _client
+
+
+def _semaphore(api):
+    """Get the semaphore bounding calls in flight to an API."""
+    semaphore = _semaphores.get(api)
+    if semaphore is None:
+        semaphore = _semaphores[api] = asyncio.Semaphore(_settings['max_in_flight'])
+    return semaphore
+
+
+def _rate_limiter():
+    """Get the rate limiter shared by every API."""
+    global _limiter
+
+    if _limiter is None:
+        _limiter = AsyncRateLimiter(_settings['rate_limits'])
+    return _limiter
+
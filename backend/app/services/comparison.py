@@ -2,148 +2,153 @@
 Product comparison service.
 Handles price comparison across different POD suppliers.
 """
-from app.models import SupplierProduct, SupplierType
-from app.services.suppliers.gelato import get_gelato_product_pricing, get_gelato_shipping_cost
-from app.services.suppliers.printify import get_printify_product_pricing, get_printify_shipping_cost
-from app.services.suppliers.printful import get_printful_product_pricing, get_printful_shipping_cost
-
-
-# Product type mappings between suppliers
-PRODUCT_TYPE_MAPPINGS = {
-    'gildan 18000': {
-        'gelato': 'gildan-18000-heavy-blend-sweatshirt',
-        'printify': '145',  # Blueprint ID
-        'printful': '380'   # Product ID
-    },
-    'gildan 18500': {
-        'gelato': 'gildan-18500-heavy-blend-hoodie',
-        'printify': '77',
-        'printful': '146'
-    },
-    'gildan 5000': {
-        'gelato': 'gildan-5000-heavy-cotton-tee',
-        'printify': '6',
-        'printful': '71'
-    },
-    'gildan 64000': {
-        'gelato': 'gildan-64000-softstyle-tee',
-        'printify': '12',
-        'printful': '19'
-    },
-    'bella canvas 3001': {
-        'gelato': 'bella-canvas-3001-unisex-tee',
-        'printify': '5',
-        'printful': '586'
-    },
-    'bella canvas 3413': {
-        'gelato': 'bella-canvas-3413-triblend',
-        'printify': '162',
-        'printful': '587'
-    },
-    'comfort colors 1717': {
-        'gelato': 'comfort-colors-1717',
-        'printify': '428',
-        'printful': '638'
-    },
-}
-
-
-def compare_product_prices(product, connection_map, detailed=False):
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import (
+    Product, ProductComparison, ProductVariant, ShippingRate, Shop, SupplierProduct, SupplierQuote,
+    SupplierType
+)
+from app.services.matching import find_matches
+from app.services.pricing import load_catalog_costs, lookup_variant_cost
+from app.services.print_providers import choose_print_provider
+from app.services.product_types import get_product_type_mappings, resolve_product_type_key
+from app.services.shipping import get_shipping_rate, prefetch_printful_rates
+from app.services.suppliers.gelato import get_gelato_product_pricing
+from app.services.tokens import ensure_fresh_token
+
+
+# Destination country of stored comparisons
+DEFAULT_COUNTRY = 'US'
+
+
+def compare_product_variants(product, connection_map):
     """
-    Compare product prices across connected suppliers.
+    Compare a listing's variant costs across connected suppliers.
+
+    Every size/color of the listing is priced from the synced supplier
+    catalogs instead of live API calls. A supplier's base price is the mean
+    cost over the listing's variants, each weighted equally: no per-variant
+    sales or order counts are synced to weight them by.
 
     Args:
         product: Product model instance
         connection_map: Dict of supplier_type -> SupplierConnection
-        detailed: Include detailed variant pricing
 
     Returns:
-        Comparison data dictionary
+        Comparison data dictionary with per-variant costs, or None
     """
-    if not product.product_type:
-        return None
-
-    # Normalize product type for lookup
-    product_type_key = product.product_type.lower().split('(')[0].strip()
-
-    # Get mapping for this product type
-    type_mapping = None
-    for key, mapping in PRODUCT_TYPE_MAPPINGS.items():
-        if key in product_type_key:
-            type_mapping = mapping
-            break
+    # Keyed at sync time; resolve products synced before keys existed
+    product_type_key = product.product_type_key or resolve_product_type_key(product.product_type)
+    mappings = get_product_type_mappings()
+    type_mapping = mappings.get(product_type_key)
 
     if not type_mapping:
         return None
 
+    quotes = _refresh_supplier_quotes(product.shop.user_id, connection_map, mappings, {product_type_key})
+    db.session.commit()
+    catalog = _load_catalog(connection_map, mappings, {product_type_key}, quotes)
+    variants = _listing_variants(product.variants)
+
     comparison = {
         'product_id': product.id,
         'title': product.title,
         'product_type': product.product_type,
+        'product_type_key': product_type_key,
         'current_supplier': product.supplier_type,
         'current_sku': product.sku,
         'listing_price': product.price,
         'suppliers': {}
     }
 
-    # Get pricing from each connected supplier
-    for supplier_type, connection in connection_map.items():
-        supplier_product_id = type_mapping.get(supplier_type)
+    for supplier_type in connection_map:
+        supplier_product_id = type_mapping['supplier_products'].get(supplier_type)
         if not supplier_product_id:
             continue
 
-        pricing = _get_supplier_pricing(
-            supplier_type,
-            connection,
-            supplier_product_id,
-            detailed
+        cost = catalog.get((supplier_type, supplier_product_id))
+        pricing = _supplier_pricing(
+            supplier_product_id, quotes.get((supplier_type, supplier_product_id)), cost, variants
         )
+        if not pricing:
+            continue
 
-        if pricing:
-            comparison['suppliers'][supplier_type] = pricing
+        pricing['variants'] = []
+        for size, color in variants:
+            base_price = lookup_variant_cost(cost, size, color)
+            pricing['variants'].append({
+                'size': size,
+                'color': color,
+                'base_price': pricing['base_price'] if base_price is None else base_price
+            })
+        comparison['suppliers'][supplier_type] = pricing
 
     # Calculate best option and potential savings
     if comparison['suppliers']:
-        best_supplier = None
-        best_total = float('inf')
-
-        for supplier, data in comparison['suppliers'].items():
-            total = (data.get('base_price', 0) or 0) + (data.get('shipping_first_item', 0) or 0)
-            if total < best_total and total > 0:
-                best_total = total
-                best_supplier = supplier
-
-        comparison['best_supplier'] = best_supplier
-        comparison['best_total_cost'] = best_total
-
-        # Calculate savings vs current
-        current_pricing = comparison['suppliers'].get(product.supplier_type, {})
-        current_total = (
-            (current_pricing.get('base_price', 0) or 0) +
-            (current_pricing.get('shipping_first_item', 0) or 0)
-        )
-
-        if current_total > 0 and best_total < current_total:
-            comparison['potential_savings'] = round(current_total - best_total, 2)
-            comparison['savings_percent'] = round(
-                ((current_total - best_total) / current_total) * 100, 1
-            )
-        else:
-            comparison['potential_savings'] = 0
-            comparison['savings_percent'] = 0
+        comparison.update(_best_option(comparison['suppliers'], product.supplier_type))
 
     return comparison
 
 
-def _get_supplier_pricing(supplier_type, connection, product_id, detailed=False):
+def _best_option(suppliers, current_supplier):
+    """
+    Pick the cheapest supplier and the savings against the current one.
+
+    Args:
+        suppliers: Dict of supplier_type -> pricing
+        current_supplier: Listing's current supplier type
+
+    Returns:
+        Dict with best_supplier, best_total_cost, current_total,
+        potential_savings and savings_percent
+    """
+    best_supplier = None
+    best_total = None
+
+    for supplier, data in suppliers.items():
+        total = (data.get('base_price', 0) or 0) + (data.get('shipping_first_item', 0) or 0)
+        if total > 0 and (best_total is None or total < best_total):
+            best_total = total
+            best_supplier = supplier
+
+    current_pricing = suppliers.get(current_supplier, {})
+    current_total = (
+        (current_pricing.get('base_price', 0) or 0) +
+        (current_pricing.get('shipping_first_item', 0) or 0)
+    )
+
+    if current_total > 0 and best_total is not None and best_total < current_total:
+        potential_savings = round(current_total - best_total, 2)
+        savings_percent = round(((current_total - best_total) / current_total) * 100, 1)
+    else:
+        potential_savings = 0
+        savings_percent = 0
+
+    return {
+        'best_supplier': best_supplier,
+        'best_total_cost': best_total,
+        'current_total': current_total or None,
+        'potential_savings': potential_savings,
+        'savings_percent': savings_percent
+    }
+
+
+def _get_supplier_pricing(supplier_type, connection, product_id, country=DEFAULT_COUNTRY):
     """
     Get pricing from a specific supplier.
 
+    Shipping comes from the local rate tables. Printify and Printful
+    prices do not vary by destination and come from the synced catalog, so
+    only Gelato prices are requested here. Printify is quoted for the
+    cheapest print provider shipping to the country.
+
     Args:
         supplier_type: Type of supplier
         connection: SupplierConnection instance
         product_id: Supplier-specific product ID
-        detailed: Include variant details
+        country: Destination country
 
     Returns:
         Pricing dictionary or None
@@ -153,30 +158,30 @@ def _get_supplier_pricing(supplier_type, connection, product_id, detailed=False)
             pricing = get_gelato_product_pricing(
                 connection.api_key,
                 product_id,
-                access_token=connection.access_token
-            )
-            shipping = get_gelato_shipping_cost(
-                connection.api_key,
-                product_id,
-                access_token=connection.access_token
+                country=country,
+                access_token=ensure_fresh_token(connection)
             )
+            if not pricing:
+                return None
 
         elif supplier_type == SupplierType.PRINTIFY.value:
-            # Printify needs blueprint ID and print provider
-            pricing = get_printify_product_pricing(connection.api_key, product_id, '99')  # Default provider
-            shipping = get_printify_shipping_cost(connection.api_key, product_id, '99')
+            quote = choose_print_provider(
+                connection, product_id, country,
+                max_handling_days=current_app.config.get('PRINTIFY_MAX_HANDLING_DAYS')
+            )
+            if not quote:
+                return None
+            return {'supplier_product_id': product_id, **quote}
 
         elif supplier_type == SupplierType.PRINTFUL.value:
-            pricing = get_printful_product_pricing(connection.api_key, product_id)
-            shipping = get_printful_shipping_cost(connection.api_key, product_id)
+            pricing = {}
 
         else:
             return None
 
-        if not pricing:
-            return None
+        shipping = get_shipping_rate(connection, product_id, country)
 
-        result = {
+        return {
             'supplier_product_id': product_id,
             'base_price': pricing.get('base_price'),
             'currency': pricing.get('currency', 'USD'),
@@ -184,25 +189,21 @@ def _get_supplier_pricing(supplier_type, connection, product_id, detailed=False)
             'shipping_additional_item': shipping.get('additional_item') if shipping else None
         }
 
-        if detailed and pricing.get('variants'):
-            result['variants'] = pricing['variants']
-
-        return result
-
     except Exception:
         return None
 
 
-def find_matching_supplier_products(product, connections):
+def find_matching_supplier_products(product, connections, limit=5):
     """
     Find matching products from supplier catalogs.
 
     Args:
         product: Product model instance
         connections: List of SupplierConnection instances
+        limit: Matches to return per supplier
 
     Returns:
-        List of matching products by supplier
+        List of matching products by supplier, best first
     """
     if not product.product_type:
         return []
@@ -210,87 +211,614 @@ def find_matching_supplier_products(product, connections):
     # Normalize product type for search
     product_type_key = product.product_type.lower().split('(')[0].strip()
 
-    matches = []
-
-    for connection in connections:
-        # Skip current supplier
-        if connection.supplier_type == product.supplier_type:
-            continue
-
-        # Search supplier products
-        supplier_products = SupplierProduct.query.filter_by(
-            supplier_connection_id=connection.id,
-            is_active=True
-        ).all()
-
-        for sp in supplier_products:
-            if sp.product_type and product_type_key in sp.product_type.lower():
-                matches.append({
-                    'supplier': connection.supplier_type,
-                    'product': sp.to_dict()
-                })
-            elif sp.name and product_type_key in sp.name.lower():
-                matches.append({
-                    'supplier': connection.supplier_type,
-                    'product': sp.to_dict()
-                })
+    # Skip current supplier
+    connections = [c for c in connections if c.supplier_type != product.supplier_type]
 
-    return matches
+    return find_matches(product_type_key, connections, limit=limit)
 
 
-def get_comparison_summary(products, connection_map):
+def get_comparison_summary(user_id, connection_map, exclude_suppliers=None, country=DEFAULT_COUNTRY):
     """
     Get summary of potential savings across all products.
 
+    Aggregated from the stored comparisons with one SQL GROUP BY: listings
+    with the same product type, current supplier and supplier costs are
+    counted together, and the best supplier and savings are rolled up over
+    those groups. New or changed listings are compared from stored quotes
+    first; supplier quotes are never fetched here. Each listing counts once,
+    costed at its equal-weight variant mean, as no sales are synced.
+
+    Stored comparisons are for DEFAULT_COUNTRY. For another country every
+    supplier cost is shifted by the difference between the supplier's stored
+    quotes for that country and the default one. Suppliers without stored
+    quotes for the country are left out and listed in unquoted_suppliers
+    until refresh_country_quotes() has fetched them.
+
     Args:
-        products: List of Product instances
+        user_id: Owner of the listings
         connection_map: Dict of supplier_type -> SupplierConnection
+        exclude_suppliers: Supplier types not to switch to (what-if)
+        country: Destination country (what-if)
 
     Returns:
         Summary dictionary
     """
+    exclude_suppliers = set(exclude_suppliers or ())
+    mappings = get_product_type_mappings()
+
+    refresh_product_comparisons(user_id, connection_map, fetch_quotes=False)
+
+    total_columns = {
+        supplier.value: getattr(ProductComparison, f'{supplier.value}_total')
+        for supplier in SupplierType if supplier.value in connection_map
+    }
+    group_columns = (
+        ProductComparison.product_type_key, ProductComparison.current_supplier, *total_columns.values()
+    )
+    # Read from the covering index; listings are joined only to drop disconnected shops
+    query = db.session.query(*group_columns, db.func.count()).filter(
+        ProductComparison.user_id == int(user_id)
+    )
+    disconnected = [
+        shop_id for shop_id, in db.session.query(Shop.id).filter_by(user_id=int(user_id), is_connected=False)
+    ]
+    if disconnected:
+        query = query.join(Product).filter(Product.shop_id.notin_(disconnected))
+    groups = query.group_by(*group_columns).all()
+
+    shifts = None
+    if country != DEFAULT_COUNTRY:
+        shifts = _country_shifts(connection_map, mappings, country)
+
     summary = {
-        'total_products': len(products),
+        'total_products': 0,
         'products_with_savings': 0,
         'total_potential_savings': 0,
-        'by_supplier': {},
+        'country': country,
+        'excluded_suppliers': sorted(exclude_suppliers),
+        'by_supplier': {
+            supplier.value: {'current_count': 0, 'potential_savings': 0}
+            for supplier in SupplierType
+        },
         'by_product_type': {}
     }
+    unquoted = set()
 
-    for supplier in SupplierType:
-        summary['by_supplier'][supplier.value] = {
-            'current_count': 0,
-            'potential_savings': 0
+    # Largest groups first, so a product type reports its most common best supplier
+    for key, current_supplier, *totals, count in sorted(groups, key=lambda group: -group[-1]):
+        summary['total_products'] += count
+        if current_supplier in summary['by_supplier']:
+            summary['by_supplier'][current_supplier]['current_count'] += count
+
+        supplier_costs = {
+            supplier_type: total for supplier_type, total in zip(total_columns, totals) if total
         }
+        if shifts is not None:
+            unquoted |= {s for s in supplier_costs if (s, key) not in shifts}
+            supplier_costs = {
+                s: total + shifts[(s, key)] for s, total in supplier_costs.items() if (s, key) in shifts
+            }
+
+        current_total = supplier_costs.get(current_supplier)
+        allowed = {s: c for s, c in supplier_costs.items() if s not in exclude_suppliers and c > 0}
+        if not allowed or not current_total or current_total <= 0:
+            continue
 
-    for product in products:
-        # Count by current supplier
-        if product.supplier_type:
-            if product.supplier_type in summary['by_supplier']:
-                summary['by_supplier'][product.supplier_type]['current_count'] += 1
-
-        # Get comparison
-        comparison = compare_product_prices(product, connection_map)
-        if comparison and comparison.get('potential_savings', 0) > 0:
-            summary['products_with_savings'] += 1
-            summary['total_potential_savings'] += comparison['potential_savings']
-
-            if product.supplier_type in summary['by_supplier']:
-                summary['by_supplier'][product.supplier_type]['potential_savings'] += comparison['potential_savings']
-
-            # Track by product type
-            product_type = product.product_type or 'Unknown'
-            if product_type not in summary['by_product_type']:
-                summary['by_product_type'][product_type] = {
-                    'count': 0,
-                    'potential_savings': 0,
-                    'best_supplier': None
-                }
-            summary['by_product_type'][product_type]['count'] += 1
-            summary['by_product_type'][product_type]['potential_savings'] += comparison['potential_savings']
-            if comparison.get('best_supplier'):
-                summary['by_product_type'][product_type]['best_supplier'] = comparison['best_supplier']
+        best_supplier, best_total = min(allowed.items(), key=lambda item: item[1])
+        if best_total >= current_total:
+            continue
+
+        savings = round(current_total - best_total, 2) * count
+        summary['products_with_savings'] += count
+        summary['total_potential_savings'] += savings
+
+        if current_supplier in summary['by_supplier']:
+            summary['by_supplier'][current_supplier]['potential_savings'] += savings
+
+        by_type = summary['by_product_type'].setdefault(key, {
+            'display_name': mappings[key]['display_name'] if key in mappings else key,
+            'count': 0,
+            'potential_savings': 0,
+            'best_supplier': best_supplier,
+            'best_total_cost': round(best_total, 2)
+        })
+        by_type['count'] += count
+        by_type['potential_savings'] += savings
 
     summary['total_potential_savings'] = round(summary['total_potential_savings'], 2)
+    for data in list(summary['by_supplier'].values()) + list(summary['by_product_type'].values()):
+        data['potential_savings'] = round(data['potential_savings'], 2)
+
+    if shifts is not None:
+        summary['unquoted_suppliers'] = sorted(unquoted)
 
     return summary
+
+
+def _country_shifts(connection_map, mappings, country):
+    """
+    Get supplier cost differences between a country and DEFAULT_COUNTRY.
+
+    Args:
+        connection_map: Dict of supplier_type -> SupplierConnection
+        mappings: Product type mappings
+        country: Destination country
+
+    Returns:
+        Dict of (supplier_type, product_type_key) -> cost difference, for
+        suppliers with stored quotes for both countries
+    """
+    connection_types = {c.id: supplier_type for supplier_type, c in connection_map.items()}
+    if not connection_types:
+        return {}
+
+    totals = {
+        (q.country, connection_types[q.supplier_connection_id], q.supplier_product_id): q.total
+        for q in SupplierQuote.query.filter(
+            SupplierQuote.supplier_connection_id.in_(connection_types.keys()),
+            SupplierQuote.country.in_((DEFAULT_COUNTRY, country))
+        )
+    }
+
+    shifts = {}
+    for key, mapping in mappings.items():
+        for supplier_type, supplier_product_id in mapping['supplier_products'].items():
+            home = totals.get((DEFAULT_COUNTRY, supplier_type, supplier_product_id))
+            away = totals.get((country, supplier_type, supplier_product_id))
+            if home is not None and away is not None:
+                shifts[(supplier_type, key)] = away - home
+    return shifts
+
+
+def refresh_country_quotes(user_id, connection_map, country):
+    """
+    Fetch missing or expired supplier quotes for a destination country.
+
+    The summary only reads stored quotes, so what-if countries are quoted
+    here first. Quotes for DEFAULT_COUNTRY are refreshed too, as costs for
+    other countries are shifted from them.
+
+    Args:
+        user_id: Owner of the listings
+        connection_map: Dict of supplier_type -> connected SupplierConnection
+        country: Destination country
+
+    Returns:
+        Number of stored quotes for the country
+    """
+    mappings = get_product_type_mappings()
+    product_type_keys = _product_type_keys(user_id)
+
+    quotes = {}
+    for destination in dict.fromkeys((DEFAULT_COUNTRY, country)):
+        quotes = _refresh_supplier_quotes(
+            user_id, connection_map, mappings, product_type_keys, country=destination
+        )
+    db.session.commit()
+
+    return len(quotes)
+
+
+def _product_type_keys(user_id):
+    """Get the product type keys of a user's connected POD listings."""
+    type_rows = db.session.query(Product.product_type, Product.product_type_key).join(Shop).filter(
+        Shop.user_id == int(user_id),
+        Shop.is_connected == True,
+        Product.supplier_type.isnot(None)
+    ).distinct().all()
+    return {key or resolve_product_type_key(product_type) for product_type, key in type_rows}
+
+
+def refresh_product_comparisons(user_id, connection_map, fetch_quotes=True):
+    """
+    Bring a user's stored product comparisons up to date.
+
+    Supplier quotes are fetched once per supplier base product and kept for
+    SUPPLIER_QUOTE_TTL seconds, unless fetch_quotes is off. Comparisons are recomputed from the quotes for
+    listings that are new or changed since their last comparison, and for
+    every listing of a product type whose quotes changed. Comparisons are
+    upserted, so concurrent refreshes for one user do not conflict.
+
+    Args:
+        user_id: Owner of the listings
+        connection_map: Dict of supplier_type -> connected SupplierConnection
+        fetch_quotes: Fetch missing or expired quotes from the suppliers;
+            when off, comparisons use the stored quotes only
+
+    Returns:
+        Number of recomputed comparisons
+    """
+    user_id = int(user_id)
+    mappings = get_product_type_mappings()
+
+    quotes = None
+    if fetch_quotes:
+        quotes = _refresh_supplier_quotes(user_id, connection_map, mappings, _product_type_keys(user_id))
+
+    stale = db.session.query(
+        Product.id, Product.supplier_type, Product.product_type, Product.product_type_key
+    ).join(Shop).outerjoin(ProductComparison).filter(
+        Shop.user_id == user_id,
+        Shop.is_connected == True,
+        Product.supplier_type.isnot(None),
+        db.or_(
+            ProductComparison.id.is_(None),
+            ProductComparison.computed_at < Product.updated_at
+        )
+    ).all()
+
+    if stale:
+        # Only the stale listings' product types need quotes and catalog costs
+        product_type_keys = {
+            key or resolve_product_type_key(product_type)
+            for product_type, key in {(row.product_type, row.product_type_key) for row in stale}
+        }
+        if quotes is None:
+            quotes = _refresh_supplier_quotes(user_id, connection_map, mappings, product_type_keys,
+                                              fetch=False)
+
+        stale_ids = [row.id for row in stale]
+        variants = {}
+        for chunk in _chunks(stale_ids):
+            variant_rows = db.session.query(
+                ProductVariant.product_id, ProductVariant.size, ProductVariant.color,
+                ProductVariant.is_available
+            ).filter(ProductVariant.product_id.in_(chunk))
+            for product_id, size, color, is_available in variant_rows:
+                variants.setdefault(product_id, []).append((size, color, is_available))
+
+        catalog = _load_catalog(connection_map, mappings, product_type_keys, quotes)
+
+        # Listings of one product type, supplier and variant set share a result
+        results = {}
+        keys = {}
+        computed_at = datetime.utcnow()
+        rows = []
+        for product_id, supplier_type, product_type, product_type_key in stale:
+            if not product_type_key:
+                if product_type not in keys:
+                    keys[product_type] = resolve_product_type_key(product_type)
+                product_type_key = keys[product_type]
+
+            listing_variants = _listing_variants(variants.get(product_id, ()))
+            result_key = (product_type_key, supplier_type, listing_variants)
+            result = results.get(result_key)
+            if result is None:
+                result = _comparison_result(supplier_type, product_type_key,
+                                            mappings.get(product_type_key), connection_map,
+                                            quotes, catalog, listing_variants)
+                results[result_key] = result
+
+            rows.append(dict(result, product_id=product_id, user_id=user_id, computed_at=computed_at))
+
+        _upsert_comparisons(rows)
+
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent refresh stored these comparisons first
+        db.session.rollback()
+        return 0
+    return len(stale)
+
+
+def _upsert_comparisons(rows):
+    """
+    Insert or replace stored comparisons by product.
+
+    Concurrent refreshes of the same listings then both succeed, the last
+    one's values winning.
+    """
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:  # No upsert: replace the rows, a concurrent refresh may still conflict
+        for chunk in _chunks([row['product_id'] for row in rows]):
+            db.session.execute(
+                db.delete(ProductComparison).where(ProductComparison.product_id.in_(chunk)),
+                execution_options={'synchronize_session': False}
+            )
+        db.session.execute(db.insert(ProductComparison), rows)
+        return
+
+    statement = insert(ProductComparison)
+    statement = statement.on_conflict_do_update(
+        index_elements=[ProductComparison.product_id],
+        set_={column: statement.excluded[column] for column in rows[0] if column != 'product_id'}
+    )
+    db.session.execute(statement, rows)
+
+
+def _refresh_supplier_quotes(user_id, connection_map, mappings, product_type_keys,
+                             country=DEFAULT_COUNTRY, fetch=True):
+    """
+    Load supplier quotes for product types, fetching missing or expired ones.
+
+    Stored comparisons of product types whose quotes changed are dropped so
+    they are recomputed. Quotes that fail to refresh keep their expired
+    values, so comparisons degrade to cached prices.
+
+    Args:
+        user_id: Owner of the connections
+        connection_map: Dict of supplier_type -> SupplierConnection
+        mappings: Product type mappings
+        product_type_keys: Product type keys in use
+        country: Destination country
+        fetch: Fetch missing or expired quotes (False to only load them)
+
+    Returns:
+        Dict of (supplier_type, supplier_product_id) -> SupplierQuote
+    """
+    users = {}
+    for key in product_type_keys:
+        if key not in mappings:
+            continue
+        for supplier_type, supplier_product_id in mappings[key]['supplier_products'].items():
+            if supplier_type in connection_map:
+                users.setdefault((supplier_type, supplier_product_id), set()).add(key)
+
+    if not users:
+        return {}
+
+    connection_types = {c.id: supplier_type for supplier_type, c in connection_map.items()}
+    quotes = {
+        (connection_types[q.supplier_connection_id], q.supplier_product_id): q
+        for q in SupplierQuote.query.filter(
+            SupplierQuote.supplier_connection_id.in_(connection_types.keys()),
+            SupplierQuote.country == country
+        )
+    }
+
+    ttl = current_app.config.get('SUPPLIER_QUOTE_TTL', 6 * 3600)
+    expired_before = datetime.utcnow() - timedelta(seconds=ttl)
+    changed_keys = set()
+
+    due = {
+        pair: keys for pair, keys in users.items()
+        if fetch and (pair not in quotes or quotes[pair].fetched_at < expired_before)
+    }
+
+    # Quote Printful shipping for every due product in one batch
+    printful_ids = [
+        product_id for supplier_type, product_id in due if supplier_type == SupplierType.PRINTFUL.value
+    ]
+    if printful_ids:
+        prefetch_printful_rates(connection_map[SupplierType.PRINTFUL.value], printful_ids, country)
+
+    for (supplier_type, supplier_product_id), keys in due.items():
+        pricing = _get_supplier_pricing(supplier_type, connection_map[supplier_type],
+                                        supplier_product_id, country=country)
+        if pricing is None:
+            # Supplier failed or out of time: keep any expired quote, retry next refresh
+            continue
+
+        quote = quotes.get((supplier_type, supplier_product_id))
+        previous = (
+            (quote.base_price, quote.shipping_first_item, quote.print_provider_id) if quote else None
+        )
+        if not quote:
+            quote = SupplierQuote(
+                supplier_connection_id=connection_map[supplier_type].id,
+                supplier_product_id=supplier_product_id,
+                country=country
+            )
+            db.session.add(quote)
+            quotes[(supplier_type, supplier_product_id)] = quote
+
+        quote.base_price = pricing.get('base_price')
+        quote.shipping_first_item = pricing.get('shipping_first_item')
+        quote.shipping_additional_item = pricing.get('shipping_additional_item')
+        quote.currency = pricing.get('currency', 'USD')
+        quote.print_provider_id = pricing.get('print_provider_id')
+        quote.fetched_at = datetime.utcnow()
+
+        if (quote.base_price, quote.shipping_first_item, quote.print_provider_id) != previous:
+            changed_keys |= keys
+
+    if changed_keys and country == DEFAULT_COUNTRY:
+        db.session.execute(
+            db.delete(ProductComparison).where(
+                ProductComparison.user_id == int(user_id),
+                ProductComparison.product_type_key.in_(changed_keys)
+            ),
+            execution_options={'synchronize_session': False}
+        )
+
+    db.session.flush()
+    return quotes
+
+
+def _comparison_result(current_supplier, product_type_key, type_mapping, connection_map,
+                       quotes, catalog, variants):
+    """Build ProductComparison values for a listing from stored quotes and catalog costs."""
+    suppliers = {}
+    if type_mapping:
+        for supplier_type in connection_map:
+            supplier_product_id = type_mapping['supplier_products'].get(supplier_type)
+            if not supplier_product_id:
+                continue
+
+            pricing = _supplier_pricing(
+                supplier_product_id,
+                quotes.get((supplier_type, supplier_product_id)),
+                catalog.get((supplier_type, supplier_product_id)),
+                variants
+            )
+            if pricing:
+                suppliers[supplier_type] = pricing
+
+    row = {
+        'product_type_key': product_type_key,
+        'is_comparable': type_mapping is not None,
+        'current_supplier': current_supplier,
+        'best_supplier': None,
+        'current_total': None,
+        'best_total': None,
+        'potential_savings': 0,
+        'savings_percent': 0,
+        'suppliers': suppliers
+    }
+    for supplier in SupplierType:
+        pricing = suppliers.get(supplier.value)
+        total = pricing and pricing['base_price'] + (pricing['shipping_first_item'] or 0)
+        row[f'{supplier.value}_total'] = total if total and total > 0 else None
+
+    if suppliers:
+        best = _best_option(suppliers, current_supplier)
+        row.update(
+            best_supplier=best['best_supplier'],
+            current_total=best['current_total'],
+            best_total=best['best_total_cost'],
+            potential_savings=best['potential_savings'],
+            savings_percent=best['savings_percent']
+        )
+
+    return row
+
+
+def _supplier_pricing(supplier_product_id, quote, cost, variants):
+    """
+    Price a supplier's base product for a listing's variants.
+
+    Args:
+        supplier_product_id: Supplier's base product ID
+        quote: SupplierQuote or None
+        cost: Catalog cost table from load_catalog_costs() or None
+        variants: Listing (size, color) pairs
+
+    Returns:
+        Pricing dictionary or None if the supplier has no price
+    """
+    if quote:
+        pricing = quote.to_dict()
+    else:
+        pricing = {
+            'supplier_product_id': supplier_product_id,
+            'base_price': None,
+            'currency': 'USD',
+            'shipping_first_item': None,
+            'shipping_additional_item': None
+        }
+
+    if cost:
+        prices = [lookup_variant_cost(cost, size, color) for size, color in variants]
+        prices = [price for price in prices if price is not None]
+        if prices:
+            # Equal weight per variant: no per-variant sales data is synced
+            pricing['min_base_price'] = min(prices)
+            pricing['base_price'] = round(sum(prices) / len(prices), 2)
+            pricing['variant_count'] = len(prices)
+        elif pricing['base_price'] is None:
+            pricing['base_price'] = cost['base']
+
+        if pricing['shipping_first_item'] is None and cost['shipping']:
+            pricing['shipping_first_item'] = cost['shipping']
+
+    if pricing['base_price'] is None:
+        return None
+    return pricing
+
+
+def _listing_variants(variants):
+    """
+    Get a listing's distinct (size, color) pairs.
+
+    Args:
+        variants: ProductVariant instances or (size, color, is_available) tuples
+
+    Returns:
+        Sorted tuple of (size, color), available variants only when any are
+    """
+    rows = [
+        (v.size, v.color, v.is_available) if isinstance(v, ProductVariant) else v
+        for v in variants
+    ]
+    available = [(size, color) for size, color, is_available in rows if is_available]
+    pairs = available or [(size, color) for size, color, _ in rows]
+    return tuple(sorted(set(pairs), key=lambda pair: (pair[0] or '', pair[1] or '')))
+
+
+def _load_catalog(connection_map, mappings, product_type_keys, quotes=None):
+    """
+    Load synced catalog costs for the supplier base products of product types.
+
+    Args:
+        connection_map: Dict of supplier_type -> SupplierConnection
+        mappings: Product type mappings
+        product_type_keys: Product type keys in use
+        quotes: Optional quotes from _refresh_supplier_quotes() selecting the
+            Printify print provider to cost
+
+    Returns:
+        Dict of (supplier_type, supplier_product_id) -> cost table
+    """
+    wanted = {
+        (connection_map[supplier_type].id, supplier_product_id): supplier_type
+        for key in product_type_keys if key in mappings
+        for supplier_type, supplier_product_id in mappings[key]['supplier_products'].items()
+        if supplier_type in connection_map
+    }
+    if not wanted:
+        return {}
+
+    rows = db.session.query(
+        SupplierProduct.id, SupplierProduct.supplier_connection_id, SupplierProduct.supplier_product_id
+    ).filter(
+        SupplierProduct.supplier_connection_id.in_({connection_id for connection_id, _ in wanted}),
+        SupplierProduct.supplier_product_id.in_({product_id for _, product_id in wanted})
+    )
+
+    products = {
+        row.id: (wanted[(row.supplier_connection_id, row.supplier_product_id)], row.supplier_product_id)
+        for row in rows if (row.supplier_connection_id, row.supplier_product_id) in wanted
+    }
+    quotes = quotes or {}
+    print_providers = {
+        product_id: quotes[key].print_provider_id
+        for product_id, key in products.items()
+        if key in quotes and quotes[key].print_provider_id
+    }
+    costs = load_catalog_costs(set(products), print_providers)
+
+    return {products[product_id]: cost for product_id, cost in costs.items()}
+
+
+def _chunks(items, size=500):
+    """Split a list into chunks for IN clauses."""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def invalidate_product_comparisons(user_id=None):
+    """
+    Drop stored comparisons so they are recomputed on the next read.
+
+    The caller commits.
+
+    Args:
+        user_id: Only drop this user's comparisons (None for all users)
+    """
+    statement = db.delete(ProductComparison)
+    if user_id is not None:
+        statement = statement.where(ProductComparison.user_id == int(user_id))
+    db.session.execute(statement, execution_options={'synchronize_session': False})
+
+
+def invalidate_supplier_quotes(connection):
+    """
+    Drop a connection's quotes, shipping rates and its owner's comparisons.
+
+    Called when a supplier is connected or disconnected. The caller commits.
+
+    Args:
+        connection: SupplierConnection instance
+    """
+    if connection.id is not None:
+        for model in (SupplierQuote, ShippingRate):
+            db.session.execute(
+                db.delete(model).where(model.supplier_connection_id == connection.id),
+                execution_options={'synchronize_session': False}
+            )
+    invalidate_product_comparisons(connection.user_id)
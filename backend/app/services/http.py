@@ -0,0 +1,645 @@
+"""
+Supplier HTTP transport.
+Sends supplier API calls with timeouts, a per-supplier circuit breaker and
+the calling request's deadline. Identical GETs in flight are coalesced and
+catalog GETs are revalidated against an on-disk HTTP cache.
+"""
+import base64
+import hashlib
+import io
+import json
+import os
+import stat
+import tempfile
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from functools import wraps
+import requests
+from flask import current_app, g, has_app_context, has_request_context
+
+try:
+    import fcntl
+except ImportError:  # Not POSIX: coalesce within the process only
+    fcntl = None
+
+try:
+    import ijson
+except ImportError:  # Streamed bodies are parsed whole
+    ijson = None
+
+
+# Used until init_http() loads the app config
+_settings = {
+    'connect_timeout': 3.05,
+    'read_timeout': 20,
+    'window': 20,
+    'min_calls': 10,
+    'error_rate': 0.5,
+    'slow_call_seconds': 5,
+    'slow_call_rate': 0.8,
+    'open_seconds': 30,
+    'coalesce': True,
+    'shared_dir': None,
+    'cache_dir': None
+}
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+# Call key -> _Call of GETs in flight in this process
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+# Poll interval while another worker holds a call lock
+LOCK_POLL_SECONDS = 0.05
+
+# Seconds between sweeps of stale call files from the shared directory
+SHARED_SWEEP_SECONDS = 60
+_last_sweep = 0.0
+_sweep_lock = threading.Lock()
+
+# Shared and cache directory -> whether it is private to this user
+_private_dirs = {}
+
+# Bytes read at a time from streamed response bodies
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class SupplierUnavailable(requests.RequestException):
+    """Raised without calling a supplier whose circuit is open or when the deadline has passed."""
+
+
+class NotModified(Exception):
+    """
+    Raised for a revalidated GET the supplier reports unchanged.
+
+    Attributes:
+        data: Parsed cached response body
+        cached_at: UTC datetime the cached body was downloaded
+    """
+
+    def __init__(self, data, cached_at):
+        super().__init__('Not modified')
+        self.data = data
+        self.cached_at = cached_at
+
+
+class _Call:
+    """A GET in flight that other threads wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+
+class CircuitBreaker:
+    """
+    Tracks recent call outcomes of one supplier and stops calling it while failing.
+
+    The circuit opens when the error or slow-call rate over the last calls
+    reaches its threshold. After open_seconds one probe call is let through
+    (half-open); its outcome closes or reopens the circuit.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, window, min_calls, error_rate, slow_call_seconds, slow_call_rate, open_seconds):
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+
+        self._calls = deque(maxlen=window)  # (failed, slow)
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        """Current state, reporting an expired open circuit as half-open."""
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self):
+        """Check whether a call may be sent now."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.open_seconds:
+                    return False
+                self._state = self.HALF_OPEN
+
+            # Half-open: one probe at a time
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record(self, failed, elapsed):
+        """
+        Record the outcome of a call.
+
+        Args:
+            failed: Call failed or the supplier returned a server error
+            elapsed: Call duration in seconds
+        """
+        slow = elapsed >= self.slow_call_seconds
+
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._probing = False
+                if failed or slow:
+                    self._open()
+                else:
+                    self._state = self.CLOSED
+                    self._calls.clear()
+                return
+
+            self._calls.append((failed, slow))
+            if len(self._calls) < self.min_calls:
+                return
+
+            failures = sum(1 for f, _ in self._calls if f)
+            slow_calls = sum(1 for _, s in self._calls if s)
+            if (failures / len(self._calls) >= self.error_rate
+                    or slow_calls / len(self._calls) >= self.slow_call_rate):
+                self._open()
+
+    def _open(self):
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._calls.clear()
+
+
+def init_http(app):
+    """
+    Load supplier transport settings from the app config.
+
+    Args:
+        app: Flask application
+    """
+    config = app.config
+    _settings.update({
+        'connect_timeout': config.get('SUPPLIER_CONNECT_TIMEOUT', _settings['connect_timeout']),
+        'read_timeout': config.get('SUPPLIER_READ_TIMEOUT', _settings['read_timeout']),
+        'window': config.get('SUPPLIER_BREAKER_WINDOW', _settings['window']),
+        'min_calls': config.get('SUPPLIER_BREAKER_MIN_CALLS', _settings['min_calls']),
+        'error_rate': config.get('SUPPLIER_BREAKER_ERROR_RATE', _settings['error_rate']),
+        'slow_call_seconds': config.get('SUPPLIER_SLOW_CALL_SECONDS', _settings['slow_call_seconds']),
+        'slow_call_rate': config.get('SUPPLIER_BREAKER_SLOW_RATE', _settings['slow_call_rate']),
+        'open_seconds': config.get('SUPPLIER_BREAKER_OPEN_SECONDS', _settings['open_seconds']),
+        'coalesce': config.get('SUPPLIER_COALESCE_GETS', _settings['coalesce']),
+        'shared_dir': config.get('SUPPLIER_SHARED_DIR', _settings['shared_dir']),
+        'cache_dir': config.get('SUPPLIER_HTTP_CACHE_DIR') or os.path.join(app.instance_path, 'supplier-cache')
+    })
+    with _breakers_lock:
+        _breakers.clear()
+
+
+def get_breaker(supplier):
+    """Get the circuit breaker of a supplier."""
+    with _breakers_lock:
+        breaker = _breakers.get(supplier)
+        if breaker is None:
+            breaker = _breakers[supplier] = CircuitBreaker(
+                window=_settings['window'],
+                min_calls=_settings['min_calls'],
+                error_rate=_settings['error_rate'],
+                slow_call_seconds=_settings['slow_call_seconds'],
+                slow_call_rate=_settings['slow_call_rate'],
+                open_seconds=_settings['open_seconds']
+            )
+        return breaker
+
+
+def with_deadline(view):
+    """
+    Bound the supplier calls of a view by SUPPLIER_REQUEST_DEADLINE seconds.
+
+    Calls after the deadline fail fast, so the view answers from stored
+    data instead of waiting on suppliers.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.supplier_deadline = time.monotonic() + current_app.config.get('SUPPLIER_REQUEST_DEADLINE', 10)
+        return view(*args, **kwargs)
+
+    return wrapper
+
+
+def request_deadline():
+    """
+    Get the deadline of the current request.
+
+    Services read it when created so calls made from worker threads keep
+    the deadline of the request that started them.
+
+    Returns:
+        time.monotonic() deadline or None
+    """
+    if not has_request_context():
+        return None
+    return g.get('supplier_deadline')
+
+
+def send_request(supplier, method, url, deadline=None, revalidate=False, **kwargs):
+    """
+    Send a supplier API call.
+
+    GETs identical to one already in flight, in this process or another
+    worker sharing SUPPLIER_SHARED_DIR, wait for it and share its response.
+
+    Revalidated GETs send the validators of the body cached in
+    SUPPLIER_HTTP_CACHE_DIR; on 304 the cached body is returned with
+    response.not_modified set and response.cached_at its download time.
+
+    Streamed GETs (stream=True) are not coalesced. Their body is spooled to
+    disk in chunks and left open as response.body_file for iter_json_items().
+
+    Args:
+        supplier: Supplier type, the circuit breaker key
+        method: HTTP method
+        url: Request URL
+        deadline: time.monotonic() deadline of the calling request, or None
+        revalidate: Cache the GET's body and validators on disk
+        **kwargs: Additional request arguments
+
+    Returns:
+        requests.Response
+
+    Raises:
+        SupplierUnavailable: Circuit open or deadline passed
+        requests.RequestException: Call failed
+    """
+    read_timeout = _settings['read_timeout']
+    if deadline is not None:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise SupplierUnavailable(f'{supplier}: request deadline exceeded')
+        read_timeout = min(read_timeout, remaining)
+
+    kwargs.setdefault('timeout', (min(_settings['connect_timeout'], read_timeout), read_timeout))
+
+    if method.upper() != 'GET':
+        return _send(supplier, method, url, **kwargs)
+
+    key = _call_key(supplier, url, kwargs)
+    if not _settings['coalesce'] or kwargs.get('stream'):
+        return _fetch(supplier, key, url, read_timeout, kwargs, revalidate)
+
+    with _inflight_lock:
+        call = _inflight.get(key)
+        leader = call is None
+        if leader:
+            call = _inflight[key] = _Call()
+
+    if not leader:
+        if not call.done.wait(read_timeout + _settings['connect_timeout']):
+            raise SupplierUnavailable(f'{supplier}: coalesced request timed out')
+        if call.error is not None:
+            raise call.error
+        return call.response
+
+    try:
+        call.response = _fetch(supplier, key, url, read_timeout, kwargs, revalidate)
+        return call.response
+    except Exception as e:
+        call.error = e
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+        call.done.set()
+
+
+def _fetch(supplier, key, url, read_timeout, kwargs, revalidate):
+    """Send a GET, revalidating the cached body when asked."""
+    stream = kwargs.get('stream', False)
+
+    def send(request_kwargs):
+        if stream:
+            return _send(supplier, 'GET', url, **request_kwargs)
+        return _send_shared(supplier, key, url, read_timeout, request_kwargs)
+
+    cache_dir = _settings['cache_dir']
+    if not revalidate or not cache_dir or not _private_dir(cache_dir):
+        response = send(kwargs)
+        if stream and response.ok:
+            _spool_body(response)
+        response.not_modified = False
+        return response
+
+    path = os.path.join(cache_dir, key)
+    cached = _read_cached(path, stream)
+
+    validators = {}
+    if cached is not None:
+        if cached.headers.get('ETag'):
+            validators['If-None-Match'] = cached.headers['ETag']
+        if cached.headers.get('Last-Modified'):
+            validators['If-Modified-Since'] = cached.headers['Last-Modified']
+
+    response = send({**kwargs, 'headers': {**(kwargs.get('headers') or {}), **validators}})
+    if response.status_code == 304:
+        response.close()
+        if cached is not None:
+            cached.not_modified = True
+            return cached
+        # Validators from a cache entry written meanwhile; fetch the body
+        response = send(kwargs)
+    elif cached is not None and stream:
+        cached.body_file.close()
+
+    if response.status_code == 200 and (response.headers.get('ETag') or response.headers.get('Last-Modified')):
+        _write_cached(path, response, stream)
+    elif stream and response.ok:
+        _spool_body(response)
+    response.not_modified = False
+    return response
+
+
+def iter_json_items(response, prefix='item'):
+    """
+    Iterate the items of a JSON array in a response body.
+
+    With ijson installed, items are parsed one at a time from the spooled
+    body of a streamed response, so memory holds one item; otherwise the
+    body is parsed whole.
+
+    Args:
+        response: Response from send_request()
+        prefix: ijson path of the array items, e.g. 'item' or 'result.item'
+
+    Yields:
+        Array items
+    """
+    source = getattr(response, 'body_file', None) or io.BytesIO(response.content)
+    try:
+        if ijson is not None:
+            yield from ijson.items(source, prefix, use_float=True)
+            return
+
+        data = json.load(source)
+        for name in prefix.split('.')[:-1]:
+            data = data.get(name) if isinstance(data, dict) else None
+        yield from data or []
+    finally:
+        source.close()
+        if response.raw is not None:
+            response.close()
+
+
+def _spool_body(response):
+    """Copy a streamed body to a temporary file, releasing the connection."""
+    body_file = tempfile.TemporaryFile()
+    for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+        body_file.write(chunk)
+    body_file.seek(0)
+    response.body_file = body_file
+
+
+def _write_cached(path, response, stream):
+    """
+    Store a response body and its validators in the HTTP cache.
+
+    The body is written before its metadata so validators never refer to
+    an older body.
+    """
+    tmp_suffix = f'{os.getpid()}.{threading.get_ident()}.tmp'
+    with _open_private(f'{path}.body.{tmp_suffix}', os.O_TRUNC, binary=True) as f:
+        for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+            f.write(chunk)
+    os.replace(f'{path}.body.{tmp_suffix}', f'{path}.body')
+
+    with _open_private(f'{path}.json.{tmp_suffix}', os.O_TRUNC) as f:
+        json.dump({
+            'written_at': time.time(),
+            'status_code': response.status_code,
+            'headers': dict(response.headers),
+            'url': response.url
+        }, f)
+    os.replace(f'{path}.json.{tmp_suffix}', f'{path}.json')
+
+    if stream:
+        response.body_file = open(f'{path}.body', 'rb')
+
+
+def _read_cached(path, stream):
+    """Load a cached response, leaving a streamed body on disk."""
+    try:
+        with open(f'{path}.json') as f:
+            meta = json.load(f)
+        body_file = open(f'{path}.body', 'rb')
+    except (OSError, ValueError):
+        return None
+
+    response = requests.Response()
+    response.status_code = meta['status_code']
+    response.headers.update(meta['headers'])
+    response.url = meta['url']
+    response.cached_at = datetime.utcfromtimestamp(meta['written_at'])
+
+    if stream:
+        response.body_file = body_file
+    else:
+        with body_file:
+            response._content = body_file.read()
+    return response
+
+
+def _send(supplier, method, url, **kwargs):
+    """Send one call through the supplier's circuit breaker."""
+    breaker = get_breaker(supplier)
+    if not breaker.allow():
+        raise SupplierUnavailable(f'{supplier}: circuit open')
+
+    started = time.monotonic()
+    try:
+        response = requests.request(method, url, **kwargs)
+    except BaseException:
+        # Also a gevent Timeout: a half-open probe must always be recorded
+        breaker.record(True, time.monotonic() - started)
+        raise
+
+    failed = response.status_code >= 500 or response.status_code == 429
+    breaker.record(failed, time.monotonic() - started)
+    return response
+
+
+def _send_shared(supplier, key, url, read_timeout, kwargs):
+    """
+    Send a GET once across workers.
+
+    The worker holding the call's file lock sends it and, when others are
+    waiting, stores the response; workers that waited for the lock read
+    that response instead.
+    """
+    directory = _settings['shared_dir']
+    if fcntl is None or not directory or not _private_dir(directory):
+        return _send(supplier, 'GET', url, **kwargs)
+
+    _sweep_shared_dir(directory, read_timeout)
+    path = os.path.join(directory, key)
+
+    started = time.time()
+    with _open_private(f'{path}.lock', os.O_APPEND) as lock_file:
+        os.utime(f'{path}.lock')  # Marks the call in use for the sweep
+        locked = _lock(lock_file, 0)
+        if not locked:
+            waited_from = time.time()
+            # Ask the worker holding the lock to store its response
+            with _open_private(f'{path}.wait', os.O_APPEND):
+                os.utime(f'{path}.wait')
+            locked = _lock(lock_file, read_timeout)
+            shared = _read_response(f'{path}.json', waited_from)
+            if shared is not None:
+                return shared
+
+        response = _send(supplier, 'GET', url, **kwargs)
+        if locked and response.status_code < 500 and _has_waiters(path, started):
+            _write_response(f'{path}.json', response)
+        return response
+
+
+def _open_private(path, flags, binary=False):
+    """Open a shared or cache directory file for writing, creating it readable by this user only."""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | flags, 0o600)
+    return os.fdopen(fd, ('a' if flags & os.O_APPEND else 'w') + ('b' if binary else ''))
+
+
+def _private_dir(directory):
+    """
+    Create a directory private to this user, or check that an existing one is.
+
+    Stored responses carry credentialed data and cached bodies are trusted
+    on a 304, so a directory another user owns or can write to is not used.
+    The result is kept per directory.
+
+    Returns:
+        True if the directory can be used
+    """
+    private = _private_dirs.get(directory)
+    if private is not None:
+        return private
+
+    try:
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        info = os.lstat(directory)
+        private = (
+            stat.S_ISDIR(info.st_mode)
+            and not info.st_mode & 0o077
+            and (not hasattr(os, 'geteuid') or info.st_uid == os.geteuid())
+        )
+    except OSError:
+        private = False
+
+    if not private and has_app_context():
+        current_app.logger.warning(f'Not using {directory}: not a directory private to this user')
+    _private_dirs[directory] = private
+    return private
+
+
+def _sweep_shared_dir(directory, read_timeout):
+    """
+    Delete call files no worker has used for a while.
+
+    A call file is in use for at most a call's timeouts, so files older
+    than twice that are stale: stored responses already read, and lock and
+    wait files of calls not repeated since. Runs at most once per
+    SHARED_SWEEP_SECONDS per process.
+    """
+    global _last_sweep
+
+    now = time.time()
+    with _sweep_lock:
+        if now - _last_sweep < SHARED_SWEEP_SECONDS:
+            return
+        _last_sweep = now
+
+    max_age = max(SHARED_SWEEP_SECONDS, 2 * (read_timeout + _settings['connect_timeout']))
+    try:
+        entries = list(os.scandir(directory))
+    except OSError:
+        return
+    for entry in entries:
+        try:
+            if entry.is_file() and now - entry.stat().st_mtime > max_age:
+                os.remove(entry.path)
+        except OSError:  # Removed by another worker
+            pass
+
+
+def _call_key(supplier, url, kwargs):
+    """Hash a GET by supplier, URL, query and headers (which carry the credentials)."""
+    data = json.dumps(
+        [supplier, url, kwargs.get('params'), kwargs.get('headers')],
+        sort_keys=True, default=str
+    )
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def _lock(lock_file, timeout):
+    """Take an exclusive file lock, waiting up to timeout seconds."""
+    waited_until = time.monotonic() + timeout
+    while True:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            if time.monotonic() >= waited_until:
+                return False
+            time.sleep(LOCK_POLL_SECONDS)
+
+
+def _has_waiters(path, since):
+    """Check whether another worker started waiting on a call since a point in time."""
+    try:
+        return os.path.getmtime(f'{path}.wait') >= since
+    except OSError:
+        return False
+
+
+def _write_response(path, response):
+    """Store a response for workers waiting on the same call."""
+    data = {
+        'written_at': time.time(),
+        'status_code': response.status_code,
+        'headers': dict(response.headers),
+        'url': response.url,
+        'content': base64.b64encode(response.content).decode()
+    }
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with _open_private(tmp_path, os.O_TRUNC) as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _read_response(path, written_after):
+    """Load a response stored by another worker after a point in time."""
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if data['written_at'] < written_after:
+        return None
+
+    response = requests.Response()
+    response.status_code = data['status_code']
+    response.headers.update(data['headers'])
+    response.url = data['url']
+    response._content = base64.b64decode(data['content'])
+    response.cached_at = datetime.utcfromtimestamp(data['written_at'])
+    return response
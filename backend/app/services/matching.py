@@ -0,0 +1,204 @@
+"""
+Product matching service.
+Finds equivalent products across supplier catalogs through an inverted
+token index maintained by catalog sync.
+"""
+import difflib
+import re
+from app import db
+from app.models import SupplierProduct, SupplierProductToken
+
+
+# Score contributed by each matched token kind
+TOKEN_WEIGHTS = {'model': 5, 'brand': 3, 'word': 1}
+
+# Bonus when both a brand and a model number match
+EXACT_MATCH_BONUS = 5
+
+# Weight of the fuzzy name similarity (0..1) in the final score
+FUZZY_WEIGHT = 4
+
+# Top token-scored candidates per supplier that get fuzzy re-scoring
+CANDIDATES_PER_SUPPLIER = 25
+
+STOP_WORDS = {'a', 'an', 'and', 'by', 'for', 'in', 'of', 'on', 'the', 'with', 'unisex'}
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text):
+    """
+    Split text into normalized match tokens.
+
+    Args:
+        text: Text to tokenize
+
+    Returns:
+        List of lowercase tokens
+    """
+    return [
+        t for t in _TOKEN_RE.findall((text or '').lower())
+        if len(t) > 1 and t not in STOP_WORDS
+    ]
+
+
+def product_tokens(name, product_type, brand):
+    """
+    Get the indexed tokens of a supplier product.
+
+    Tokens containing digits are treated as model numbers (e.g. 18000, 3001).
+
+    Args:
+        name: Product name
+        product_type: Product type (e.g. "Gildan 18000")
+        brand: Brand name
+
+    Returns:
+        Dict of token -> kind ('model', 'brand' or 'word')
+    """
+    tokens = {}
+    for token in tokenize(name) + tokenize(product_type):
+        tokens[token] = 'model' if any(c.isdigit() for c in token) else 'word'
+
+    for token in tokenize(brand):
+        if tokens.get(token) != 'model':
+            tokens[token] = 'brand'
+
+    return tokens
+
+
+def index_supplier_products(products):
+    """
+    Rebuild index entries for supplier products.
+
+    Products must be flushed so they have IDs.
+
+    Args:
+        products: List of SupplierProduct instances
+    """
+    if not products:
+        return
+
+    db.session.execute(
+        db.delete(SupplierProductToken).where(
+            SupplierProductToken.supplier_product_id.in_([p.id for p in products])
+        ),
+        execution_options={'synchronize_session': False}
+    )
+
+    rows = [
+        {
+            'supplier_product_id': p.id,
+            'supplier_connection_id': p.supplier_connection_id,
+            'token': token[:100],
+            'kind': kind
+        }
+        for p in products
+        for token, kind in product_tokens(p.name, p.product_type, p.brand).items()
+    ]
+    if rows:
+        db.session.execute(db.insert(SupplierProductToken), rows)
+
+
+def index_unindexed_supplier_products(connection):
+    """
+    Index a connection's supplier products that have no index entries yet.
+
+    Args:
+        connection: SupplierConnection instance
+
+    Returns:
+        Number of products indexed
+    """
+    indexed = db.select(SupplierProductToken.id).where(
+        SupplierProductToken.supplier_product_id == SupplierProduct.id
+    )
+    products = SupplierProduct.query.filter(
+        SupplierProduct.supplier_connection_id == connection.id,
+        ~indexed.exists()
+    ).all()
+
+    index_supplier_products(products)
+    return len(products)
+
+
+def find_matches(query_text, connections, limit=5):
+    """
+    Find the best matching supplier products for a product description.
+
+    Candidates are scored in SQL from the token index (model and brand
+    tokens weigh most), then the top candidates per supplier are re-scored
+    with fuzzy name similarity.
+
+    Args:
+        query_text: Product type or name to match (e.g. "Gildan 18000")
+        connections: List of SupplierConnection instances to search
+        limit: Matches to return per supplier
+
+    Returns:
+        List of match dicts with supplier, score, match type and product
+    """
+    query_tokens = set(tokenize(query_text))
+    if not query_tokens or not connections:
+        return []
+
+    query_key = ' '.join(tokenize(query_text))
+    kind = SupplierProductToken.kind
+    score = db.func.sum(db.case(TOKEN_WEIGHTS, value=kind, else_=0)).label('score')
+
+    matches = []
+    for connection in connections:
+        candidates = db.session.query(
+            SupplierProductToken.supplier_product_id,
+            score,
+            db.func.max(db.case((kind == 'model', 1), else_=0)),
+            db.func.max(db.case((kind == 'brand', 1), else_=0))
+        ).join(
+            SupplierProduct, SupplierProduct.id == SupplierProductToken.supplier_product_id
+        ).filter(
+            SupplierProductToken.supplier_connection_id == connection.id,
+            SupplierProductToken.token.in_(query_tokens),
+            SupplierProduct.is_active == True
+        ).group_by(
+            SupplierProductToken.supplier_product_id
+        ).order_by(
+            score.desc(), SupplierProductToken.supplier_product_id
+        ).limit(CANDIDATES_PER_SUPPLIER).all()
+
+        if not candidates:
+            continue
+
+        products = {
+            sp.id: sp for sp in SupplierProduct.query.filter(
+                SupplierProduct.id.in_([c[0] for c in candidates])
+            )
+        }
+
+        scored = []
+        for supplier_product_id, token_score, has_model, has_brand in candidates:
+            sp = products[supplier_product_id]
+            exact = bool(has_model and has_brand)
+            fuzzy = max(
+                _similarity(query_key, sp.product_type),
+                _similarity(query_key, sp.name)
+            )
+            total = token_score + (EXACT_MATCH_BONUS if exact else 0) + FUZZY_WEIGHT * fuzzy
+            scored.append((total, exact, sp))
+
+        scored.sort(key=lambda s: (-s[0], s[2].id))
+        for total, exact, sp in scored[:limit]:
+            matches.append({
+                'supplier': connection.supplier_type,
+                'score': round(total, 2),
+                'match': 'exact' if exact else 'fuzzy',
+                'product': sp.to_dict()
+            })
+
+    return matches
+
+
+def _similarity(query_key, text):
+    """Fuzzy similarity between a normalized query and a product field."""
+    if not text:
+        return 0.0
+    return difflib.SequenceMatcher(None, query_key, ' '.join(tokenize(text))).ratio()
@@ -0,0 +1,111 @@
+"""
+Pagination helpers.
+Keyset (cursor) pagination for large listings.
+"""
+import base64
+import json
+from app import db
+
+
+def encode_cursor(values):
+    """
+    Encode keyset values into an opaque cursor.
+
+    Args:
+        values: List of JSON-serializable values
+
+    Returns:
+        URL-safe cursor string
+    """
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decode an opaque cursor.
+
+    Args:
+        cursor: Cursor from encode_cursor()
+
+    Returns:
+        List of keyset values
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+    if not isinstance(values, list) or len(values) != 2:
+        raise ValueError('Invalid cursor')
+    sort_value, last_id = values
+    if not isinstance(sort_value, (str, int, float)) or isinstance(sort_value, bool):
+        raise ValueError('Invalid cursor')
+    if not isinstance(last_id, int) or isinstance(last_id, bool):
+        raise ValueError('Invalid cursor')
+    return values
+
+
+def keyset_paginate(query, sort_column, id_column, cursor=None, per_page=20,
+                    include_total=False, descending=False):
+    """
+    Fetch one page ordered by (sort_column, id_column) after a cursor.
+
+    Each page is a range scan from the cursor position, so the cost does not
+    grow with depth. Ordering columns must be non-nullable.
+
+    Args:
+        query: Filtered SQLAlchemy query
+        sort_column: Column to order by
+        id_column: Unique tie-breaker column
+        cursor: Cursor from a previous page (None for the first page)
+        per_page: Page size, at least 1
+        include_total: Also count all matching rows
+        descending: Order both columns descending
+
+    Returns:
+        Tuple of (items, pagination dict)
+    """
+    per_page = max(per_page, 1)
+    total = query.order_by(None).count() if include_total else None
+
+    if cursor:
+        last_value, last_id = decode_cursor(cursor)
+        if descending:
+            query = query.filter(db.or_(
+                sort_column < last_value,
+                db.and_(sort_column == last_value, id_column < last_id)
+            ))
+        else:
+            query = query.filter(db.or_(
+                sort_column > last_value,
+                db.and_(sort_column == last_value, id_column > last_id)
+            ))
+
+    if descending:
+        query = query.order_by(sort_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(sort_column, id_column)
+
+    items = query.limit(per_page + 1).all()
+    has_next = len(items) > per_page
+    items = items[:per_page]
+
+    next_cursor = None
+    if has_next:
+        last = items[-1]
+        next_cursor = encode_cursor([getattr(last, sort_column.key), getattr(last, id_column.key)])
+
+    pagination = {
+        'per_page': per_page,
+        'next_cursor': next_cursor,
+        'has_next': has_next
+    }
+    if include_total:
+        pagination['total'] = total
+
+    return items, pagination
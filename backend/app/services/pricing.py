@@ -0,0 +1,199 @@
+"""
+Pricing service.
+Prices template and listing variants from cached supplier costs.
+"""
+import math
+from flask import current_app
+from app import db
+from app.models import SupplierProduct, SupplierVariantPrice
+
+
+# Used when a markup applies but no supplier cost is cached
+FALLBACK_PRICE = 25.00
+
+
+def price_template_products(template, template_products):
+    """
+    Price markup-based template products from the local supplier price cache.
+
+    Costs for every product are read with two queries, then each
+    size/color is priced in a single in-memory pass.
+
+    Args:
+        template: ListingTemplate model instance
+        template_products: Output of load_template_products()
+
+    Returns:
+        Dict of TemplateProduct.id -> {(size, color_name): price}
+    """
+    markup_products = [
+        (tp, colors) for tp, colors in template_products
+        if _uses_markup(template, tp)
+    ]
+    if not markup_products:
+        return {}
+
+    costs = load_supplier_costs([tp for tp, _ in markup_products])
+    ending = template.price_ending
+    if ending is None:
+        ending = current_app.config.get('TEMPLATE_PRICE_ENDING')
+
+    prices = {}
+    for tp, colors in markup_products:
+        markup = tp.price_markup or template.default_price_markup
+        cost = costs.get(tp.supplier_product_id)
+        tp_prices = prices[tp.id] = {}
+
+        for size in tp.selected_sizes or ['One Size']:
+            for color in colors:
+                base_cost = _lookup_cost(cost, size, color.color_name)
+                if base_cost is None:
+                    tp_prices[(size, color.color_name)] = FALLBACK_PRICE
+                else:
+                    tp_prices[(size, color.color_name)] = apply_price_ending(
+                        base_cost * (1 + markup / 100), ending
+                    )
+
+    return prices
+
+
+def load_supplier_costs(template_products):
+    """
+    Load cached base costs for template products.
+
+    Args:
+        template_products: List of TemplateProduct instances
+
+    Returns:
+        Dict of SupplierProduct.id -> cost table with 'base', 'shipping',
+        'by_size' and 'by_variant' entries
+    """
+    return load_catalog_costs({
+        tp.supplier_product_id for tp in template_products if tp.supplier_product_id
+    })
+
+
+def load_catalog_costs(supplier_product_ids, print_providers=None):
+    """
+    Load cached base costs for supplier products.
+
+    Printify products cache variant prices for every print provider; only
+    the given provider's prices are used, else the cheapest provider's.
+
+    Args:
+        supplier_product_ids: Set of SupplierProduct IDs
+        print_providers: Optional dict of SupplierProduct.id -> print provider ID
+
+    Returns:
+        Dict of SupplierProduct.id -> cost table with 'base', 'shipping',
+        'by_size' and 'by_variant' entries
+    """
+    if not supplier_product_ids:
+        return {}
+
+    print_providers = print_providers or {}
+    costs = {}
+    providers = {}
+    for sp in SupplierProduct.query.filter(SupplierProduct.id.in_(supplier_product_ids)):
+        costs[sp.id] = {
+            'base': sp.base_price,
+            'shipping': sp.shipping_first_item or 0,
+            'by_size': {},
+            'by_variant': {}
+        }
+        providers[sp.id] = print_providers.get(sp.id) or sp.print_provider_id
+
+    rows = db.session.query(
+        SupplierVariantPrice.supplier_product_id,
+        SupplierVariantPrice.print_provider_id,
+        SupplierVariantPrice.size,
+        SupplierVariantPrice.color,
+        SupplierVariantPrice.price
+    ).filter(
+        SupplierVariantPrice.supplier_product_id.in_(supplier_product_ids)
+    )
+
+    overridden = {}
+    for supplier_product_id, print_provider_id, size, color, price in rows:
+        cost = costs.get(supplier_product_id)
+        if cost is None or price is None:
+            continue
+        if print_provider_id is not None and print_provider_id != providers[supplier_product_id]:
+            continue
+
+        size_key = (size or '').lower()
+        color_key = (color or '').lower()
+
+        cost['by_variant'][(size_key, color_key)] = price
+        if price < cost['by_size'].get(size_key, float('inf')):
+            cost['by_size'][size_key] = price
+        if supplier_product_id in print_providers:
+            overridden[supplier_product_id] = min(price, overridden.get(supplier_product_id, price))
+
+    # The base price is the cheapest provider's; use the chosen one's instead
+    for supplier_product_id, base in overridden.items():
+        costs[supplier_product_id]['base'] = base
+
+    return costs
+
+
+def apply_price_ending(price, ending):
+    """
+    Round a price up to the next configured price ending.
+
+    Args:
+        price: Raw price
+        ending: Cents ending as a fraction (e.g. 0.99), or None to round to cents
+
+    Returns:
+        Rounded price
+    """
+    price = round(price, 2)
+    if ending is None:
+        return price
+
+    candidate = math.floor(price) + ending
+    if candidate < price:
+        candidate += 1
+    return round(candidate, 2)
+
+
+def _uses_markup(template, tp):
+    """Check whether a template product is priced by markup over cost."""
+    if tp.price_override or template.default_price_fixed:
+        return False
+    return bool(tp.price_markup or template.default_price_markup)
+
+
+def _lookup_cost(cost, size, color):
+    """Get the supplier cost including shipping for one size/color."""
+    base = lookup_variant_cost(cost, size, color)
+    if base is None:
+        return None
+
+    return base + cost['shipping']
+
+
+def lookup_variant_cost(cost, size, color):
+    """
+    Get the supplier base cost for one size/color.
+
+    Falls back to the cheapest color of the size, then the product base price.
+
+    Args:
+        cost: Cost table from load_catalog_costs()
+        size: Size name
+        color: Color name
+
+    Returns:
+        Base cost or None
+    """
+    if not cost:
+        return None
+
+    size_key = (size or '').lower()
+    base = cost['by_variant'].get((size_key, (color or '').lower()))
+    if base is None:
+        base = cost['by_size'].get(size_key, cost['base'])
+
+    return base
@@ -0,0 +1,109 @@
+"""
+Printify print provider service.
+Picks the print provider to quote for a blueprint and destination.
+"""
+from app import db
+from app.models import ShippingRate, SupplierProduct, SupplierVariantPrice
+from app.services.shipping import (
+    PRINTIFY_DEFAULT_PROVIDER, get_shipping_rate, prefetch_printify_rates, printify_rate_key
+)
+
+
+def choose_print_provider(connection, blueprint_id, country, max_handling_days=None):
+    """
+    Choose the cheapest print provider of a blueprint for a destination.
+
+    Provider prices come from the variant prices stored at catalog sync and
+    shipping from the local rate tables, which are loaded for every provider
+    at once. A provider is compared by its cheapest variant plus the first
+    item shipping to the country.
+
+    Args:
+        connection: Printify SupplierConnection instance
+        blueprint_id: Blueprint ID
+        country: Destination country code
+        max_handling_days: Skip providers with a longer handling time
+
+    Returns:
+        Dict with print_provider_id, base_price, shipping_first_item,
+        shipping_additional_item, currency and handling_days, or None when
+        no provider ships to the country within the handling time
+    """
+    provider_prices = dict(
+        db.session.query(
+            SupplierVariantPrice.print_provider_id, db.func.min(SupplierVariantPrice.price)
+        ).join(SupplierProduct).filter(
+            SupplierProduct.supplier_connection_id == connection.id,
+            SupplierProduct.supplier_product_id == str(blueprint_id),
+            SupplierVariantPrice.print_provider_id.isnot(None)
+        ).group_by(SupplierVariantPrice.print_provider_id)
+    )
+
+    if not provider_prices:
+        # Catalog not synced per provider: quote shipping of the default provider
+        rate = get_shipping_rate(connection, blueprint_id, country, PRINTIFY_DEFAULT_PROVIDER)
+        if not rate:
+            return None
+        return _provider_quote(PRINTIFY_DEFAULT_PROVIDER, None, rate)
+
+    prefetch_printify_rates(connection, blueprint_id, list(provider_prices))
+    rates = _load_provider_rates(connection, blueprint_id, provider_prices, country)
+
+    best = None
+    for provider_id, base_price in provider_prices.items():
+        rate = rates.get(provider_id)
+        if rate is None:
+            continue
+        if max_handling_days is not None and (rate.handling_days or 0) > max_handling_days:
+            continue
+
+        total = base_price + rate.first_item
+        if best is None or total < best[0]:
+            best = (total, provider_id, base_price, rate)
+
+    if best is None:
+        return None
+
+    _, provider_id, base_price, rate = best
+    return _provider_quote(provider_id, base_price, rate.to_dict())
+
+
+def _load_provider_rates(connection, blueprint_id, provider_ids, country):
+    """
+    Load each provider's stored rate to a country.
+
+    Args:
+        connection: Printify SupplierConnection instance
+        blueprint_id: Blueprint ID
+        provider_ids: Print provider IDs
+        country: Destination country code
+
+    Returns:
+        Dict of provider ID -> ShippingRate for providers that ship there
+    """
+    keys = {printify_rate_key(blueprint_id, provider_id): provider_id for provider_id in provider_ids}
+
+    rates = {}
+    for rate in ShippingRate.query.filter(
+        ShippingRate.supplier_connection_id == connection.id,
+        ShippingRate.supplier_product_id.in_(keys),
+        ShippingRate.country.in_([country, ShippingRate.REST_OF_WORLD])
+    ):
+        provider_id = keys[rate.supplier_product_id]
+        # An exact country rate wins over the rest of the world
+        if provider_id not in rates or rate.country == country:
+            rates[provider_id] = rate
+
+    return rates
+
+
+def _provider_quote(provider_id, base_price, rate):
+    """Build a provider quote from its base price and shipping rate."""
+    return {
+        'print_provider_id': provider_id,
+        'base_price': base_price,
+        'shipping_first_item': rate['first_item'],
+        'shipping_additional_item': rate.get('additional_item'),
+        'currency': rate.get('currency', 'USD'),
+        'handling_days': rate.get('handling_days')
+    }
@@ -0,0 +1,193 @@
+"""
+Product type service.
+Normalizes product types to ProductTypeMapping keys and caches the mappings.
+"""
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+from app import db
+from app.models import Product, ProductTypeMapping
+
+
+# Seed data for a fresh database: key -> supplier base product IDs
+DEFAULT_PRODUCT_TYPE_MAPPINGS = {
+    'gildan 18000': {
+        'gelato': 'gildan-18000-heavy-blend-sweatshirt',
+        'printify': '145',  # Blueprint ID
+        'printful': '380'   # Product ID
+    },
+    'gildan 18500': {
+        'gelato': 'gildan-18500-heavy-blend-hoodie',
+        'printify': '77',
+        'printful': '146'
+    },
+    'gildan 5000': {
+        'gelato': 'gildan-5000-heavy-cotton-tee',
+        'printify': '6',
+        'printful': '71'
+    },
+    'gildan 64000': {
+        'gelato': 'gildan-64000-softstyle-tee',
+        'printify': '12',
+        'printful': '19'
+    },
+    'bella canvas 3001': {
+        'gelato': 'bella-canvas-3001-unisex-tee',
+        'printify': '5',
+        'printful': '586'
+    },
+    'bella canvas 3413': {
+        'gelato': 'bella-canvas-3413-triblend',
+        'printify': '162',
+        'printful': '587'
+    },
+    'comfort colors 1717': {
+        'gelato': 'comfort-colors-1717',
+        'printify': '428',
+        'printful': '638'
+    },
+}
+
+_cache = {'mappings': None, 'loaded_at': 0.0}
+_cache_lock = threading.Lock()
+
+
+def init_product_types(app):
+    """
+    Seed product type mappings on a fresh database and key existing products.
+
+    Must run inside an app context after tables are created.
+
+    Args:
+        app: Flask application
+    """
+    if ProductTypeMapping.query.first():
+        return
+
+    db.session.execute(db.insert(ProductTypeMapping), [
+        {
+            'key': key,
+            'display_name': key.title(),
+            'aliases': [key],
+            'supplier_products': supplier_products,
+            'is_active': True
+        }
+        for key, supplier_products in DEFAULT_PRODUCT_TYPE_MAPPINGS.items()
+    ])
+    db.session.commit()
+
+    invalidate_product_type_cache()
+    updated = reindex_product_type_keys()
+    app.logger.info(f"Seeded product type mappings, keyed {updated} products")
+
+
+def get_product_type_mappings():
+    """
+    Get active product type mappings in match priority order.
+
+    Mappings are cached in-process for PRODUCT_TYPE_CACHE_TTL seconds and
+    reloaded immediately after local admin changes.
+
+    Returns:
+        OrderedDict of key -> mapping dict
+    """
+    ttl = current_app.config.get('PRODUCT_TYPE_CACHE_TTL', 60)
+
+    with _cache_lock:
+        mappings = _cache['mappings']
+        if mappings is not None and time.monotonic() - _cache['loaded_at'] < ttl:
+            return mappings
+
+    mappings = OrderedDict(
+        (m.key, m.to_dict())
+        for m in ProductTypeMapping.query.filter_by(is_active=True).order_by(ProductTypeMapping.id)
+    )
+
+    with _cache_lock:
+        _cache['mappings'] = mappings
+        _cache['loaded_at'] = time.monotonic()
+
+    return mappings
+
+
+def invalidate_product_type_cache():
+    """Drop cached mappings so the next lookup reloads them."""
+    with _cache_lock:
+        _cache['mappings'] = None
+
+
+def resolve_product_type_key(product_type):
+    """
+    Map a product type string to its mapping key.
+
+    Args:
+        product_type: Product type (e.g. "Gildan 18000 (Heavy Blend Sweatshirt)")
+
+    Returns:
+        Mapping key or None
+    """
+    if not product_type:
+        return None
+
+    normalized = product_type.lower().split('(')[0].strip()
+
+    for key, mapping in get_product_type_mappings().items():
+        if any(alias in normalized for alias in mapping['aliases'] or [key]):
+            return key
+
+    return None
+
+
+def get_supplier_product_id(product_type_key, supplier_type):
+    """
+    Get a supplier's base product ID for a product type key.
+
+    Args:
+        product_type_key: Mapping key
+        supplier_type: Supplier type
+
+    Returns:
+        Supplier product ID or None
+    """
+    mapping = get_product_type_mappings().get(product_type_key)
+    if not mapping:
+        return None
+    return mapping['supplier_products'].get(supplier_type)
+
+
+def reindex_product_type_keys():
+    """
+    Recompute product_type_key for every product.
+
+    Keys are resolved once per distinct product type, then written with one
+    UPDATE per key.
+
+    Returns:
+        Number of products whose key changed
+    """
+    rows = db.session.query(Product.product_type, Product.product_type_key).distinct().all()
+
+    changes = {}
+    for product_type, current_key in rows:
+        key = resolve_product_type_key(product_type)
+        if key != current_key:
+            changes.setdefault(key, set()).add(product_type)
+
+    updated = 0
+    for key, product_types in changes.items():
+        types = [t for t in product_types if t is not None]
+        condition = Product.product_type.in_(types)
+        if len(types) < len(product_types):
+            condition = db.or_(condition, Product.product_type.is_(None))
+
+        result = db.session.execute(
+            db.update(Product)
+            .where(condition, Product.product_type_key.is_distinct_from(key))
+            .values(product_type_key=key),
+            execution_options={'synchronize_session': False}
+        )
+        updated += result.rowcount
+
+    db.session.commit()
+    return updated
@@ -0,0 +1,307 @@
+"""
+Template publishing service.
+Publishes one template to many shops and designs through a bounded
+concurrent pipeline.
+"""
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from app import db
+from app.models import PublishJob, PublishJobListing, Shop
+from app.services.templates import (
+    load_template_products, build_listing_payload, create_listing
+)
+
+
+# Finished jobs kept per user for progress polling
+MAX_TRACKED_JOBS = 100
+
+# Job statuses once every listing is processed
+FINISHED_STATUSES = ('completed', 'partial', 'failed')
+
+# Listing schedule shared by every publish job in this process
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+class ShopRateLimiter:
+    """
+    Spaces out listing creation per shop.
+
+    Each shop gets its own schedule so a slow Etsy shop never holds back a
+    Shopify shop in the same batch.
+    """
+
+    def __init__(self, rates):
+        """
+        Initialize rate limiter.
+
+        Args:
+            rates: Dict of shop_type -> max listings per second
+        """
+        self.rates = rates
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, shop_id, shop_type):
+        """Block until the shop may receive its next listing."""
+        rate = self.rates.get(shop_type)
+        if not rate:
+            return
+
+        interval = 1.0 / rate
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(shop_id, now))
+            self._next_slot[shop_id] = slot + interval
+
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+def get_shop_rate_limiter(app):
+    """
+    Get the listing rate limiter shared by every publish job in this process.
+
+    Args:
+        app: Flask application
+
+    Returns:
+        ShopRateLimiter instance
+    """
+    global _limiter
+
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = ShopRateLimiter(app.config.get('PUBLISH_SHOP_RATE_LIMITS', {}))
+        return _limiter
+
+
+def _run_job(app, job_id, tasks):
+    """
+    Run every task of a job through the pipeline.
+
+    Args:
+        app: Flask application (workers need their own app context)
+        job_id: PublishJob ID
+        tasks: Task dicts from create_publish_job()
+    """
+    max_workers = app.config.get('PUBLISH_MAX_WORKERS', 4)
+    limiter = get_shop_rate_limiter(app)
+
+    with app.app_context():
+        _set_job(job_id, status='running')
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for index, task in enumerate(tasks):
+            executor.submit(_run_task, app, job_id, limiter, index, task)
+
+    with app.app_context():
+        _finish_job(job_id)
+
+
+def _run_task(app, job_id, limiter, index, task):
+    """Create a single listing and record its outcome."""
+    with app.app_context():
+        try:
+            limiter.wait(task['shop_id'], task['shop_type'])
+            _set_listing(job_id, index, status='running')
+
+            shop = db.session.get(Shop, task['shop_id'])
+            listing = create_listing(shop, task['listing'])
+
+            _set_listing(job_id, index, status='created', listing={
+                'product_id': listing.get('product_id'),
+                'platform': listing.get('platform'),
+                'status': listing.get('status'),
+                'variant_count': listing.get('variant_count')
+            })
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Publish task {index} of job {job_id} failed: {str(e)}")
+            _set_listing(job_id, index, status='failed', error=str(e))
+
+
+def _set_job(job_id, **fields):
+    db.session.execute(
+        db.update(PublishJob).where(PublishJob.id == job_id).values(updated_at=datetime.utcnow(), **fields)
+    )
+    db.session.commit()
+
+
+def _set_listing(job_id, index, **fields):
+    db.session.execute(
+        db.update(PublishJobListing).where(
+            PublishJobListing.job_id == job_id,
+            PublishJobListing.index == index
+        ).values(**fields)
+    )
+    _set_job(job_id)
+
+
+def _finish_job(job_id):
+    """Set a processed job's final status from its listing outcomes."""
+    outcomes = dict(db.session.query(PublishJobListing.status, db.func.count()).filter(
+        PublishJobListing.job_id == job_id
+    ).group_by(PublishJobListing.status).all())
+
+    failed = outcomes.get('failed', 0)
+    if not failed:
+        status = 'completed'
+    elif failed == sum(outcomes.values()):
+        status = 'failed'
+    else:
+        status = 'partial'
+    _set_job(job_id, status=status, finished_at=datetime.utcnow())
+
+
+def create_publish_job(template, shops, designs):
+    """
+    Build every listing payload for a batch publish up front.
+
+    The template is loaded once and each design's variants are expanded
+    once, then shared across all target shops.
+
+    Args:
+        template: ListingTemplate model instance
+        shops: List of Shop model instances
+        designs: List of design dicts (title, description, price, tags, images)
+
+    Returns:
+        Tuple of (PublishJob instance, task dicts for start_publish_job())
+
+    Raises:
+        ValueError: Malformed designs or template without products
+    """
+    if not isinstance(designs, list) or not all(isinstance(design, dict) for design in designs):
+        raise ValueError("designs must be a list of objects")
+
+    _fail_stale_jobs(template.user_id)
+    template_products = load_template_products(template)
+
+    if not template_products:
+        raise ValueError("Template has no products")
+
+    tasks = []
+    for design_index, design in enumerate(designs):
+        listing = build_listing_payload(
+            template,
+            template_products,
+            title=design.get('title'),
+            description=design.get('description'),
+            price=design.get('price'),
+            tags=design.get('tags'),
+            images=design.get('images', [])
+        )
+        for shop in shops:
+            tasks.append({
+                'shop_id': shop.id,
+                'shop_type': shop.shop_type,
+                'design_index': design_index,
+                'listing': listing
+            })
+
+    job = PublishJob(id=uuid.uuid4().hex, user_id=template.user_id, template_id=template.id)
+    db.session.add(job)
+    db.session.flush()
+    db.session.execute(db.insert(PublishJobListing), [
+        {
+            'job_id': job.id,
+            'index': index,
+            'shop_id': task['shop_id'],
+            'shop_type': task['shop_type'],
+            'design': task['design_index'],
+            'title': task['listing']['title'],
+            'status': 'pending'
+        }
+        for index, task in enumerate(tasks)
+    ])
+    _prune_finished_jobs(template.user_id)
+    db.session.commit()
+
+    return job, tasks
+
+
+def start_publish_job(job, tasks, wait=False):
+    """
+    Run a publish job, in the background unless asked to wait.
+
+    Listings are rate limited per shop, so a large batch outlasts a
+    request; callers poll get_publish_job() for progress.
+
+    Args:
+        job: PublishJob instance
+        tasks: Task dicts from create_publish_job()
+        wait: Block until every listing is processed (small batches only)
+
+    Returns:
+        The job
+    """
+    app = current_app._get_current_object()
+
+    if wait:
+        _run_job(app, job.id, tasks)
+        db.session.expire(job)  # Progress was saved from other sessions
+    else:
+        threading.Thread(target=_run_job, args=(app, job.id, tasks), daemon=True).start()
+
+    return job
+
+
+def get_publish_job(job_id, user_id):
+    """
+    Get a publish job owned by a user.
+
+    Jobs are stored, so any worker can report a job another worker runs.
+    Unfinished jobs of the user that made no progress for
+    PUBLISH_JOB_STALE_SECONDS lost their worker and are failed first.
+
+    Args:
+        job_id: Job ID
+        user_id: Owner's user ID
+
+    Returns:
+        PublishJob or None
+    """
+    _fail_stale_jobs(user_id)
+    return PublishJob.query.filter_by(id=job_id, user_id=user_id).first()
+
+
+def _fail_stale_jobs(user_id):
+    """Fail a user's queued or running jobs whose worker stopped reporting progress."""
+    stale_seconds = current_app.config.get('PUBLISH_JOB_STALE_SECONDS', 600)
+    stale = [
+        job_id for job_id, in db.session.query(PublishJob.id).filter(
+            PublishJob.user_id == user_id,
+            PublishJob.status.notin_(FINISHED_STATUSES),
+            PublishJob.updated_at < datetime.utcnow() - timedelta(seconds=stale_seconds)
+        )
+    ]
+    if not stale:
+        return
+
+    db.session.execute(
+        db.update(PublishJobListing).where(
+            PublishJobListing.job_id.in_(stale),
+            PublishJobListing.status.in_(('pending', 'running'))
+        ).values(status='failed', error='Publish job interrupted')
+    )
+    for job_id in stale:
+        _finish_job(job_id)
+
+
+def _prune_finished_jobs(user_id):
+    """Delete a user's finished jobs beyond the newest MAX_TRACKED_JOBS; running jobs are kept."""
+    expired = [
+        job_id for job_id, in db.session.query(PublishJob.id).filter(
+            PublishJob.user_id == user_id,
+            PublishJob.status.in_(FINISHED_STATUSES)
+        ).order_by(PublishJob.finished_at.desc()).offset(MAX_TRACKED_JOBS)
+    ]
+    if expired:
+        db.session.execute(db.delete(PublishJobListing).where(PublishJobListing.job_id.in_(expired)))
+        db.session.execute(db.delete(PublishJob).where(PublishJob.id.in_(expired)))
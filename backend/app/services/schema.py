@@ -0,0 +1,77 @@
+"""
+Schema upgrade service.
+Adds columns and indexes that models gained after their tables were created.
+
+db.create_all() only creates missing tables, so a database created by an
+earlier version keeps its old tables without the newer columns.
+"""
+from sqlalchemy import inspect, literal, text
+from app import db
+
+
+# Tables holding derived rows that are recomputed on demand; their rows are
+# cleared rather than backfilled when columns are added
+DERIVED_TABLES = {'product_comparisons'}
+
+
+def upgrade_schema(app):
+    """
+    Add missing columns and indexes to existing tables.
+
+    Must run inside an app context after db.create_all(). Added columns get
+    their model default: scalar defaults are written as the column DEFAULT,
+    callable defaults (e.g. timestamps) are evaluated once for existing rows.
+
+    Args:
+        app: Flask application
+    """
+    engine = db.engine
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    preparer = engine.dialect.identifier_preparer
+
+    with engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+
+            columns = {column['name'] for column in inspector.get_columns(table.name)}
+            added = [column for column in table.columns if column.name not in columns]
+            for column in added:
+                connection.execute(text(
+                    f'ALTER TABLE {preparer.format_table(table)} ADD COLUMN {_column_ddl(column, engine)}'
+                ))
+                default = column.default
+                if default is not None and default.is_callable:
+                    connection.execute(table.update().values({column.name: default.arg(None)}))
+                app.logger.info(f"Added column {table.name}.{column.name}")
+
+            if added and table.name in DERIVED_TABLES:
+                connection.execute(table.delete())
+
+            indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexes:
+                    index.create(connection)
+                    app.logger.info(f"Added index {index.name}")
+
+
+def _column_ddl(column, engine):
+    """
+    Build the ADD COLUMN definition for a model column.
+
+    NOT NULL is only kept with a scalar default, as existing rows need a value.
+    """
+    dialect = engine.dialect
+    ddl = f'{dialect.identifier_preparer.format_column(column)} {column.type.compile(dialect=dialect)}'
+
+    default = column.default
+    if default is not None and default.is_scalar:
+        value = literal(default.arg, column.type).compile(
+            dialect=dialect, compile_kwargs={'literal_binds': True}
+        )
+        ddl += f' DEFAULT {value}'
+        if not column.nullable:
+            ddl += ' NOT NULL'
+
+    return ddl
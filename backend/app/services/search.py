@@ -0,0 +1,163 @@
+"""
+Search service.
+Indexed substring search over shop listings and supplier catalogs.
+
+SQLite uses external-content FTS5 tables with the trigram tokenizer, kept in
+sync by triggers so every write path (including the sync upserts) updates
+the index. Postgres uses pg_trgm GIN indexes, which serve the same
+ILIKE '%term%' filters from the index. Terms shorter than a trigram fall
+back to a plain ILIKE scan.
+"""
+from flask import current_app
+from sqlalchemy.exc import SQLAlchemyError
+from app import db
+from app.models import Product, SupplierProduct
+
+
+# Trigram indexes cannot serve shorter terms
+MIN_INDEXED_TERM_LENGTH = 3
+
+# Indexed table -> searched columns
+SEARCH_INDEXES = {
+    'products': ('title', 'sku'),
+    'supplier_products': ('name', 'product_type', 'brand')
+}
+
+_MODELS = {
+    'products': Product,
+    'supplier_products': SupplierProduct
+}
+
+
+def init_search(app):
+    """
+    Create search indexes for the configured database.
+
+    Must run inside an app context after tables are created. Records the
+    active backend in app.extensions['search'].
+
+    Args:
+        app: Flask application
+    """
+    dialect = db.engine.dialect.name
+    backend = None
+
+    try:
+        if dialect == 'sqlite':
+            for table, columns in SEARCH_INDEXES.items():
+                _create_fts_index(table, columns)
+            backend = 'fts5'
+        elif dialect == 'postgresql':
+            db.session.execute(db.text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+            for table, columns in SEARCH_INDEXES.items():
+                for column in columns:
+                    db.session.execute(db.text(
+                        f'CREATE INDEX IF NOT EXISTS ix_{table}_{column}_trgm '
+                        f'ON {table} USING gin ({column} gin_trgm_ops)'
+                    ))
+            backend = 'pg_trgm'
+        db.session.commit()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        app.logger.warning(f"Search indexes unavailable, using ILIKE scans: {str(e)}")
+        backend = None
+
+    app.extensions['search'] = {'backend': backend}
+
+
+def search_products(query, term, ranked=False):
+    """
+    Filter a Product query by title/SKU.
+
+    Args:
+        query: Product query
+        term: Search term
+        ranked: Also return a relevance expression to order by
+
+    Returns:
+        Tuple of (filtered query, rank expression or None); lower rank sorts first
+    """
+    return _apply_search(query, 'products', term, ranked)
+
+
+def search_supplier_products(query, term, ranked=False):
+    """
+    Filter a SupplierProduct query by name/product type/brand.
+
+    Args:
+        query: SupplierProduct query
+        term: Search term
+        ranked: Also return a relevance expression to order by
+
+    Returns:
+        Tuple of (filtered query, rank expression or None); lower rank sorts first
+    """
+    return _apply_search(query, 'supplier_products', term, ranked)
+
+
+def _apply_search(query, table, term, ranked):
+    """Apply the indexed search for the active backend."""
+    model = _MODELS[table]
+    columns = [getattr(model, c) for c in SEARCH_INDEXES[table]]
+    backend = current_app.extensions.get('search', {}).get('backend')
+
+    if backend == 'fts5' and len(term) >= MIN_INDEXED_TERM_LENGTH:
+        fts = db.table(f'{table}_fts', db.column('rowid'), db.column('rank'))
+        match = db.literal_column(f'{table}_fts').op('MATCH')(_fts_phrase(term))
+
+        # Run the MATCH once up front; a plain join lets the planner walk
+        # a table index and re-run the MATCH for every row
+        if ranked:
+            matches = db.select(fts.c.rowid, fts.c.rank).where(match) \
+                .cte(f'{table}_matches').prefix_with('MATERIALIZED')
+            query = query.join(matches, matches.c.rowid == model.id)
+            return query, matches.c.rank
+
+        matched = db.select(fts.c.rowid).where(match)
+        return query.filter(model.id.in_(matched)), None
+
+    query = query.filter(db.or_(*[c.ilike(f'%{term}%') for c in columns]))
+
+    if backend == 'pg_trgm' and ranked:
+        rank = -db.func.greatest(*[
+            db.func.similarity(db.func.coalesce(c, ''), term) for c in columns
+        ])
+        return query, rank
+
+    return query, None
+
+
+def _fts_phrase(term):
+    """Quote a term as an FTS5 phrase so it matches as a plain substring."""
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _create_fts_index(table, columns):
+    """Create an FTS5 trigram index and its sync triggers for a table."""
+    fts = f'{table}_fts'
+    exists = db.session.execute(
+        db.text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {'name': fts}
+    ).first()
+    if exists:
+        return
+
+    cols = ', '.join(columns)
+    new_values = ', '.join(f'new.{c}' for c in columns)
+    old_values = ', '.join(f'old.{c}' for c in columns)
+
+    statements = [
+        f"CREATE VIRTUAL TABLE {fts} USING fts5({cols}, content='{table}', "
+        f"content_rowid='id', tokenize='trigram')",
+        f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values}); END",
+        f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values}); END",
+        f"CREATE TRIGGER {fts}_au AFTER UPDATE OF {cols} ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values}); END",
+        # Index rows that existed before the search table
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"
+    ]
+    for statement in statements:
+        db.session.execute(db.text(statement))
@@ -0,0 +1,399 @@
+"""
+Shipping rate service.
+Expands supplier shipping tables into local rates and answers lookups from them.
+"""
+from datetime import datetime, timedelta
+from flask import current_app
+from app import db
+from app.models import ShippingRate, SupplierProduct, SupplierType, SupplierVariantPrice
+from app.services.suppliers.gelato import get_gelato_shipping_cost
+from app.services.suppliers.printify import PrintifyService, get_provider_shipping
+from app.services.suppliers.printful import get_printful_shipping_quotes
+from app.services.tokens import ensure_fresh_token, supplier_api_token
+
+
+# Printify print provider used when a blueprint has no synced providers
+PRINTIFY_DEFAULT_PROVIDER = '99'
+
+# Rate fields stored for a destination a supplier returned no rate for
+MISSING_RATE = {'first_item': None, 'additional_item': None, 'method': None}
+
+
+def get_shipping_rate(connection, supplier_product_id, country, print_provider_id=None):
+    """
+    Get a supplier's shipping rate for one item to a country.
+
+    Rates are read from the local table. A product's table is loaded from
+    the supplier on first use and after SHIPPING_RATE_TTL seconds, for all
+    SHIPPING_COUNTRIES at once, so other destinations need no extra calls.
+    Printful additional item costs are only quoted for the destinations
+    prefetch_printful_rates() was asked for; elsewhere additional_item is
+    None (not quoted) and no call is made for it.
+
+    Args:
+        connection: SupplierConnection instance
+        supplier_product_id: Supplier's base product ID
+        country: Destination country code
+        print_provider_id: Printify print provider (default provider if None)
+
+    Returns:
+        Rate dictionary (first_item, additional_item, currency, method,
+        handling_days) or None
+    """
+    # Gelato shipping methods do not depend on the product
+    if connection.supplier_type == SupplierType.GELATO.value:
+        product_key = ShippingRate.ANY_PRODUCT
+    elif connection.supplier_type == SupplierType.PRINTIFY.value:
+        product_key = printify_rate_key(supplier_product_id, print_provider_id or PRINTIFY_DEFAULT_PROVIDER)
+    else:
+        product_key = str(supplier_product_id)
+
+    rates = _load_rates(connection, product_key, country)
+    rate = rates.get(country) or rates.get(ShippingRate.REST_OF_WORLD)
+
+    return rate.to_dict() if rate and rate.first_item is not None else None
+
+
+def _load_rates(connection, product_key, country):
+    """
+    Load a product's rate table, fetching it when missing or expired.
+
+    Destinations a supplier returns no rate for are stored as misses and
+    not asked again for SHIPPING_MISS_TTL seconds.
+
+    Args:
+        connection: SupplierConnection instance
+        product_key: Rate table key (see get_shipping_rate)
+        country: Destination country that must be covered
+
+    Returns:
+        Dict of country -> ShippingRate
+    """
+    rates = {
+        rate.country: rate for rate in ShippingRate.query.filter_by(
+            supplier_connection_id=connection.id,
+            supplier_product_id=product_key
+        )
+    }
+
+    ttl = current_app.config.get('SHIPPING_RATE_TTL', 24 * 3600)
+    expired_before = datetime.utcnow() - timedelta(seconds=ttl)
+    fresh = bool(rates) and min(rate.fetched_at for rate in rates.values()) >= expired_before
+
+    if fresh:
+        rate = rates.get(country)
+        if rate is not None:
+            # Not shipped there: asked again after SHIPPING_MISS_TTL
+            miss_ttl = current_app.config.get('SHIPPING_MISS_TTL', 3600)
+            if rate.first_item is None and rate.fetched_at < datetime.utcnow() - timedelta(seconds=miss_ttl):
+                _refresh_rate(connection, product_key, rate)
+            return rates
+        if ShippingRate.REST_OF_WORLD in rates:
+            return rates
+        # Printify tables already list every destination served
+        if connection.supplier_type == SupplierType.PRINTIFY.value:
+            return rates
+        # Destination outside the preloaded set
+        countries = [country]
+    else:
+        countries = list(dict.fromkeys(current_app.config.get('SHIPPING_COUNTRIES', []) + [country]))
+
+    fetched = _fetch_rates(connection, product_key, countries, country)
+    if not fetched and not fresh:
+        # Keep serving expired rates while the supplier is unavailable
+        return rates
+    if connection.supplier_type != SupplierType.PRINTIFY.value:
+        fetched = _with_misses(fetched, countries)
+
+    if not fresh:
+        _delete_rates(connection, [product_key])
+        rates = {}
+
+    rates.update(_store_rates(connection, product_key, fetched))
+    db.session.flush()
+    return rates
+
+
+def _refresh_rate(connection, product_key, rate):
+    """Fetch one destination's rate again, updating the stored rate."""
+    fetched = _fetch_rates(connection, product_key, [rate.country], rate.country).get(rate.country)
+    if fetched:
+        for field, value in fetched.items():
+            setattr(rate, field, value)
+        rate.fetched_at = datetime.utcnow()
+    elif rate.first_item is None:
+        rate.fetched_at = datetime.utcnow()  # Still not shipped there
+    db.session.flush()
+
+
+def _with_misses(fetched, countries):
+    """Add negative rates for the countries a supplier returned no rate for."""
+    return {**{country: dict(MISSING_RATE) for country in countries}, **fetched}
+
+
+def prefetch_printify_rates(connection, blueprint_id, provider_ids):
+    """
+    Load the rate tables of many print providers of a blueprint.
+
+    Tables that are missing or expired are fetched concurrently and stored
+    together; tables that fail to load keep their expired rates.
+
+    Args:
+        connection: Printify SupplierConnection instance
+        blueprint_id: Blueprint ID
+        provider_ids: Print provider IDs
+    """
+    keys = {printify_rate_key(blueprint_id, provider_id): provider_id for provider_id in provider_ids}
+
+    fresh = _fresh_tables(connection, list(keys))
+    stale = [provider_id for key, provider_id in keys.items() if key not in fresh]
+    if not stale:
+        return
+
+    responses = get_provider_shipping(
+        supplier_api_token(connection), blueprint_id, stale,
+        max_workers=current_app.config.get('PRINTIFY_PROVIDER_WORKERS', 8)
+    )
+    fetched = {
+        printify_rate_key(blueprint_id, provider_id): _expand_printify_shipping(shipping)
+        for provider_id, shipping in responses.items()
+    }
+    fetched = {key: rates for key, rates in fetched.items() if rates}
+    if not fetched:
+        return
+
+    _replace_rates(connection, fetched)
+
+
+def prefetch_printful_rates(connection, product_ids, country):
+    """
+    Load the rate tables of many Printful products in one batch.
+
+    Missing or expired tables are quoted together for SHIPPING_COUNTRIES and
+    the destination; tables that fail to load keep their expired rates.
+    Additional item costs are quoted for the destination only, also in fresh
+    tables loaded for another destination.
+
+    Args:
+        connection: Printful SupplierConnection instance
+        product_ids: Supplier product IDs
+        country: Destination country that must be covered
+    """
+    fresh = _fresh_tables(connection, product_ids)
+    stale = [product_id for product_id in product_ids if product_id not in fresh]
+
+    if stale:
+        countries = list(dict.fromkeys(current_app.config.get('SHIPPING_COUNTRIES', []) + [country]))
+        fetched = _fetch_printful_rates(connection, stale, countries, country)
+        if fetched:
+            _replace_rates(connection, {
+                product_id: _with_misses(rates, countries) for product_id, rates in fetched.items()
+            })
+
+    unquoted = ShippingRate.query.filter(
+        ShippingRate.supplier_connection_id == connection.id,
+        ShippingRate.supplier_product_id.in_(fresh),
+        ShippingRate.country == country,
+        ShippingRate.first_item.isnot(None),
+        ShippingRate.additional_item.is_(None)
+    ).all() if fresh else []
+    if not unquoted:
+        return
+
+    fetched = _fetch_printful_rates(
+        connection, [rate.supplier_product_id for rate in unquoted], [country], country
+    )
+    for rate in unquoted:
+        quoted = fetched.get(rate.supplier_product_id, {}).get(country)
+        if quoted:
+            rate.additional_item = quoted['additional_item']
+    db.session.flush()
+
+
+def printify_rate_key(blueprint_id, print_provider_id):
+    """Build the rate table key of a Printify blueprint and print provider."""
+    return f'{blueprint_id}:{print_provider_id}'
+
+
+def _fresh_tables(connection, product_keys):
+    """Get the keys of stored rate tables younger than SHIPPING_RATE_TTL."""
+    ttl = current_app.config.get('SHIPPING_RATE_TTL', 24 * 3600)
+    expired_before = datetime.utcnow() - timedelta(seconds=ttl)
+
+    return {
+        key for key, fetched_at in db.session.query(
+            ShippingRate.supplier_product_id, db.func.min(ShippingRate.fetched_at)
+        ).filter(
+            ShippingRate.supplier_connection_id == connection.id,
+            ShippingRate.supplier_product_id.in_(product_keys)
+        ).group_by(ShippingRate.supplier_product_id)
+        if fetched_at >= expired_before
+    }
+
+
+def _replace_rates(connection, tables):
+    """Replace stored rate tables with fetched ones."""
+    _delete_rates(connection, list(tables))
+    for product_key, rates in tables.items():
+        _store_rates(connection, product_key, rates)
+    db.session.flush()
+
+
+def _delete_rates(connection, product_keys):
+    """Delete the stored rate tables of products."""
+    db.session.execute(
+        db.delete(ShippingRate).where(
+            ShippingRate.supplier_connection_id == connection.id,
+            ShippingRate.supplier_product_id.in_(product_keys)
+        ),
+        execution_options={'synchronize_session': False}
+    )
+
+
+def _store_rates(connection, product_key, fetched):
+    """Add fetched rates of a product to the session."""
+    fetched_at = datetime.utcnow()
+    rates = {}
+    for rate_country, data in fetched.items():
+        rate = ShippingRate(
+            supplier_connection_id=connection.id,
+            supplier_product_id=product_key,
+            country=rate_country,
+            fetched_at=fetched_at,
+            **data
+        )
+        db.session.add(rate)
+        rates[rate_country] = rate
+
+    return rates
+
+
+def _fetch_rates(connection, product_key, countries, destination):
+    """
+    Fetch shipping rates from a supplier.
+
+    Args:
+        connection: SupplierConnection instance
+        product_key: Rate table key (see get_shipping_rate)
+        countries: Destinations to fetch where the supplier quotes per country
+        destination: Country being looked up (Printful additional items are quoted there only)
+
+    Returns:
+        Dict of country -> rate fields
+    """
+    if connection.supplier_type == SupplierType.PRINTIFY.value:
+        return _fetch_printify_rates(connection, product_key)
+
+    if connection.supplier_type == SupplierType.PRINTFUL.value:
+        return _fetch_printful_rates(connection, [product_key], countries, destination).get(product_key, {})
+
+    if connection.supplier_type != SupplierType.GELATO.value:
+        return {}
+
+    rates = {}
+    for country in countries:
+        shipping = get_gelato_shipping_cost(
+            connection.api_key, product_key, country=country, access_token=ensure_fresh_token(connection)
+        )
+        if shipping:
+            rates[country] = _rate_fields(shipping)
+
+    return rates
+
+
+def _fetch_printful_rates(connection, product_ids, countries, destination):
+    """
+    Fetch the rate tables of Printful products in one batch.
+
+    Each product is quoted through its cheapest synced variant, for one
+    item everywhere and for two at the destination, so other countries'
+    additional item costs are not quoted (None).
+
+    Args:
+        connection: Printful SupplierConnection instance
+        product_ids: Supplier product IDs
+        countries: Destination country codes
+        destination: Country being looked up
+
+    Returns:
+        Dict of product ID -> country -> rate fields
+    """
+    variants = _representative_variants(connection, product_ids)
+    quotes = get_printful_shipping_quotes(
+        supplier_api_token(connection), set(variants.values()), countries,
+        additional_countries=[destination],
+        max_workers=current_app.config.get('PRINTFUL_SHIPPING_WORKERS', 8)
+    )
+
+    tables = {}
+    for product_id, variant_id in variants.items():
+        for country in countries:
+            shipping = quotes.get((str(variant_id), country))
+            if shipping:
+                tables.setdefault(product_id, {})[country] = _rate_fields(shipping)
+
+    return tables
+
+
+def _rate_fields(shipping):
+    """Convert a supplier shipping cost into rate fields."""
+    return {
+        'first_item': shipping['first_item'],
+        'additional_item': shipping.get('additional_item'),
+        'currency': shipping.get('currency', 'USD'),
+        'method': shipping.get('shipping_method', 'Standard')
+    }
+
+
+def _fetch_printify_rates(connection, product_key):
+    """Fetch the rates of a Printify blueprint:provider key."""
+    blueprint_id, _, provider_id = product_key.partition(':')
+    service = PrintifyService(supplier_api_token(connection))
+    try:
+        shipping = service.get_print_provider_shipping(blueprint_id, provider_id or PRINTIFY_DEFAULT_PROVIDER)
+    except Exception:
+        return {}
+
+    return _expand_printify_shipping(shipping)
+
+
+def _expand_printify_shipping(shipping):
+    """Expand a Printify shipping profile response into per-country rates."""
+    handling_time = shipping.get('handling_time') or {}
+    handling_days = handling_time.get('value') if handling_time.get('unit', 'day') == 'day' else None
+
+    rates = {}
+    for profile in shipping.get('profiles', []):
+        first_item = profile.get('first_item', {})
+        additional_items = profile.get('additional_items', {})
+        data = {
+            'first_item': first_item.get('cost', 0) / 100,
+            'additional_item': additional_items.get('cost', 0) / 100,
+            'currency': first_item.get('currency', 'USD'),
+            'method': 'Standard',
+            'handling_days': handling_days
+        }
+
+        # The first profile listing a country applies to it
+        for country in profile.get('countries', []):
+            if country == 'REST_OF_THE_WORLD':
+                country = ShippingRate.REST_OF_WORLD
+            rates.setdefault(country, data)
+
+    return rates
+
+
+def _representative_variants(connection, product_ids):
+    """Get the cheapest synced variant of Printful products, else the product ID."""
+    rows = db.session.query(
+        SupplierProduct.supplier_product_id, SupplierVariantPrice.supplier_variant_id
+    ).join(SupplierProduct).filter(
+        SupplierProduct.supplier_connection_id == connection.id,
+        SupplierProduct.supplier_product_id.in_(product_ids),
+        SupplierVariantPrice.supplier_variant_id.isnot(None)
+    ).order_by(SupplierVariantPrice.price.desc())
+
+    variants = {product_id: product_id for product_id in product_ids}
+    # Cheapest last so it wins
+    variants.update(rows)
+    return variants
@@ -1,10 +1,14 @@
 """
 Shop services package.
 """
-from app.services.shops.etsy import EtsyService, get_etsy_shops, sync_etsy_listings
-from app.services.shops.shopify import ShopifyService, get_shopify_shop_info, sync_shopify_products
+from app.services.shops.etsy import AsyncEtsyService, EtsyService, get_etsy_shops, sync_etsy_listings
+from app.services.shops.shopify import (
+    AsyncShopifyService, ShopifyService, get_shopify_shop_info, sync_shopify_products
+)
 
 __all__ = [
+    'AsyncEtsyService',
+    'AsyncShopifyService',
     'EtsyService',
     'ShopifyService',
     'get_etsy_shops',
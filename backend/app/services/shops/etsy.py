@@ -2,12 +2,16 @@
 Etsy API service.
 Handles communication with Etsy Open API v3.
 """
-import re
+import asyncio
 import requests
 from flask import current_app
 from datetime import datetime
 from app import db
 from app.models import Product, ProductVariant
+from app.services.async_http import async_available, raise_for_status, run_async, send_request_async
+from app.services.product_types import resolve_product_type_key
+from app.services.sku_classifier import get_sku_classifier
+from app.services.tokens import ensure_fresh_token, token_refresher
 
 
 class EtsyService:
@@ -15,15 +19,22 @@ class EtsyService:
 
     BASE_URL = 'https://openapi.etsy.com/v3'
 
-    def __init__(self, access_token):
+    def __init__(self, access_token, token_refresher=None):
         """
         Initialize Etsy service.
 
         Args:
             access_token: Etsy OAuth access token
+            token_refresher: Optional function of a token rejected with a
+                401 returning a refreshed token or None
         """
-        self.access_token = access_token
         self.api_key = current_app.config.get('ETSY_API_KEY', '')
+        self.token_refresher = token_refresher
+        self.set_access_token(access_token)
+
+    def set_access_token(self, access_token):
+        """Use a new access token for the following calls."""
+        self.access_token = access_token
         self.headers = {
             'Authorization': f'Bearer {access_token}',
             'x-api-key': self.api_key,
@@ -44,6 +55,11 @@ class EtsyService:
         """
         url = f"{self.BASE_URL}/{endpoint}"
         response = requests.request(method, url, headers=self.headers, **kwargs)
+        if response.status_code == 401 and self.token_refresher:
+            access_token = self.token_refresher(self.access_token)
+            if access_token:
+                self.set_access_token(access_token)
+                response = requests.request(method, url, headers=self.headers, **kwargs)
         response.raise_for_status()
         return response.json()
 
@@ -174,6 +190,32 @@ class EtsyService:
         )
 
 
+class AsyncEtsyService(EtsyService):
+    """
+    Etsy service on the async transport.
+
+    Has the methods of EtsyService, returning awaitables. Sync code runs
+    them through run_async().
+    """
+
+    async def _request(self, method, endpoint, **kwargs):
+        """
+        Make async API request to Etsy.
+
+        Args:
+            method: HTTP method
+            endpoint: API endpoint
+            **kwargs: Additional request arguments
+
+        Returns:
+            Response JSON or raises exception
+        """
+        url = f"{self.BASE_URL}/{endpoint}"
+        response = await send_request_async('etsy', method, url, headers=self.headers, **kwargs)
+        raise_for_status(response)
+        return response.json()
+
+
 def get_etsy_shops(access_token):
     """
     Get Etsy shops for the authenticated user.
@@ -219,7 +261,8 @@ def sync_etsy_listings(shop):
     Returns:
         Dict with sync results
     """
-    service = EtsyService(shop.access_token)
+    service = EtsyService(ensure_fresh_token(shop), token_refresher=token_refresher(shop))
+    classifier = get_sku_classifier(shop.user_id)
 
     total = 0
     pod_count = 0
@@ -227,6 +270,9 @@ def sync_etsy_listings(shop):
     limit = 100
 
     while True:
+        # Long syncs outlive access tokens: refresh before each page
+        service.set_access_token(ensure_fresh_token(shop))
+
         listings_data = service.get_listings(
             shop.shop_id,
             state='active',
@@ -238,12 +284,16 @@ def sync_etsy_listings(shop):
         if not listings:
             break
 
+        details = _load_listing_details(service, shop, [listing.get('listing_id') for listing in listings])
+
         for listing in listings:
             listing_id = listing.get('listing_id')
+            inventory, images_data = details[listing_id]
 
             # Get inventory for SKUs
             try:
-                inventory = service.get_listing_inventory(listing_id)
+                if isinstance(inventory, Exception):
+                    raise inventory
                 products = inventory.get('products', [])
 
                 # Check for POD supplier SKU patterns
@@ -257,21 +307,19 @@ def sync_etsy_listings(shop):
                         sku = offering.get('sku', '') or product.get('sku', '')
                         if sku:
                             skus.append(sku)
-                            detected = _detect_supplier_from_sku(sku)
-                            if detected:
-                                supplier_type = detected['supplier']
-                                sku_pattern = detected['pattern']
+
+                # The last SKU with a supplier pattern decides
+                classes = classifier.classify(skus)
+                for sku_class in classes:
+                    if sku_class.supplier:
+                        supplier_type = sku_class.supplier
+                        sku_pattern = sku_class.pattern
 
                 # Get images
-                images = []
-                try:
-                    images_data = service.get_listing_images(listing_id)
-                    images = [
-                        img.get('url_fullxfull') or img.get('url_570xN')
-                        for img in images_data.get('results', [])
-                    ]
-                except Exception:
-                    pass
+                images = [
+                    img.get('url_fullxfull') or img.get('url_570xN')
+                    for img in (images_data or {}).get('results', [])
+                ]
 
                 # Create or update product
                 product = Product.query.filter_by(
@@ -293,7 +341,8 @@ def sync_etsy_listings(shop):
                 product.sku = skus[0] if skus else None
                 product.supplier_type = supplier_type
                 product.sku_pattern = sku_pattern
-                product.product_type = _extract_product_type(skus[0]) if skus else None
+                product.product_type = classes[0].product_type if classes else None
+                product.product_type_key = resolve_product_type_key(product.product_type)
                 product.thumbnail_url = images[0] if images else None
                 product.images = images
                 product.is_active = True
@@ -323,6 +372,81 @@ def sync_etsy_listings(shop):
     }
 
 
+def _load_listing_details(service, shop, listing_ids):
+    """
+    Load the inventory and images of a page of listings.
+
+    On the async transport every call of the page is sent at once;
+    otherwise the listings are loaded one by one. Async calls cannot
+    refresh the token, so the fan-out starts with a fresh one and listings
+    rejected with a 401 are retried once after refreshing it here.
+
+    Args:
+        service: EtsyService instance
+        shop: Shop model instance of the service's token
+        listing_ids: Etsy listing IDs
+
+    Returns:
+        Dict of listing ID -> (inventory or the exception loading it,
+        images response or None)
+    """
+    if not async_available():
+        details = {}
+        for listing_id in listing_ids:
+            try:
+                inventory = service.get_listing_inventory(listing_id)
+            except Exception as e:
+                details[listing_id] = (e, None)
+                continue
+            try:
+                images_data = service.get_listing_images(listing_id)
+            except Exception:
+                images_data = None
+            details[listing_id] = (inventory, images_data)
+        return details
+
+    service.set_access_token(ensure_fresh_token(shop))
+    results = _fan_out_listing_details(service.access_token, listing_ids)
+
+    rejected = [
+        listing_id for listing_id, result in results.items()
+        if any(_is_unauthorized(response) for response in result)
+    ]
+    if rejected and service.token_refresher:
+        access_token = service.token_refresher(service.access_token)
+        if access_token:
+            service.set_access_token(access_token)
+            results.update(_fan_out_listing_details(access_token, rejected))
+
+    return {
+        listing_id: (inventory, None if isinstance(images_data, Exception) else images_data)
+        for listing_id, (inventory, images_data) in results.items()
+    }
+
+
+def _fan_out_listing_details(access_token, listing_ids):
+    """Load the inventory and images of listings at once, keeping each call's exception."""
+    async_service = AsyncEtsyService(access_token)
+
+    async def load(listing_id):
+        return listing_id, tuple(await asyncio.gather(
+            async_service.get_listing_inventory(listing_id),
+            async_service.get_listing_images(listing_id),
+            return_exceptions=True
+        ))
+
+    async def load_all():
+        return dict(await asyncio.gather(*(load(listing_id) for listing_id in listing_ids)))
+
+    return run_async(load_all())
+
+
+def _is_unauthorized(result):
+    """Check whether a call failed with a 401."""
+    response = getattr(result, 'response', None) if isinstance(result, Exception) else None
+    return getattr(response, 'status_code', None) == 401
+
+
 def _sync_etsy_variants(product, etsy_products):
     """
     Sync variants from Etsy product data.
@@ -363,79 +487,3 @@ def _sync_etsy_variants(product, etsy_products):
                 is_available=offering.get('is_enabled', True)
             )
             db.session.add(variant)
-
-
-def _detect_supplier_from_sku(sku):
-    """
-    Detect POD supplier from SKU pattern.
-
-    Args:
-        sku: Product SKU string
-
-    Returns:
-        Dict with supplier and pattern or None
-    """
-    sku_lower = sku.lower()
-
-    # Common SKU patterns for different suppliers
-    patterns = [
-        # Gelato patterns
-        (r'^gel[_-]', 'gelato', 'gel_'),
-        (r'^gelato[_-]', 'gelato', 'gelato_'),
-        (r'^glt[_-]', 'gelato', 'glt_'),
-
-        # Printify patterns
-        (r'^pfy[_-]', 'printify', 'pfy_'),
-        (r'^printify[_-]', 'printify', 'printify_'),
-        (r'^prf[_-]', 'printify', 'prf_'),
-
-        # Printful patterns
-        (r'^pfl[_-]', 'printful', 'pfl_'),
-        (r'^printful[_-]', 'printful', 'printful_'),
-        (r'^pf[_-]', 'printful', 'pf_'),
-
-        # Generic patterns with supplier in SKU
-        (r'gelato', 'gelato', 'gelato'),
-        (r'printify', 'printify', 'printify'),
-        (r'printful', 'printful', 'printful'),
-    ]
-
-    for pattern, supplier, prefix in patterns:
-        if re.search(pattern, sku_lower):
-            return {'supplier': supplier, 'pattern': prefix}
-
-    return None
-
-
-def _extract_product_type(sku):
-    """
-    Extract product type from SKU.
-
-    Args:
-        sku: Product SKU string
-
-    Returns:
-        Product type string or None
-    """
-    if not sku:
-        return None
-
-    # Common product codes in SKUs
-    product_patterns = {
-        r'gildan[_-]?18000': 'Gildan 18000 (Heavy Blend Sweatshirt)',
-        r'gildan[_-]?18500': 'Gildan 18500 (Heavy Blend Hoodie)',
-        r'gildan[_-]?5000': 'Gildan 5000 (Heavy Cotton Tee)',
-        r'gildan[_-]?64000': 'Gildan 64000 (Softstyle Tee)',
-        r'bella[_-]?3001': 'Bella Canvas 3001 (Unisex Jersey Tee)',
-        r'bella[_-]?3413': 'Bella Canvas 3413 (Triblend Tee)',
-        r'comfort[_-]?colors[_-]?1717': 'Comfort Colors 1717 (Garment Dyed Tee)',
-        r'next[_-]?level[_-]?3600': 'Next Level 3600 (Unisex Tee)',
-        r'champion[_-]?s700': 'Champion S700 (Double Dry Tee)',
-    }
-
-    sku_lower = sku.lower()
-    for pattern, product_type in product_patterns.items():
-        if re.search(pattern, sku_lower):
-            return product_type
-
-    return None
@@ -2,12 +2,16 @@
 Shopify API service.
 Handles communication with Shopify Admin API.
 """
-import re
 import requests
+from urllib.parse import parse_qs, urlparse
 from flask import current_app
 from datetime import datetime
 from app import db
 from app.models import Product, ProductVariant
+from app.services.async_http import raise_for_status, send_request_async
+from app.services.http import iter_json_items, send_request
+from app.services.product_types import resolve_product_type_key
+from app.services.sku_classifier import get_sku_classifier
 
 
 class ShopifyService:
@@ -69,6 +73,33 @@ class ShopifyService:
 
         return self._request('GET', 'products.json', params=params)
 
+    def iter_products_page(self, limit=250, page_info=None):
+        """
+        Stream one page of products from shop.
+
+        Args:
+            limit: Number of products (max 250)
+            page_info: Pagination cursor
+
+        Returns:
+            Tuple of (iterator of products, next page cursor or None)
+        """
+        params = {'limit': limit}
+        if page_info:
+            params['page_info'] = page_info
+
+        response = send_request(
+            'shopify', 'GET', f"{self.base_url}/products.json",
+            headers=self.headers, params=params, stream=True
+        )
+        response.raise_for_status()
+
+        # Shopify links the next page in the Link header
+        next_url = response.links.get('next', {}).get('url')
+        next_page_info = parse_qs(urlparse(next_url).query).get('page_info', [None])[0] if next_url else None
+
+        return iter_json_items(response, 'products.item'), next_page_info
+
     def get_product(self, product_id):
         """
         Get product details.
@@ -124,6 +155,57 @@ class ShopifyService:
         )
 
 
+class AsyncShopifyService(ShopifyService):
+    """
+    Shopify service on the async transport.
+
+    Has the methods of ShopifyService, returning awaitables. Sync code runs
+    them through run_async().
+    """
+
+    async def _request(self, method, endpoint, **kwargs):
+        """
+        Make async API request to Shopify.
+
+        Args:
+            method: HTTP method
+            endpoint: API endpoint
+            **kwargs: Additional request arguments
+
+        Returns:
+            Response JSON or raises exception
+        """
+        url = f"{self.base_url}/{endpoint}"
+        response = await send_request_async('shopify', method, url, headers=self.headers, **kwargs)
+        raise_for_status(response)
+        return response.json()
+
+    async def iter_products_page(self, limit=250, page_info=None):
+        """
+        Get one page of products from shop.
+
+        Args:
+            limit: Number of products (max 250)
+            page_info: Pagination cursor
+
+        Returns:
+            Tuple of (list of products, next page cursor or None)
+        """
+        params = {'limit': limit}
+        if page_info:
+            params['page_info'] = page_info
+
+        response = await send_request_async(
+            'shopify', 'GET', f"{self.base_url}/products.json", headers=self.headers, params=params
+        )
+        raise_for_status(response)
+
+        next_url = response.links.get('next', {}).get('url')
+        next_page_info = parse_qs(urlparse(next_url).query).get('page_info', [None])[0] if next_url else None
+
+        return response.json().get('products', []), next_page_info
+
+
 def get_shopify_shop_info(shop_domain, access_token):
     """
     Get Shopify shop information.
@@ -154,6 +236,7 @@ def sync_shopify_products(shop):
         Dict with sync results
     """
     service = ShopifyService(shop.shopify_domain, shop.access_token)
+    classifier = get_sku_classifier(shop.user_id)
 
     total = 0
     pod_count = 0
@@ -161,15 +244,12 @@ def sync_shopify_products(shop):
 
     while True:
         try:
-            products_data = service.get_products(limit=250, page_info=page_info)
+            # Products are parsed one at a time from the streamed page
+            products, page_info = service.iter_products_page(limit=250, page_info=page_info)
         except Exception as e:
             current_app.logger.error(f"Error fetching Shopify products: {str(e)}")
             break
 
-        products = products_data.get('products', [])
-        if not products:
-            break
-
         for shopify_product in products:
             product_id = shopify_product.get('id')
             variants = shopify_product.get('variants', [])
@@ -179,16 +259,17 @@ def sync_shopify_products(shop):
             sku_pattern = None
             first_sku = None
 
-            for variant in variants:
-                sku = variant.get('sku', '')
-                if sku and not first_sku:
-                    first_sku = sku
-                if sku:
-                    detected = _detect_supplier_from_sku(sku)
-                    if detected:
-                        supplier_type = detected['supplier']
-                        sku_pattern = detected['pattern']
-                        break
+            skus = [v.get('sku') for v in variants if v.get('sku')]
+            classes = classifier.classify(skus)
+            if skus:
+                first_sku = skus[0]
+
+            # The first SKU with a supplier pattern decides
+            for sku_class in classes:
+                if sku_class.supplier:
+                    supplier_type = sku_class.supplier
+                    sku_pattern = sku_class.pattern
+                    break
 
             # Get images
             images = [
@@ -220,7 +301,8 @@ def sync_shopify_products(shop):
             product.sku = first_sku
             product.supplier_type = supplier_type
             product.sku_pattern = sku_pattern
-            product.product_type = _extract_product_type(first_sku) or shopify_product.get('product_type')
+            product.product_type = (classes[0].product_type if classes else None) or shopify_product.get('product_type')
+            product.product_type_key = resolve_product_type_key(product.product_type)
             product.category = shopify_product.get('product_type')
             product.thumbnail_url = images[0] if images else None
             product.images = images
@@ -237,8 +319,7 @@ def sync_shopify_products(shop):
 
         db.session.commit()
 
-        # Check for next page (simplified - Shopify uses Link header for pagination)
-        if len(products) < 250:
+        if not page_info:
             break
 
     return {
@@ -291,82 +372,3 @@ def _sync_shopify_variants(product, shopify_variants):
             is_available=sv.get('inventory_quantity', 0) > 0 or sv.get('inventory_policy') == 'continue'
         )
         db.session.add(variant)
-
-
-def _detect_supplier_from_sku(sku):
-    """
-    Detect POD supplier from SKU pattern.
-
-    Args:
-        sku: Product SKU string
-
-    Returns:
-        Dict with supplier and pattern or None
-    """
-    if not sku:
-        return None
-
-    sku_lower = sku.lower()
-
-    # Common SKU patterns for different suppliers
-    patterns = [
-        # Gelato patterns
-        (r'^gel[_-]', 'gelato', 'gel_'),
-        (r'^gelato[_-]', 'gelato', 'gelato_'),
-        (r'^glt[_-]', 'gelato', 'glt_'),
-
-        # Printify patterns
-        (r'^pfy[_-]', 'printify', 'pfy_'),
-        (r'^printify[_-]', 'printify', 'printify_'),
-        (r'^prf[_-]', 'printify', 'prf_'),
-
-        # Printful patterns
-        (r'^pfl[_-]', 'printful', 'pfl_'),
-        (r'^printful[_-]', 'printful', 'printful_'),
-        (r'^pf[_-]', 'printful', 'pf_'),
-
-        # Generic patterns with supplier in SKU
-        (r'gelato', 'gelato', 'gelato'),
-        (r'printify', 'printify', 'printify'),
-        (r'printful', 'printful', 'printful'),
-    ]
-
-    for pattern, supplier, prefix in patterns:
-        if re.search(pattern, sku_lower):
-            return {'supplier': supplier, 'pattern': prefix}
-
-    return None
-
-
-def _extract_product_type(sku):
-    """
-    Extract product type from SKU.
-
-    Args:
-        sku: Product SKU string
-
-    Returns:
-        Product type string or None
-    """
-    if not sku:
-        return None
-
-    # Common product codes in SKUs
-    product_patterns = {
-        r'gildan[_-]?18000': 'Gildan 18000 (Heavy Blend Sweatshirt)',
-        r'gildan[_-]?18500': 'Gildan 18500 (Heavy Blend Hoodie)',
-        r'gildan[_-]?5000': 'Gildan 5000 (Heavy Cotton Tee)',
-        r'gildan[_-]?64000': 'Gildan 64000 (Softstyle Tee)',
-        r'bella[_-]?3001': 'Bella Canvas 3001 (Unisex Jersey Tee)',
-        r'bella[_-]?3413': 'Bella Canvas 3413 (Triblend Tee)',
-        r'comfort[_-]?colors[_-]?1717': 'Comfort Colors 1717 (Garment Dyed Tee)',
-        r'next[_-]?level[_-]?3600': 'Next Level 3600 (Unisex Tee)',
-        r'champion[_-]?s700': 'Champion S700 (Double Dry Tee)',
-    }
-
-    sku_lower = sku.lower()
-    for pattern, product_type in product_patterns.items():
-        if re.search(pattern, sku_lower):
-            return product_type
-
-    return None
@@ -0,0 +1,337 @@
+"""
+SKU classifier.
+Detects the POD supplier and product type encoded in shop SKUs.
+
+Rules are compiled once and applied to a whole batch at a time. Runs of
+start-anchored prefix rules share one alternation regex tried only at the
+start of the SKU; other rules are prefiltered by their required literal
+(e.g. "gildan" in r'gildan[_-]?18000') so their regex only runs on candidate
+SKUs. Rules keep the first-match-wins order of the old per-SKU re.search
+loops.
+"""
+import re
+import threading
+import time
+from collections import namedtuple
+from flask import current_app
+from app.models import SkuRule
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+
+# Built-in supplier rules: (pattern, supplier, label), first match wins
+SUPPLIER_RULES = [
+    # Gelato patterns
+    (r'^gel[_-]', 'gelato', 'gel_'),
+    (r'^gelato[_-]', 'gelato', 'gelato_'),
+    (r'^glt[_-]', 'gelato', 'glt_'),
+
+    # Printify patterns
+    (r'^pfy[_-]', 'printify', 'pfy_'),
+    (r'^printify[_-]', 'printify', 'printify_'),
+    (r'^prf[_-]', 'printify', 'prf_'),
+
+    # Printful patterns
+    (r'^pfl[_-]', 'printful', 'pfl_'),
+    (r'^printful[_-]', 'printful', 'printful_'),
+    (r'^pf[_-]', 'printful', 'pf_'),
+
+    # Generic patterns with supplier in SKU
+    (r'gelato', 'gelato', 'gelato'),
+    (r'printify', 'printify', 'printify'),
+    (r'printful', 'printful', 'printful'),
+]
+
+# Built-in product type rules: (pattern, product_type), first match wins
+PRODUCT_TYPE_RULES = [
+    (r'gildan[_-]?18000', 'Gildan 18000 (Heavy Blend Sweatshirt)'),
+    (r'gildan[_-]?18500', 'Gildan 18500 (Heavy Blend Hoodie)'),
+    (r'gildan[_-]?5000', 'Gildan 5000 (Heavy Cotton Tee)'),
+    (r'gildan[_-]?64000', 'Gildan 64000 (Softstyle Tee)'),
+    (r'bella[_-]?3001', 'Bella Canvas 3001 (Unisex Jersey Tee)'),
+    (r'bella[_-]?3413', 'Bella Canvas 3413 (Triblend Tee)'),
+    (r'comfort[_-]?colors[_-]?1717', 'Comfort Colors 1717 (Garment Dyed Tee)'),
+    (r'next[_-]?level[_-]?3600', 'Next Level 3600 (Unisex Tee)'),
+    (r'champion[_-]?s700', 'Champion S700 (Double Dry Tee)'),
+]
+
+SkuClass = namedtuple('SkuClass', ['supplier', 'pattern', 'product_type'])
+
+# Longest user rule pattern accepted
+MAX_RULE_PATTERN_LENGTH = 100
+
+# Regex parse tree opcodes that repeat a subpattern
+_REPEATS = {
+    sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT, getattr(sre_parse, 'POSSESSIVE_REPEAT', None)
+} - {None}
+
+
+def _compile_rules(patterns):
+    """
+    Compile rules into matching stages in priority order.
+
+    Consecutive start-anchored rules share one alternation regex: tried only
+    at the start of the SKU, its branches run in rule order, so the first
+    branch that matches is the first matching rule. Other rules become
+    single-rule stages with a required-literal prefilter.
+
+    Returns:
+        List of (regex, literal, first rule index) stages
+    """
+    stages = []
+    anchored = []
+
+    def flush_anchored():
+        if anchored:
+            first = anchored[0][0]
+            branches = '|'.join(f'(?P<r{i}>{p[1:]})' for i, p in anchored)
+            stages.append((re.compile(f'(?:{branches})'), None, first))
+            anchored.clear()
+
+    for index, pattern in enumerate(patterns):
+        if pattern.startswith('^') and '|' not in pattern:
+            anchored.append((index, pattern))
+            continue
+        flush_anchored()
+        stages.append((re.compile(pattern), _required_literal(pattern), index))
+
+    flush_anchored()
+    return stages
+
+
+def _required_literal(pattern):
+    """Get a plain substring every match of a pattern must contain, or None."""
+    body = pattern[1:] if pattern.startswith('^') else pattern
+    if '|' in body:
+        return None
+
+    end = 0
+    while end < len(body) and (body[end].isalnum() or body[end] in ' _'):
+        end += 1
+
+    literal = body[:end]
+    # An optional last character is not required
+    if end < len(body) and body[end] in '?*{':
+        literal = literal[:-1]
+
+    return literal or None
+
+
+def _first_rules(stages, texts):
+    """
+    Find the first matching rule for each text.
+
+    Works stage by stage over the whole batch, so each regex is applied in a
+    tight loop and texts leave the batch once matched.
+
+    Args:
+        stages: Output of _compile_rules()
+        texts: Lowercased SKUs (kept in input order for memory locality)
+
+    Returns:
+        Dict of text -> rule index for matched texts
+    """
+    matched = {}
+    pending = texts
+    dropped = 0
+
+    for regex, literal, index in stages:
+        if not pending:
+            break
+
+        if regex.groupindex:
+            # Combined start-anchored rules
+            for text in pending:
+                match = regex.match(text)
+                if match and text not in matched:
+                    matched[text] = int(match.lastgroup[1:])
+                    dropped += 1
+        else:
+            candidates = pending if literal is None else [t for t in pending if literal in t]
+            for text in candidates:
+                if text not in matched and regex.search(text):
+                    matched[text] = index
+                    dropped += 1
+
+        # Shrinking the batch costs a full pass, so only do it when worth it
+        if dropped * 4 >= len(pending):
+            pending = [t for t in pending if t not in matched]
+            dropped = 0
+
+    return matched
+
+
+class SkuClassifier:
+    """Classifies SKUs against compiled supplier and product type rules."""
+
+    def __init__(self, supplier_rules, product_type_rules):
+        """
+        Compile classifier rules.
+
+        Args:
+            supplier_rules: List of (pattern, supplier, label) in priority order
+            product_type_rules: List of (pattern, product_type) in priority order
+        """
+        self._supplier_rules = _compile_rules([r[0] for r in supplier_rules])
+        self._product_type_rules = _compile_rules([r[0] for r in product_type_rules])
+
+        # Shared result for every (supplier rule, product type rule) pair
+        suppliers = [(i, supplier, label) for i, (_, supplier, label) in enumerate(supplier_rules)]
+        product_types = [(i, product_type) for i, (_, product_type) in enumerate(product_type_rules)]
+        self._classes = {
+            (si, pi): SkuClass(supplier, label, product_type)
+            for si, supplier, label in suppliers + [(None, None, None)]
+            for pi, product_type in product_types + [(None, None)]
+        }
+
+    def classify(self, skus):
+        """
+        Classify a batch of SKUs.
+
+        Args:
+            skus: Iterable of SKU strings
+
+        Returns:
+            List of SkuClass (supplier, pattern, product_type), one per SKU;
+            fields are None when nothing matches
+        """
+        texts = [sku.lower() if sku else '' for sku in skus]
+        present = [text for text in texts if text]
+
+        supplier_rule = _first_rules(self._supplier_rules, present).get
+        product_type_rule = _first_rules(self._product_type_rules, present).get
+        classes = self._classes
+
+        return [classes[supplier_rule(text), product_type_rule(text)] for text in texts]
+
+    def classify_one(self, sku):
+        """
+        Classify a single SKU.
+
+        Args:
+            sku: SKU string
+
+        Returns:
+            SkuClass
+        """
+        return self.classify([sku])[0]
+
+
+DEFAULT_CLASSIFIER = SkuClassifier(SUPPLIER_RULES, PRODUCT_TYPE_RULES)
+
+_classifiers = {}
+_classifiers_lock = threading.Lock()
+
+
+def get_sku_classifier(user_id=None):
+    """
+    Get the classifier for a user's SKUs.
+
+    A user's active SkuRules are checked before the built-in rules. Compiled
+    classifiers are cached per user for SKU_RULES_CACHE_TTL seconds.
+
+    Args:
+        user_id: Owner of the SKUs (None for built-in rules only)
+
+    Returns:
+        SkuClassifier instance
+    """
+    if user_id is None:
+        return DEFAULT_CLASSIFIER
+
+    user_id = int(user_id)
+    ttl = current_app.config.get('SKU_RULES_CACHE_TTL', 60)
+
+    with _classifiers_lock:
+        cached = _classifiers.get(user_id)
+        if cached and time.monotonic() - cached[0] < ttl:
+            return cached[1]
+
+    rules = SkuRule.query.filter_by(user_id=user_id, is_active=True).order_by(
+        SkuRule.priority, SkuRule.id
+    ).all()
+
+    # Rules stored before patterns were checked for backtracking are skipped
+    rules = [r for r in rules if validate_rule_pattern(r.pattern) is None]
+
+    if rules:
+        classifier = SkuClassifier(
+            [(r.pattern, r.supplier, r.label or r.supplier) for r in rules
+             if r.rule_type == 'supplier'] + SUPPLIER_RULES,
+            [(r.pattern, r.product_type) for r in rules
+             if r.rule_type == 'product_type'] + PRODUCT_TYPE_RULES
+        )
+    else:
+        classifier = DEFAULT_CLASSIFIER
+
+    with _classifiers_lock:
+        _classifiers[user_id] = (time.monotonic(), classifier)
+
+    return classifier
+
+
+def invalidate_sku_classifier(user_id):
+    """Drop a user's cached classifier after their rules change."""
+    with _classifiers_lock:
+        _classifiers.pop(int(user_id), None)
+
+
+def validate_rule_pattern(pattern):
+    """
+    Check that a pattern can be combined into a classifier.
+
+    User patterns run on every synced SKU, so patterns that can backtrack
+    catastrophically are rejected: a repeat inside a repeat, or
+    alternatives inside a repeat (e.g. (a+)+ or (a|ab)*).
+
+    Args:
+        pattern: Regex pattern
+
+    Returns:
+        Error message or None
+    """
+    if len(pattern) > MAX_RULE_PATTERN_LENGTH:
+        return f'Pattern must be at most {MAX_RULE_PATTERN_LENGTH} characters'
+
+    try:
+        compiled = re.compile(pattern)
+        parsed = sre_parse.parse(pattern)
+    except re.error as e:
+        return f'Invalid pattern: {str(e)}'
+
+    if compiled.groupindex:
+        return 'Named groups are not supported'
+    if re.search(r'\\[1-9]', pattern):
+        return 'Backreferences are not supported'
+    if _has_nested_repeat(parsed, False):
+        return 'Nested repeats and repeated alternatives are not supported'
+
+    return None
+
+
+def _has_nested_repeat(parsed, in_repeat):
+    """Check a regex parse tree for a repeat or alternation inside a repeat."""
+    for op, value in parsed:
+        if op in _REPEATS:
+            _, max_count, subpattern = value
+            repeats = max_count > 1
+            if repeats and in_repeat:
+                return True
+            if _has_nested_repeat(subpattern, in_repeat or repeats):
+                return True
+        elif op is sre_parse.BRANCH:
+            if in_repeat:
+                return True
+            if any(_has_nested_repeat(branch, in_repeat) for branch in value[1]):
+                return True
+        elif op is sre_parse.SUBPATTERN:
+            if _has_nested_repeat(value[-1], in_repeat):
+                return True
+        elif op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+            if _has_nested_repeat(value[1], in_repeat):
+                return True
+    return False
+
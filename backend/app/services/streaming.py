@@ -0,0 +1,66 @@
+"""
+Streaming helpers.
+Newline-delimited JSON responses for large listings.
+"""
+import json
+from flask import Response, request, stream_with_context
+
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+# Rows fetched from the database per round trip while streaming
+STREAM_BATCH_SIZE = 500
+
+
+def wants_ndjson():
+    """
+    Check whether the client asked for an NDJSON stream.
+
+    Returns:
+        True if Accept prefers application/x-ndjson over application/json
+    """
+    best = request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE])
+    return best == NDJSON_MIMETYPE
+
+
+def iter_batches(query, batch_size=STREAM_BATCH_SIZE):
+    """
+    Iterate a query's results in batches without loading them all.
+
+    Args:
+        query: Ordered SQLAlchemy query
+        batch_size: Rows per batch
+
+    Yields:
+        Lists of at most batch_size results
+    """
+    batch = []
+    for item in query.yield_per(batch_size):
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+
+def ndjson_response(rows):
+    """
+    Stream dictionaries as newline-delimited JSON.
+
+    Each row is written as soon as it is produced, so memory stays flat and
+    the first bytes go out before the whole result is built. Rows are
+    produced inside the request context.
+
+    Args:
+        rows: Iterable of JSON-serializable dicts
+
+    Returns:
+        Streaming Flask Response
+    """
+    def generate():
+        for row in rows:
+            yield json.dumps(row, separators=(',', ':'), default=str) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
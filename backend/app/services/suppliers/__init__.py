@@ -1,12 +1,15 @@
 """
 Supplier services package.
 """
-from app.services.suppliers.gelato import GelatoService, validate_gelato_connection
-from app.services.suppliers.printify import PrintifyService, validate_printify_connection
-from app.services.suppliers.printful import PrintfulService, validate_printful_connection
+from app.services.suppliers.gelato import AsyncGelatoService, GelatoService, validate_gelato_connection
+from app.services.suppliers.printify import AsyncPrintifyService, PrintifyService, validate_printify_connection
+from app.services.suppliers.printful import AsyncPrintfulService, PrintfulService, validate_printful_connection
 from app.services.suppliers.sync import sync_supplier_products
 
 __all__ = [
+    'AsyncGelatoService',
+    'AsyncPrintifyService',
+    'AsyncPrintfulService',
     'GelatoService',
     'PrintifyService',
     'PrintfulService',
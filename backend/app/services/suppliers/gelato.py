@@ -4,6 +4,8 @@ Handles communication with Gelato Print on Demand API.
 """
 import requests
 from flask import current_app
+from app.services.async_http import raise_for_status, send_request_async
+from app.services.http import NotModified, request_deadline, send_request
 
 
 class GelatoService:
@@ -11,16 +13,25 @@ class GelatoService:
 
     BASE_URL = 'https://api.gelato.com/v3'
 
-    def __init__(self, api_key=None, access_token=None):
+    def __init__(self, api_key=None, access_token=None, token_refresher=None):
         """
         Initialize Gelato service.
 
         Args:
             api_key: Gelato API key
             access_token: Gelato OAuth access token
+            token_refresher: Optional function of an access token rejected
+                with a 401 returning a refreshed token or None
         """
         self.api_key = api_key
         self.access_token = access_token
+        self.token_refresher = token_refresher
+        self.headers = self._build_headers()
+        self.deadline = request_deadline()
+
+    def set_access_token(self, access_token):
+        """Use a new OAuth access token for the following calls."""
+        self.access_token = access_token
         self.headers = self._build_headers()
 
     def _build_headers(self):
@@ -31,28 +42,43 @@ class GelatoService:
             headers['X-API-KEY'] = self.api_key
         return headers
 
-    def _request(self, method, endpoint, **kwargs):
+    def _request(self, method, endpoint, if_changed=False, **kwargs):
         """
         Make API request to Gelato.
 
         Args:
             method: HTTP method
             endpoint: API endpoint
+            if_changed: Raise NotModified when the cached catalog body is current
             **kwargs: Additional request arguments
 
         Returns:
             Response JSON or raises exception
         """
         url = f"{self.BASE_URL}/{endpoint}"
-        response = requests.request(method, url, headers=self.headers, **kwargs)
+        response = send_request(
+            'gelato', method, url, deadline=self.deadline, headers=self.headers, **kwargs
+        )
+        if response.status_code == 401 and self.access_token and self.token_refresher:
+            access_token = self.token_refresher(self.access_token)
+            if access_token:
+                if response.raw is not None:
+                    response.close()
+                self.set_access_token(access_token)
+                response = send_request(
+                    'gelato', method, url, deadline=self.deadline, headers=self.headers, **kwargs
+                )
         response.raise_for_status()
-        return response.json()
+        data = response.json()
+        if if_changed and response.not_modified:
+            raise NotModified(data, response.cached_at)
+        return data
 
     def get_stores(self):
         """Get all stores associated with the account."""
         return self._request('GET', 'stores')
 
-    def get_products(self, store_id=None, limit=100, offset=0):
+    def get_products(self, store_id=None, limit=100, offset=0, if_changed=False):
         """
         Get available products catalog.
 
@@ -60,6 +86,7 @@ class GelatoService:
             store_id: Optional store ID filter
             limit: Number of products to fetch
             offset: Pagination offset
+            if_changed: Raise NotModified when the cached page is current
 
         Returns:
             List of products
@@ -67,7 +94,7 @@ class GelatoService:
         params = {'limit': limit, 'offset': offset}
         if store_id:
             params['storeId'] = store_id
-        return self._request('GET', 'products', params=params)
+        return self._request('GET', 'products', params=params, revalidate=True, if_changed=if_changed)
 
     def get_product(self, product_uid):
         """
@@ -143,6 +170,38 @@ class GelatoService:
         return self._request('POST', 'products', json=product_data)
 
 
+class AsyncGelatoService(GelatoService):
+    """
+    Gelato service on the async transport.
+
+    Has the methods of GelatoService, returning awaitables. Sync code runs
+    them through run_async().
+    """
+
+    async def _request(self, method, endpoint, if_changed=False, revalidate=False, **kwargs):
+        """
+        Make async API request to Gelato.
+
+        Responses are not revalidated, so if_changed never raises NotModified.
+
+        Args:
+            method: HTTP method
+            endpoint: API endpoint
+            if_changed: Accepted for GelatoService compatibility
+            revalidate: Accepted for GelatoService compatibility
+            **kwargs: Additional request arguments
+
+        Returns:
+            Response JSON or raises exception
+        """
+        url = f"{self.BASE_URL}/{endpoint}"
+        response = await send_request_async(
+            'gelato', method, url, deadline=self.deadline, headers=self.headers, **kwargs
+        )
+        raise_for_status(response)
+        return response.json()
+
+
 def validate_gelato_connection(api_key=None, access_token=None):
     """
     Validate Gelato API connection.
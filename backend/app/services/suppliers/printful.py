@@ -2,8 +2,27 @@
 Printful API service.
 Handles communication with Printful Print on Demand API.
 """
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import requests
 from flask import current_app
+from app.services.async_http import async_available, raise_for_status, run_async, send_request_async
+from app.services.http import NotModified, iter_json_items, request_deadline, send_request
+
+
+# States required in rate requests for these countries
+RECIPIENT_STATES = {'US': 'CA', 'CA': 'ON', 'AU': 'NSW'}
+
+# Shipping quotes kept per process
+SHIPPING_CACHE_SIZE = 10000
+
+# (variant ID, country) -> (cached at, shipping quote, additional item quoted),
+# least recently used first
+_shipping_cache = OrderedDict()
+_shipping_cache_lock = threading.Lock()
 
 
 class PrintfulService:
@@ -11,56 +30,126 @@ class PrintfulService:
 
     BASE_URL = 'https://api.printful.com'
 
-    def __init__(self, api_key):
+    def __init__(self, api_key, token_refresher=None):
         """
         Initialize Printful service.
 
         Args:
-            api_key: Printful API key
+            api_key: Printful API key or OAuth access token
+            token_refresher: Optional function of a token rejected with a
+                401 returning a refreshed token or None
         """
+        self.token_refresher = token_refresher
+        self.set_api_key(api_key)
+        self.deadline = request_deadline()
+
+    def set_api_key(self, api_key):
+        """Use a new key or token for the following calls."""
         self.api_key = api_key
         self.headers = {
             'Authorization': f'Bearer {api_key}',
             'Content-Type': 'application/json'
         }
 
-    def _request(self, method, endpoint, **kwargs):
+    def _send(self, method, url, **kwargs):
+        """Send a call, retrying once with a refreshed token after a 401."""
+        response = send_request(
+            'printful', method, url, deadline=self.deadline, headers=self.headers, **kwargs
+        )
+        if response.status_code == 401 and self.token_refresher:
+            api_key = self.token_refresher(self.api_key)
+            if api_key:
+                if response.raw is not None:
+                    response.close()
+                self.set_api_key(api_key)
+                response = send_request(
+                    'printful', method, url, deadline=self.deadline, headers=self.headers, **kwargs
+                )
+        return response
+
+    def _request(self, method, endpoint, if_changed=False, **kwargs):
         """
         Make API request to Printful.
 
         Args:
             method: HTTP method
             endpoint: API endpoint
+            if_changed: Raise NotModified when the cached catalog body is current
             **kwargs: Additional request arguments
 
         Returns:
             Response JSON or raises exception
         """
         url = f"{self.BASE_URL}/{endpoint}"
-        response = requests.request(method, url, headers=self.headers, **kwargs)
+        response = self._send(method, url, **kwargs)
         response.raise_for_status()
         data = response.json()
-        return data.get('result', data)
+        data = data.get('result', data)
+        if if_changed and response.not_modified:
+            raise NotModified(data, response.cached_at)
+        return data
+
+    def _stream(self, endpoint, prefix, if_changed=False, **kwargs):
+        """
+        Stream the items of a JSON array from a Printful GET.
+
+        Args:
+            endpoint: API endpoint
+            prefix: ijson path of the array items
+            if_changed: Raise NotModified when the cached catalog body is current
+            **kwargs: Additional request arguments
+
+        Returns:
+            Iterator of items or raises exception
+        """
+        url = f"{self.BASE_URL}/{endpoint}"
+        response = self._send('GET', url, revalidate=True, stream=True, **kwargs)
+        response.raise_for_status()
+        items = iter_json_items(response, prefix)
+        if if_changed and response.not_modified:
+            raise NotModified(items, response.cached_at)
+        return items
 
     def get_store_info(self):
         """Get store information."""
         return self._request('GET', 'store')
 
-    def get_products(self):
-        """Get catalog of available products."""
-        return self._request('GET', 'products')
+    def get_products(self, if_changed=False):
+        """
+        Get catalog of available products.
+
+        Args:
+            if_changed: Raise NotModified when the cached catalog is current
+
+        Returns:
+            List of products
+        """
+        return self._request('GET', 'products', revalidate=True, if_changed=if_changed)
+
+    def iter_products(self, if_changed=False):
+        """
+        Stream the catalog of available products one at a time.
 
-    def get_product(self, product_id):
+        Args:
+            if_changed: Raise NotModified when the cached catalog is current
+
+        Returns:
+            Iterator of products
+        """
+        return self._stream('products', 'result.item', if_changed=if_changed)
+
+    def get_product(self, product_id, if_changed=False):
         """
         Get specific product details.
 
         Args:
             product_id: Printful product ID
+            if_changed: Raise NotModified when the cached details are current
 
         Returns:
             Product details including variants
         """
-        return self._request('GET', f'products/{product_id}')
+        return self._request('GET', f'products/{product_id}', revalidate=True, if_changed=if_changed)
 
     def get_variant(self, variant_id):
         """
@@ -171,6 +260,43 @@ class PrintfulService:
         return self._request('POST', 'orders/estimate-costs', json=order_data)
 
 
+class AsyncPrintfulService(PrintfulService):
+    """
+    Printful service on the async transport.
+
+    Has the methods of PrintfulService, returning awaitables. Sync code runs
+    them through run_async().
+    """
+
+    async def _request(self, method, endpoint, if_changed=False, revalidate=False, **kwargs):
+        """
+        Make async API request to Printful.
+
+        Responses are not revalidated, so if_changed never raises NotModified.
+
+        Args:
+            method: HTTP method
+            endpoint: API endpoint
+            if_changed: Accepted for PrintfulService compatibility
+            revalidate: Accepted for PrintfulService compatibility
+            **kwargs: Additional request arguments
+
+        Returns:
+            Response JSON or raises exception
+        """
+        url = f"{self.BASE_URL}/{endpoint}"
+        response = await send_request_async(
+            'printful', method, url, deadline=self.deadline, headers=self.headers, **kwargs
+        )
+        raise_for_status(response)
+        data = response.json()
+        return data.get('result', data)
+
+    async def iter_products(self, if_changed=False):
+        """Get the catalog of available products; the async transport reads the body whole."""
+        return await self.get_products()
+
+
 def validate_printful_connection(api_key):
     """
     Validate Printful API connection.
@@ -246,44 +372,154 @@ def get_printful_shipping_cost(api_key, variant_id, country='US', quantity=1):
     Returns:
         Shipping cost information
     """
-    service = PrintfulService(api_key)
-    try:
-        rates = service.get_shipping_rates(
-            recipient={
-                'country_code': country,
-                'state_code': None,
-                'city': 'Anytown',
-                'zip': '12345'
-            },
-            items=[{
-                'variant_id': variant_id,
-                'quantity': quantity
-            }]
-        )
+    quote = get_printful_shipping_quotes(api_key, [variant_id], [country]).get((str(variant_id), country))
+    if not quote:
+        return None
 
-        # Get standard shipping
-        standard = next(
-            (r for r in rates if r.get('id') == 'STANDARD'),
-            rates[0] if rates else None
-        )
+    return {
+        **quote,
+        'total': round(quote['first_item'] + (quote['additional_item'] or 0) * (quantity - 1), 2)
+    }
 
-        if standard:
-            total = float(standard.get('rate', 0))
-            # Estimate per-item costs
-            if quantity > 1:
-                first_item = total * 0.7  # Approximate
-                additional = (total - first_item) / (quantity - 1)
-            else:
-                first_item = total
-                additional = total * 0.3  # Approximate for additional items
-
-            return {
-                'first_item': round(first_item, 2),
-                'additional_item': round(additional, 2),
-                'total': total,
-                'currency': standard.get('currency', 'USD'),
-                'shipping_method': standard.get('name', 'Standard')
-            }
-        return None
-    except Exception:
+
+def get_printful_shipping_quotes(api_key, variant_ids, countries, additional_countries=None,
+                                 ttl=None, max_workers=8):
+    """
+    Get first and additional item shipping costs of many variants.
+
+    Printful prices shipping per order, so each variant is quoted for one
+    item and, for additional_countries, also for two; the difference is the
+    true additional item cost. Elsewhere additional_item is None, saving a
+    call per variant and country. Quotes missing from the process cache are
+    requested concurrently, all at once on the async transport when
+    available, and cached per variant and country.
+
+    Args:
+        api_key: Printful API key
+        variant_ids: Variant IDs
+        countries: Destination country codes
+        additional_countries: Countries to quote additional items for (all if None)
+        ttl: Seconds quotes are cached (SHIPPING_RATE_TTL if None)
+        max_workers: Concurrent requests without the async transport
+
+    Returns:
+        Dict of (variant ID, country) -> first_item, additional_item,
+        currency and shipping_method; failed quotes are left out
+    """
+    if ttl is None:
+        ttl = current_app.config.get('SHIPPING_RATE_TTL', 24 * 3600)
+    additional = set(countries if additional_countries is None else additional_countries)
+
+    wanted = {(str(variant_id), country) for variant_id in variant_ids for country in countries}
+    now = time.monotonic()
+    quotes = {}
+    with _shipping_cache_lock:
+        for key in wanted:
+            cached = _shipping_cache.get(key)
+            if not cached:
+                continue
+            cached_at, quote, quoted_additional = cached
+            if now - cached_at >= ttl:
+                del _shipping_cache[key]
+            elif quoted_additional or key[1] not in additional:
+                _shipping_cache.move_to_end(key)
+                quotes[key] = quote
+
+    missing = sorted(wanted - set(quotes))
+    if not missing:
+        return quotes
+
+    if async_available():
+        results = run_async(_quote_all_shipping(AsyncPrintfulService(api_key), missing, additional))
+    else:
+        service = PrintfulService(api_key)
+
+        def load(key):
+            try:
+                return key, _quote_variant_shipping(service, *key, key[1] in additional)
+            except Exception:
+                return key, None
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(missing))) as executor:
+            results = list(executor.map(load, missing))
+    results = [(key, quote) for key, quote in results if quote]
+
+    with _shipping_cache_lock:
+        for key, quote in results:
+            _shipping_cache[key] = (now, quote, key[1] in additional)
+            _shipping_cache.move_to_end(key)
+            quotes[key] = quote
+        while len(_shipping_cache) > SHIPPING_CACHE_SIZE:
+            _shipping_cache.popitem(last=False)
+
+    return quotes
+
+
+async def _quote_all_shipping(service, keys, additional):
+    """Quote the shipping of many (variant ID, country) keys at once on the async transport."""
+    async def load(key):
+        variant_id, country = key
+        recipient = _shipping_recipient(country)
+        quantities = (1, 2) if country in additional else (1,)
+        try:
+            rates = await asyncio.gather(*(
+                service.get_shipping_rates(
+                    recipient=recipient, items=[{'variant_id': variant_id, 'quantity': quantity}]
+                )
+                for quantity in quantities
+            ))
+        except Exception:
+            return key, None
+        return key, _shipping_quote(*rates)
+
+    return await asyncio.gather(*(load(key) for key in keys))
+
+
+def _quote_variant_shipping(service, variant_id, country, quote_additional=True):
+    """Quote one variant's standard shipping for one item, and for two when quoting additional items."""
+    recipient = _shipping_recipient(country)
+
+    single = service.get_shipping_rates(
+        recipient=recipient, items=[{'variant_id': variant_id, 'quantity': 1}]
+    )
+    if not quote_additional:
+        return _shipping_quote(single)
+
+    double = service.get_shipping_rates(
+        recipient=recipient, items=[{'variant_id': variant_id, 'quantity': 2}]
+    )
+    return _shipping_quote(single, double)
+
+
+def _shipping_recipient(country):
+    """Build the shipping rates recipient of a country."""
+    recipient = {'country_code': country}
+    if country in RECIPIENT_STATES:
+        recipient['state_code'] = RECIPIENT_STATES[country]
+    return recipient
+
+
+def _shipping_quote(single_rates, double_rates=None):
+    """Derive first and additional item costs from the rates of one and two items."""
+    single = _standard_rate(single_rates)
+    double = _standard_rate(double_rates or [])
+    if not single:
         return None
+
+    first_item = float(single.get('rate', 0))
+    additional = float(double.get('rate', 0)) - first_item if double else None
+
+    return {
+        'first_item': round(first_item, 2),
+        'additional_item': round(max(additional, 0), 2) if additional is not None else None,
+        'currency': single.get('currency', 'USD'),
+        'shipping_method': single.get('name', 'Standard')
+    }
+
+
+def _standard_rate(rates):
+    """Pick the standard rate from a shipping rates response."""
+    return next(
+        (r for r in rates if r.get('id') == 'STANDARD'),
+        rates[0] if rates else None
+    )
@@ -2,8 +2,11 @@
 Printify API service.
 Handles communication with Printify Print on Demand API.
 """
+from concurrent.futures import ThreadPoolExecutor
 import requests
 from flask import current_app
+from app.services.async_http import raise_for_status, send_request_async
+from app.services.http import NotModified, iter_json_items, request_deadline, send_request
 
 
 class PrintifyService:
@@ -11,35 +14,84 @@ class PrintifyService:
 
     BASE_URL = 'https://api.printify.com/v1'
 
-    def __init__(self, api_token):
+    def __init__(self, api_token, token_refresher=None):
         """
         Initialize Printify service.
 
         Args:
-            api_token: Printify API token
+            api_token: Printify API token or OAuth access token
+            token_refresher: Optional function of a token rejected with a
+                401 returning a refreshed token or None
         """
+        self.token_refresher = token_refresher
+        self.set_api_token(api_token)
+        self.deadline = request_deadline()
+
+    def set_api_token(self, api_token):
+        """Use a new token for the following calls."""
         self.api_token = api_token
         self.headers = {
             'Authorization': f'Bearer {api_token}',
             'Content-Type': 'application/json'
         }
 
-    def _request(self, method, endpoint, **kwargs):
+    def _send(self, method, url, **kwargs):
+        """Send a call, retrying once with a refreshed token after a 401."""
+        response = send_request(
+            'printify', method, url, deadline=self.deadline, headers=self.headers, **kwargs
+        )
+        if response.status_code == 401 and self.token_refresher:
+            api_token = self.token_refresher(self.api_token)
+            if api_token:
+                if response.raw is not None:
+                    response.close()
+                self.set_api_token(api_token)
+                response = send_request(
+                    'printify', method, url, deadline=self.deadline, headers=self.headers, **kwargs
+                )
+        return response
+
+    def _request(self, method, endpoint, if_changed=False, **kwargs):
         """
         Make API request to Printify.
 
         Args:
             method: HTTP method
             endpoint: API endpoint
+            if_changed: Raise NotModified when the cached catalog body is current
             **kwargs: Additional request arguments
 
         Returns:
             Response JSON or raises exception
         """
         url = f"{self.BASE_URL}/{endpoint}"
-        response = requests.request(method, url, headers=self.headers, **kwargs)
+        response = self._send(method, url, **kwargs)
         response.raise_for_status()
-        return response.json()
+        data = response.json()
+        if if_changed and response.not_modified:
+            raise NotModified(data, response.cached_at)
+        return data
+
+    def _stream(self, endpoint, prefix, if_changed=False, **kwargs):
+        """
+        Stream the items of a JSON array from a Printify GET.
+
+        Args:
+            endpoint: API endpoint
+            prefix: ijson path of the array items
+            if_changed: Raise NotModified when the cached catalog body is current
+            **kwargs: Additional request arguments
+
+        Returns:
+            Iterator of items or raises exception
+        """
+        url = f"{self.BASE_URL}/{endpoint}"
+        response = self._send('GET', url, revalidate=True, stream=True, **kwargs)
+        response.raise_for_status()
+        items = iter_json_items(response, prefix)
+        if if_changed and response.not_modified:
+            raise NotModified(items, response.cached_at)
+        return items
 
     def get_shops(self):
         """Get all shops associated with the account."""
@@ -49,9 +101,29 @@ class PrintifyService:
         """Get specific shop details."""
         return self._request('GET', f'shops/{shop_id}.json')
 
-    def get_blueprints(self):
-        """Get all available product blueprints (catalog)."""
-        return self._request('GET', 'catalog/blueprints.json')
+    def get_blueprints(self, if_changed=False):
+        """
+        Get all available product blueprints (catalog).
+
+        Args:
+            if_changed: Raise NotModified when the cached catalog is current
+
+        Returns:
+            List of blueprints
+        """
+        return self._request('GET', 'catalog/blueprints.json', revalidate=True, if_changed=if_changed)
+
+    def iter_blueprints(self, if_changed=False):
+        """
+        Stream all available product blueprints one at a time.
+
+        Args:
+            if_changed: Raise NotModified when the cached catalog is current
+
+        Returns:
+            Iterator of blueprints
+        """
+        return self._stream('catalog/blueprints.json', 'item', if_changed=if_changed)
 
     def get_blueprint(self, blueprint_id):
         """
@@ -75,22 +147,27 @@ class PrintifyService:
         Returns:
             List of available print providers
         """
-        return self._request('GET', f'catalog/blueprints/{blueprint_id}/print_providers.json')
+        return self._request(
+            'GET', f'catalog/blueprints/{blueprint_id}/print_providers.json', revalidate=True
+        )
 
-    def get_print_provider_variants(self, blueprint_id, print_provider_id):
+    def get_print_provider_variants(self, blueprint_id, print_provider_id, if_changed=False):
         """
         Get variants available from a print provider.
 
         Args:
             blueprint_id: Printify blueprint ID
             print_provider_id: Print provider ID
+            if_changed: Raise NotModified when the cached variants are current
 
         Returns:
             Available variants with pricing
         """
         return self._request(
             'GET',
-            f'catalog/blueprints/{blueprint_id}/print_providers/{print_provider_id}/variants.json'
+            f'catalog/blueprints/{blueprint_id}/print_providers/{print_provider_id}/variants.json',
+            revalidate=True,
+            if_changed=if_changed
         )
 
     def get_print_provider_shipping(self, blueprint_id, print_provider_id):
@@ -106,7 +183,8 @@ class PrintifyService:
         """
         return self._request(
             'GET',
-            f'catalog/blueprints/{blueprint_id}/print_providers/{print_provider_id}/shipping.json'
+            f'catalog/blueprints/{blueprint_id}/print_providers/{print_provider_id}/shipping.json',
+            revalidate=True
         )
 
     def get_products(self, shop_id, page=1, limit=100):
@@ -184,6 +262,42 @@ class PrintifyService:
         return self._request('POST', f'shops/{shop_id}/orders.json', json=order_data)
 
 
+class AsyncPrintifyService(PrintifyService):
+    """
+    Printify service on the async transport.
+
+    Has the methods of PrintifyService, returning awaitables. Sync code runs
+    them through run_async().
+    """
+
+    async def _request(self, method, endpoint, if_changed=False, revalidate=False, **kwargs):
+        """
+        Make async API request to Printify.
+
+        Responses are not revalidated, so if_changed never raises NotModified.
+
+        Args:
+            method: HTTP method
+            endpoint: API endpoint
+            if_changed: Accepted for PrintifyService compatibility
+            revalidate: Accepted for PrintifyService compatibility
+            **kwargs: Additional request arguments
+
+        Returns:
+            Response JSON or raises exception
+        """
+        url = f"{self.BASE_URL}/{endpoint}"
+        response = await send_request_async(
+            'printify', method, url, deadline=self.deadline, headers=self.headers, **kwargs
+        )
+        raise_for_status(response)
+        return response.json()
+
+    async def iter_blueprints(self, if_changed=False):
+        """Get all available product blueprints; the async transport reads the body whole."""
+        return await self.get_blueprints()
+
+
 def validate_printify_connection(api_token, shop_id=None):
     """
     Validate Printify API connection.
@@ -213,6 +327,79 @@ def validate_printify_connection(api_token, shop_id=None):
         return False, {'error': str(e)}
 
 
+def get_blueprint_provider_variants(api_token, blueprint_id, max_workers=8):
+    """
+    Get the variants of every print provider of a blueprint.
+
+    Provider variant lists are requested concurrently. Providers whose
+    variants cannot be loaded are left out.
+
+    Args:
+        api_token: Printify API token
+        blueprint_id: Blueprint ID
+        max_workers: Concurrent requests
+
+    Returns:
+        List of provider dicts with 'id', 'title', 'variants' and
+        'cached_at' (download time of unchanged variants, else None)
+    """
+    service = PrintifyService(api_token)
+    providers = service.get_blueprint_print_providers(blueprint_id)
+
+    def load(provider):
+        cached_at = None
+        try:
+            variants = service.get_print_provider_variants(blueprint_id, provider.get('id'), if_changed=True)
+        except NotModified as e:
+            variants, cached_at = e.data, e.cached_at
+        except Exception:
+            return None
+        return {
+            'id': str(provider.get('id')),
+            'title': provider.get('title'),
+            'variants': variants.get('variants', []),
+            'cached_at': cached_at
+        }
+
+    if not providers:
+        return []
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(providers))) as executor:
+        results = list(executor.map(load, providers))
+
+    return [r for r in results if r and r['variants']]
+
+
+def get_provider_shipping(api_token, blueprint_id, provider_ids, max_workers=8):
+    """
+    Get shipping profiles of many print providers of a blueprint.
+
+    Args:
+        api_token: Printify API token
+        blueprint_id: Blueprint ID
+        provider_ids: Print provider IDs
+        max_workers: Concurrent requests
+
+    Returns:
+        Dict of provider ID -> shipping response, failed providers left out
+    """
+    service = PrintifyService(api_token)
+
+    def load(provider_id):
+        try:
+            return provider_id, service.get_print_provider_shipping(blueprint_id, provider_id)
+        except Exception:
+            return provider_id, None
+
+    if not provider_ids:
+        return {}
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(provider_ids))) as executor:
+        results = list(executor.map(load, provider_ids))
+
+    return {provider_id: shipping for provider_id, shipping in results if shipping}
+
+
 def get_printify_product_pricing(api_token, blueprint_id, print_provider_id):
     """
     Get product pricing from Printify.
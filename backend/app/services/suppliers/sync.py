@@ -3,11 +3,15 @@ Supplier product synchronization service.
 Handles syncing product catalogs from POD suppliers.
 """
 from datetime import datetime
+from flask import current_app
 from app import db
-from app.models import SupplierConnection, SupplierProduct, SupplierType
+from app.models import SupplierConnection, SupplierProduct, SupplierType, SupplierVariantPrice
+from app.services.http import NotModified
 from app.services.suppliers.gelato import GelatoService
-from app.services.suppliers.printify import PrintifyService
+from app.services.suppliers.printify import PrintifyService, get_blueprint_provider_variants
 from app.services.suppliers.printful import PrintfulService
+from app.services.matching import index_supplier_products, index_unindexed_supplier_products
+from app.services.tokens import ensure_fresh_token, supplier_api_token, token_refresher
 
 
 def sync_supplier_products(connection):
@@ -20,6 +24,10 @@ def sync_supplier_products(connection):
     Returns:
         Dict with sync results
     """
+    # Catalog rows synced before the match index existed
+    if index_unindexed_supplier_products(connection):
+        db.session.commit()
+
     if connection.supplier_type == SupplierType.GELATO.value:
         return _sync_gelato_products(connection)
     elif connection.supplier_type == SupplierType.PRINTIFY.value:
@@ -32,8 +40,13 @@ def sync_supplier_products(connection):
 
 def _sync_gelato_products(connection):
     """Sync products from Gelato."""
-    service = GelatoService(api_key=connection.api_key, access_token=connection.access_token)
+    service = GelatoService(
+        api_key=connection.api_key,
+        access_token=ensure_fresh_token(connection),
+        token_refresher=token_refresher(connection)
+    )
     count = 0
+    unchanged = 0
 
     try:
         # Fetch products from Gelato catalog
@@ -41,16 +54,31 @@ def _sync_gelato_products(connection):
         limit = 100
 
         while True:
-            products_response = service.get_products(
-                store_id=connection.store_id,
-                limit=limit,
-                offset=offset
-            )
+            # Long syncs outlive access tokens: refresh before each page
+            if service.access_token:
+                service.set_access_token(ensure_fresh_token(connection))
+
+            page_changed = True
+            try:
+                products_response = service.get_products(
+                    store_id=connection.store_id,
+                    limit=limit,
+                    offset=offset,
+                    if_changed=True
+                )
+            except NotModified as e:
+                products_response = e.data
+                page_changed = not _synced_since(connection, e.cached_at)
 
             products = products_response.get('products', [])
             if not products:
                 break
 
+            if not page_changed:
+                # Page already stored by an earlier sync
+                unchanged += len(products)
+                products = []
+
             for product in products:
                 _upsert_supplier_product(
                     connection=connection,
@@ -73,10 +101,10 @@ def _sync_gelato_products(connection):
                 count += 1
 
             offset += limit
-            if len(products) < limit:
+            if len(products_response.get('products', [])) < limit:
                 break
 
-        return {'count': count, 'status': 'success'}
+        return {'count': count, 'unchanged': unchanged, 'status': 'success'}
 
     except Exception as e:
         raise Exception(f"Failed to sync Gelato products: {str(e)}")
@@ -84,80 +112,98 @@ def _sync_gelato_products(connection):
 
 def _sync_printify_products(connection):
     """Sync products/blueprints from Printify."""
-    service = PrintifyService(connection.api_key)
+    service = PrintifyService(supplier_api_token(connection), token_refresher=token_refresher(connection))
     count = 0
+    unchanged = 0
 
     try:
-        # Fetch blueprints (product catalog)
-        blueprints = service.get_blueprints()
+        # Stream blueprints (product catalog) one at a time
+        try:
+            blueprints = service.iter_blueprints(if_changed=True)
+            blueprints_changed = True
+        except NotModified as e:
+            blueprints = e.data
+            blueprints_changed = not _synced_since(connection, e.cached_at)
+
+        max_workers = current_app.config.get('PRINTIFY_PROVIDER_WORKERS', 8)
 
         for blueprint in blueprints:
             blueprint_id = blueprint.get('id')
 
-            # Get print providers for this blueprint
+            # Get variants with pricing from every print provider
             try:
-                providers = service.get_blueprint_print_providers(blueprint_id)
-
-                # Use first available provider for pricing
-                if providers:
-                    provider = providers[0]
-                    provider_id = provider.get('id')
-
-                    # Get variants with pricing
-                    try:
-                        variants_data = service.get_print_provider_variants(
-                            blueprint_id, provider_id
-                        )
-                        variants = variants_data.get('variants', [])
-
-                        # Extract sizes and colors
-                        sizes = list(set(v.get('size', '') for v in variants if v.get('size')))
-                        colors = [
-                            {'name': v.get('color', ''), 'hex': v.get('color_code')}
-                            for v in variants if v.get('color')
-                        ]
-                        # Remove duplicates
-                        seen_colors = set()
-                        unique_colors = []
-                        for c in colors:
-                            if c['name'] not in seen_colors:
-                                seen_colors.add(c['name'])
-                                unique_colors.append(c)
-
-                        # Get base price (minimum variant price)
-                        prices = [v.get('price', 0) for v in variants]
-                        base_price = min(prices) / 100 if prices else None  # Convert cents to dollars
-
-                        _upsert_supplier_product(
-                            connection=connection,
-                            supplier_product_id=str(blueprint_id),
-                            data={
-                                'name': blueprint.get('title', ''),
-                                'description': blueprint.get('description'),
-                                'product_type': blueprint.get('model'),
-                                'brand': blueprint.get('brand'),
-                                'category': blueprint.get('category'),
-                                'blueprint_id': str(blueprint_id),
-                                'base_price': base_price,
-                                'currency': 'USD',
-                                'available_sizes': sizes,
-                                'available_colors': unique_colors,
-                                'thumbnail_url': blueprint.get('images', [{}])[0].get('src')
-                                    if blueprint.get('images') else None,
-                                'images': [img.get('src') for img in blueprint.get('images', [])]
-                            }
-                        )
-                        count += 1
-
-                    except Exception:
-                        # Skip if we can't get variant pricing
-                        pass
-
+                providers = get_blueprint_provider_variants(
+                    supplier_api_token(connection), blueprint_id, max_workers=max_workers
+                )
             except Exception:
                 # Skip if we can't get providers
-                pass
+                continue
+
+            if not providers:
+                continue
+
+            # Neither the blueprint nor any provider's variants changed since the last sync
+            if not blueprints_changed and all(_synced_since(connection, p['cached_at']) for p in providers):
+                unchanged += 1
+                continue
+
+            variants = [v for provider in providers for v in provider['variants']]
+
+            # Extract sizes and colors
+            sizes = list(set(v.get('size', '') for v in variants if v.get('size')))
+            colors = [
+                {'name': v.get('color', ''), 'hex': v.get('color_code')}
+                for v in variants if v.get('color')
+            ]
+            # Remove duplicates
+            seen_colors = set()
+            unique_colors = []
+            for c in colors:
+                if c['name'] not in seen_colors:
+                    seen_colors.add(c['name'])
+                    unique_colors.append(c)
+
+            # Default provider: lowest minimum variant price
+            provider_prices = {
+                provider['id']: min(v.get('price', 0) for v in provider['variants']) / 100  # Cents to dollars
+                for provider in providers
+            }
+            print_provider_id = min(provider_prices, key=provider_prices.get)
+
+            _upsert_supplier_product(
+                connection=connection,
+                supplier_product_id=str(blueprint_id),
+                data={
+                    'name': blueprint.get('title', ''),
+                    'description': blueprint.get('description'),
+                    'product_type': blueprint.get('model'),
+                    'brand': blueprint.get('brand'),
+                    'category': blueprint.get('category'),
+                    'blueprint_id': str(blueprint_id),
+                    'print_provider_id': print_provider_id,
+                    'base_price': provider_prices[print_provider_id],
+                    'currency': 'USD',
+                    'available_sizes': sizes,
+                    'available_colors': unique_colors,
+                    'thumbnail_url': blueprint.get('images', [{}])[0].get('src')
+                        if blueprint.get('images') else None,
+                    'images': [img.get('src') for img in blueprint.get('images', [])],
+                    'variant_prices': [
+                        {
+                            'supplier_variant_id': str(v.get('id')),
+                            'print_provider_id': provider['id'],
+                            'size': v.get('size'),
+                            'color': v.get('color'),
+                            'price': v.get('price', 0) / 100
+                        }
+                        for provider in providers
+                        for v in provider['variants']
+                    ]
+                }
+            )
+            count += 1
 
-        return {'count': count, 'status': 'success'}
+        return {'count': count, 'unchanged': unchanged, 'status': 'success'}
 
     except Exception as e:
         raise Exception(f"Failed to sync Printify products: {str(e)}")
@@ -165,19 +211,34 @@ def _sync_printify_products(connection):
 
 def _sync_printful_products(connection):
     """Sync products from Printful."""
-    service = PrintfulService(connection.api_key)
+    service = PrintfulService(supplier_api_token(connection), token_refresher=token_refresher(connection))
     count = 0
+    unchanged = 0
 
     try:
-        # Fetch product catalog
-        products = service.get_products()
+        # Stream product catalog one at a time
+        try:
+            products = service.iter_products(if_changed=True)
+            products_changed = True
+        except NotModified as e:
+            products = e.data
+            products_changed = not _synced_since(connection, e.cached_at)
 
         for product in products:
             product_id = product.get('id')
+            # Long syncs outlive access tokens
+            service.set_api_key(supplier_api_token(connection))
 
             # Get detailed product info with variants
             try:
-                details = service.get_product(product_id)
+                try:
+                    details = service.get_product(product_id, if_changed=True)
+                except NotModified as e:
+                    if not products_changed and _synced_since(connection, e.cached_at):
+                        unchanged += 1
+                        continue
+                    details = e.data
+
                 product_info = details.get('product', {})
                 variants = details.get('variants', [])
 
@@ -213,7 +274,16 @@ def _sync_printful_products(connection):
                         'available_sizes': sizes,
                         'available_colors': unique_colors,
                         'thumbnail_url': product_info.get('image'),
-                        'images': [product_info.get('image')] if product_info.get('image') else []
+                        'images': [product_info.get('image')] if product_info.get('image') else [],
+                        'variant_prices': [
+                            {
+                                'supplier_variant_id': str(v.get('id')),
+                                'size': v.get('size'),
+                                'color': v.get('color'),
+                                'price': float(v.get('price', 0))
+                            }
+                            for v in variants
+                        ]
                     }
                 )
                 count += 1
@@ -222,12 +292,29 @@ def _sync_printful_products(connection):
                 # Skip if we can't get product details
                 pass
 
-        return {'count': count, 'status': 'success'}
+        return {'count': count, 'unchanged': unchanged, 'status': 'success'}
 
     except Exception as e:
         raise Exception(f"Failed to sync Printful products: {str(e)}")
 
 
+def _synced_since(connection, cached_at):
+    """
+    Check whether a cached catalog response was already synced.
+
+    A response reported unchanged only skips its upsert when a sync
+    completed after it was downloaded, so an interrupted sync is redone.
+
+    Args:
+        connection: SupplierConnection instance
+        cached_at: Download time of the cached response, or None if it changed
+
+    Returns:
+        True if the response's data is already stored
+    """
+    return cached_at is not None and connection.last_sync is not None and cached_at <= connection.last_sync
+
+
 def _upsert_supplier_product(connection, supplier_product_id, data):
     """
     Create or update a supplier product.
@@ -248,6 +335,9 @@ def _upsert_supplier_product(connection, supplier_product_id, data):
             supplier_product_id=supplier_product_id
         )
         db.session.add(product)
+        indexed_fields = None
+    else:
+        indexed_fields = (product.name, product.product_type, product.brand)
 
     # Update fields
     product.name = data.get('name', product.name)
@@ -257,6 +347,7 @@ def _upsert_supplier_product(connection, supplier_product_id, data):
     product.category = data.get('category', product.category)
     product.blueprint_id = data.get('blueprint_id', product.blueprint_id)
     product.catalog_id = data.get('catalog_id', product.catalog_id)
+    product.print_provider_id = data.get('print_provider_id', product.print_provider_id)
     product.base_price = data.get('base_price', product.base_price)
     product.currency = data.get('currency', product.currency)
     product.available_sizes = data.get('available_sizes', product.available_sizes)
@@ -266,4 +357,27 @@ def _upsert_supplier_product(connection, supplier_product_id, data):
     product.is_active = True
     product.updated_at = datetime.utcnow()
 
+    # Replace cached variant prices
+    if 'variant_prices' in data:
+        db.session.flush()
+        SupplierVariantPrice.query.filter_by(supplier_product_id=product.id).delete()
+        if data['variant_prices']:
+            db.session.execute(db.insert(SupplierVariantPrice), [
+                {
+                    'supplier_product_id': product.id,
+                    'supplier_variant_id': vp.get('supplier_variant_id'),
+                    'print_provider_id': vp.get('print_provider_id'),
+                    'size': vp.get('size'),
+                    'color': vp.get('color'),
+                    'price': vp['price'],
+                    'currency': product.currency
+                }
+                for vp in data['variant_prices']
+            ])
+
+    # Keep the match index current when the indexed fields change
+    if (product.name, product.product_type, product.brand) != indexed_fields:
+        db.session.flush()
+        index_supplier_products([product])
+
     db.session.commit()
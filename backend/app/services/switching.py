@@ -7,11 +7,13 @@ from datetime import datetime
 from flask import current_app
 from app import db
 from app.models import Product, ProductVariant, SupplierProduct, Shop, ShopType
+from app.services.product_types import get_supplier_product_id, resolve_product_type_key
 from app.services.shops.etsy import EtsyService
 from app.services.shops.shopify import ShopifyService
 from app.services.suppliers.gelato import GelatoService
 from app.services.suppliers.printify import PrintifyService
 from app.services.suppliers.printful import PrintfulService
+from app.services.tokens import ensure_fresh_token, supplier_api_token, token_refresher
 
 
 # SKU prefix mappings for each supplier
@@ -142,13 +144,8 @@ def _find_matching_product_id(product, target_connection):
         return supplier_product.supplier_product_id
 
     # Try known mappings
-    from app.services.comparison import PRODUCT_TYPE_MAPPINGS
-
-    for key, mapping in PRODUCT_TYPE_MAPPINGS.items():
-        if key in product_type_lower:
-            return mapping.get(target_connection.supplier_type)
-
-    return None
+    product_type_key = product.product_type_key or resolve_product_type_key(product.product_type)
+    return get_supplier_product_id(product_type_key, target_connection.supplier_type)
 
 
 def _create_product_on_supplier(product, target_connection, target_product_id):
@@ -182,14 +179,17 @@ def _create_product_on_supplier(product, target_connection, target_product_id):
         if supplier_type == 'gelato':
             service = GelatoService(
                 api_key=target_connection.api_key,
-                access_token=target_connection.access_token
+                access_token=ensure_fresh_token(target_connection),
+                token_refresher=token_refresher(target_connection)
             )
             # Gelato product creation would happen here
             # For now, we just prepare the data
             return {'status': 'prepared', 'supplier_product_id': target_product_id}
 
         elif supplier_type == 'printify':
-            service = PrintifyService(target_connection.api_key)
+            service = PrintifyService(
+                supplier_api_token(target_connection), token_refresher=token_refresher(target_connection)
+            )
             # Printify requires a shop_id and specific format
             if target_connection.shop_id:
                 # Create product in Printify
@@ -198,7 +198,9 @@ def _create_product_on_supplier(product, target_connection, target_product_id):
             return {'status': 'prepared', 'supplier_product_id': target_product_id}
 
         elif supplier_type == 'printful':
-            service = PrintfulService(target_connection.api_key)
+            service = PrintfulService(
+                supplier_api_token(target_connection), token_refresher=token_refresher(target_connection)
+            )
             # Printful sync product creation
             # service.create_sync_product(product_data)
             return {'status': 'prepared', 'supplier_product_id': target_product_id}
@@ -237,7 +239,7 @@ def _update_etsy_skus(shop, product, sku_changes):
         product: Product model instance
         sku_changes: List of SKU change records
     """
-    service = EtsyService(shop.access_token)
+    service = EtsyService(ensure_fresh_token(shop), token_refresher=token_refresher(shop))
 
     # Get current inventory
     inventory = service.get_listing_inventory(product.listing_id)
@@ -2,15 +2,21 @@
 Template service.
 Handles creating listings from templates.
 """
+import itertools
+import threading
+import uuid
+from collections import OrderedDict
 from datetime import datetime
 from flask import current_app
 from app import db
 from app.models import (
-    ListingTemplate, TemplateProduct, Shop, ShopType,
-    Product, ProductVariant, SupplierConnection
+    ListingTemplate, TemplateProduct, TemplateColor, Shop, ShopType,
+    Product, ProductVariant, SupplierConnection, SupplierProduct
 )
 from app.services.shops.etsy import EtsyService
 from app.services.shops.shopify import ShopifyService
+from app.services.pricing import price_template_products
+from app.services.tokens import ensure_fresh_token, token_refresher
 
 
 # SKU prefix mappings
@@ -20,6 +26,12 @@ SKU_PREFIXES = {
     'printful': 'PFL_'
 }
 
+# Per-process preview caches keyed by (id, created_at, version); IDs alone
+# are reused after deletes
+_preview_cache = OrderedDict()
+_product_preview_cache = OrderedDict()
+_preview_cache_lock = threading.Lock()
+
 
 def create_listing_from_template(template, shop, title=None, description=None,
                                   price=None, tags=None, images=None):
@@ -38,84 +50,242 @@ def create_listing_from_template(template, shop, title=None, description=None,
     Returns:
         Created listing data
     """
-    # Build listing data
-    listing_title = title or template.default_title or f"New Listing from {template.name}"
-    listing_description = description or template.default_description or ""
-    listing_tags = tags or template.default_tags or []
-
-    # Get template products
-    template_products = template.template_products.filter_by(is_active=True).order_by(
-        TemplateProduct.display_order
-    ).all()
+    # Load products and colors in one query, then expand the variant matrix
+    template_products = load_template_products(template)
 
     if not template_products:
         raise ValueError("Template has no products")
 
-    # Build variants from template products
-    variants = []
-    for tp in template_products:
-        prefix = SKU_PREFIXES.get(tp.supplier_type, 'POD_')
-        sizes = tp.selected_sizes or ['One Size']
-        colors = tp.colors.filter_by(is_active=True).all()
-
-        for size in sizes:
-            for color in colors:
-                sku = _generate_sku(prefix, tp.id, size, color.color_name)
-
-                # Calculate price
-                variant_price = price
-                if not variant_price:
-                    if tp.price_override:
-                        variant_price = tp.price_override
-                    elif template.default_price_fixed:
-                        variant_price = template.default_price_fixed
-                    elif tp.price_markup or template.default_price_markup:
-                        markup = tp.price_markup or template.default_price_markup
-                        # Would need base price from supplier to calculate
-                        variant_price = 25.00  # Default fallback
-
-                variants.append({
-                    'supplier': tp.supplier_type,
-                    'product_name': tp.product_name,
-                    'size': size,
-                    'color': color.display_name or color.color_name,
-                    'color_hex': color.color_hex,
-                    'sku': sku,
-                    'price': variant_price,
-                    'supplier_color_id': color.supplier_color_id
-                })
-
-    # Create listing based on shop type
+    listing = build_listing_payload(
+        template,
+        template_products,
+        title=title,
+        description=description,
+        price=price,
+        tags=tags,
+        images=images
+    )
+
+    return create_listing(shop, listing)
+
+
+def build_listing_payload(template, template_products, title=None, description=None,
+                          price=None, tags=None, images=None):
+    """
+    Build a shop-independent listing payload from a template.
+
+    Args:
+        template: ListingTemplate model instance
+        template_products: Output of load_template_products()
+        title: Optional title override
+        description: Optional description override
+        price: Optional price override
+        tags: Optional tags override
+        images: List of image URLs
+
+    Returns:
+        Listing payload dictionary
+    """
+    return {
+        'title': title or template.default_title or f"New Listing from {template.name}",
+        'description': description or template.default_description or "",
+        'tags': tags or template.default_tags or [],
+        'images': images or [],
+        'variants': build_template_variants(template, template_products, price=price),
+        'categories': {
+            ShopType.ETSY.value: template.etsy_category,
+            ShopType.SHOPIFY.value: template.shopify_category
+        }
+    }
+
+
+def create_listing(shop, listing):
+    """
+    Create a listing on a shop from a prepared payload.
+
+    Args:
+        shop: Shop model instance
+        listing: Payload from build_listing_payload()
+
+    Returns:
+        Created listing data
+    """
     if shop.shop_type == ShopType.ETSY.value:
-        return _create_etsy_listing(
-            shop=shop,
-            title=listing_title,
-            description=listing_description,
-            tags=listing_tags,
-            variants=variants,
-            images=images,
-            category=template.etsy_category
-        )
+        create = _create_etsy_listing
     elif shop.shop_type == ShopType.SHOPIFY.value:
-        return _create_shopify_listing(
-            shop=shop,
-            title=listing_title,
-            description=listing_description,
-            tags=listing_tags,
-            variants=variants,
-            images=images,
-            category=template.shopify_category
-        )
+        create = _create_shopify_listing
     else:
         raise ValueError(f"Unsupported shop type: {shop.shop_type}")
 
+    return create(
+        shop=shop,
+        title=listing['title'],
+        description=listing['description'],
+        tags=listing['tags'],
+        variants=listing['variants'],
+        images=listing['images'],
+        category=listing['categories'].get(shop.shop_type)
+    )
+
+
+def load_template_products(template):
+    """
+    Load a template's active products with their active colors.
+
+    Products and colors are fetched with a single joined query instead of
+    one colors query per product through the dynamic relationships.
+
+    Args:
+        template: ListingTemplate model instance
+
+    Returns:
+        List of (TemplateProduct, [TemplateColor]) tuples in display order
+    """
+    rows = db.session.query(TemplateProduct, TemplateColor).outerjoin(
+        TemplateColor,
+        db.and_(
+            TemplateColor.template_product_id == TemplateProduct.id,
+            TemplateColor.is_active.is_(True)
+        )
+    ).filter(
+        TemplateProduct.template_id == template.id,
+        TemplateProduct.is_active.is_(True)
+    ).order_by(
+        TemplateProduct.display_order,
+        TemplateProduct.id,
+        TemplateColor.id
+    ).all()
+
+    grouped = {}
+    for tp, color in rows:
+        colors = grouped.setdefault(tp, [])
+        if color is not None:
+            colors.append(color)
+
+    return list(grouped.items())
+
+
+def build_template_variants(template, template_products, price=None):
+    """
+    Expand template products into listing variants.
+
+    SKU fragments are cleaned once per size and once per color, and the
+    size x color matrix is produced with a single cartesian product per
+    template product. Markup prices come from the cached supplier costs.
+
+    Args:
+        template: ListingTemplate model instance
+        template_products: Output of load_template_products()
+        price: Optional price applied to every variant
+
+    Returns:
+        List of variant dictionaries
+    """
+    variants = []
+    prices = {} if price else price_template_products(template, template_products)
+
+    for tp, colors in template_products:
+        sku_prefix = f"{SKU_PREFIXES.get(tp.supplier_type, 'POD_')}{tp.id}_"
+        tp_prices = prices.get(tp.id)
+        fixed_price = price or _template_product_price(template, tp)
+
+        sizes = [(size, _clean_sku_size(size)) for size in tp.selected_sizes or ['One Size']]
+        color_options = [
+            (
+                color.color_name,
+                color.display_name or color.color_name,
+                color.color_hex,
+                color.supplier_color_id,
+                _clean_sku_color(color.color_name)
+            )
+            for color in colors
+        ]
+
+        variants.extend(
+            {
+                'supplier': tp.supplier_type,
+                'product_name': tp.product_name,
+                'size': size,
+                'color': color_label,
+                'color_hex': color_hex,
+                'sku': f"{sku_prefix}{size_clean}_{color_clean}",
+                'price': tp_prices[(size, color_name)] if tp_prices else fixed_price,
+                'supplier_color_id': supplier_color_id
+            }
+            for (size, size_clean), (color_name, color_label, color_hex, supplier_color_id, color_clean)
+            in itertools.product(sizes, color_options)
+        )
+
+    return variants
+
+
+def _template_product_price(template, tp):
+    """Resolve the fixed listing price for a template product."""
+    if tp.price_override:
+        return tp.price_override
+    if template.default_price_fixed:
+        return template.default_price_fixed
+    return None
+
+
+def _clean_sku_size(size):
+    """Clean up a size for use in a SKU."""
+    return size.upper().replace(' ', '')
+
+
+def _clean_sku_color(color):
+    """Clean up a color name for use in a SKU."""
+    return color.upper().replace(' ', '_').replace('-', '_')[:10]
+
+
+def _save_draft_product(shop, title, description, variants, category=None):
+    """
+    Create the local draft product record and its variants.
+
+    Variants are written with a single bulk insert.
+
+    Args:
+        shop: Shop model instance
+        title: Listing title
+        description: Listing description
+        variants: List of variant dictionaries
+        category: Optional product category
+
+    Returns:
+        Created Product instance
+    """
+    product = Product(
+        shop_id=shop.id,
+        listing_id=f"draft_{datetime.utcnow().timestamp()}_{uuid.uuid4().hex[:8]}",
+        title=title,
+        description=description,
+        price=variants[0]['price'] if variants else None,
+        supplier_type=variants[0]['supplier'] if variants else None,
+        sku=variants[0]['sku'] if variants else None,
+        category=category,
+        is_active=False,  # Draft
+        sync_status='pending'
+    )
+    db.session.add(product)
+    db.session.flush()  # Get ID for variant rows
+
+    if variants:
+        db.session.execute(db.insert(ProductVariant), [
+            {
+                'product_id': product.id,
+                'variant_id': f"draft_{v['sku']}",
+                'sku': v['sku'],
+                'size': v['size'],
+                'color': v['color'],
+                'color_hex': v.get('color_hex'),
+                'price': v['price'],
+                'is_available': True
+            }
+            for v in variants
+        ])
 
-def _generate_sku(prefix, product_id, size, color):
-    """Generate a SKU from components."""
-    # Clean up size and color for SKU
-    size_clean = size.upper().replace(' ', '')
-    color_clean = color.upper().replace(' ', '_').replace('-', '_')[:10]
-    return f"{prefix}{product_id}_{size_clean}_{color_clean}"
+    db.session.commit()
+    return product
 
 
 def _create_etsy_listing(shop, title, description, tags, variants, images, category):
@@ -134,7 +304,7 @@ def _create_etsy_listing(shop, title, description, tags, variants, images, categ
     Returns:
         Created listing data
     """
-    service = EtsyService(shop.access_token)
+    service = EtsyService(ensure_fresh_token(shop), token_refresher=token_refresher(shop))
 
     # Etsy has specific requirements
     # - Max 13 tags
@@ -176,33 +346,7 @@ def _create_etsy_listing(shop, title, description, tags, variants, images, categ
     }
 
     # Create local product record
-    product = Product(
-        shop_id=shop.id,
-        listing_id=f"draft_{datetime.utcnow().timestamp()}",
-        title=title,
-        description=description,
-        price=variants[0]['price'] if variants else None,
-        supplier_type=variants[0]['supplier'] if variants else None,
-        sku=variants[0]['sku'] if variants else None,
-        is_active=False,  # Draft
-        sync_status='pending'
-    )
-    db.session.add(product)
-
-    # Add variants
-    for v in variants:
-        variant = ProductVariant(
-            product=product,
-            variant_id=f"draft_{v['sku']}",
-            sku=v['sku'],
-            size=v['size'],
-            color=v['color'],
-            price=v['price'],
-            is_available=True
-        )
-        db.session.add(variant)
-
-    db.session.commit()
+    product = _save_draft_product(shop, title, description, variants)
 
     result['product_id'] = product.id
     return result
@@ -272,38 +416,129 @@ def _create_shopify_listing(shop, title, description, tags, variants, images, ca
     }
 
     # Create local product record
-    product = Product(
-        shop_id=shop.id,
-        listing_id=f"draft_{datetime.utcnow().timestamp()}",
-        title=title,
-        description=description,
-        price=variants[0]['price'] if variants else None,
-        supplier_type=variants[0]['supplier'] if variants else None,
-        sku=variants[0]['sku'] if variants else None,
-        category=category,
-        is_active=False,
-        sync_status='pending'
-    )
-    db.session.add(product)
-
-    for v in variants:
-        variant = ProductVariant(
-            product=product,
-            variant_id=f"draft_{v['sku']}",
-            sku=v['sku'],
-            size=v['size'],
-            color=v['color'],
-            price=v['price'],
-            is_available=True
-        )
-        db.session.add(variant)
-
-    db.session.commit()
+    product = _save_draft_product(shop, title, description, variants, category=category)
 
     result['product_id'] = product.id
     return result
 
 
+def bump_template_version(template, template_product=None):
+    """
+    Mark a template as changed so cached previews are rebuilt.
+
+    Args:
+        template: ListingTemplate that changed
+        template_product: Optional TemplateProduct whose fields or colors changed
+    """
+    # Incremented in SQL so concurrent edits cannot lose a bump
+    template.version = ListingTemplate.version + 1
+    if template_product is not None:
+        template_product.version = TemplateProduct.version + 1
+
+
+def get_template_preview(template):
+    """
+    Get the products and variants preview for a template.
+
+    Results are cached per (template, version). On a template miss only the
+    template products whose own version changed are rebuilt.
+
+    Args:
+        template: ListingTemplate model instance
+
+    Returns:
+        Dict with 'products' and 'variants' lists (shared, do not mutate)
+    """
+    max_size = current_app.config.get('TEMPLATE_PREVIEW_CACHE_SIZE', 256)
+
+    preview = _cache_get(_preview_cache, _cache_key(template))
+    if preview is not None:
+        return preview
+
+    template_products = TemplateProduct.query.filter(
+        TemplateProduct.template_id == template.id,
+        TemplateProduct.is_active.is_(True)
+    ).order_by(TemplateProduct.display_order, TemplateProduct.id).all()
+
+    product_previews = {}
+    stale = []
+    for tp in template_products:
+        cached = _cache_get(_product_preview_cache, _cache_key(tp))
+        if cached is None:
+            stale.append(tp)
+        else:
+            product_previews[tp.id] = cached
+
+    if stale:
+        colors_by_product = {tp.id: [] for tp in stale}
+        colors = TemplateColor.query.filter(
+            TemplateColor.template_product_id.in_(colors_by_product.keys()),
+            TemplateColor.is_active.is_(True)
+        ).order_by(TemplateColor.id)
+        for color in colors:
+            colors_by_product[color.template_product_id].append(color)
+
+        for tp in stale:
+            product_previews[tp.id] = _build_product_preview(tp, colors_by_product[tp.id])
+            _cache_put(_product_preview_cache, _cache_key(tp), product_previews[tp.id],
+                       max_size * 8)
+
+    preview = {'products': [], 'variants': []}
+    for tp in template_products:
+        product_info, variants = product_previews[tp.id]
+        preview['products'].append(product_info)
+        preview['variants'].extend(variants)
+
+    _cache_put(_preview_cache, _cache_key(template), preview, max_size)
+    return preview
+
+
+def _build_product_preview(tp, colors):
+    """Build the preview entry and variant combinations for one template product."""
+    product_info = {
+        'supplier': tp.supplier_type,
+        'product_name': tp.product_name,
+        'product_type': tp.product_type,
+        'sizes': tp.selected_sizes,
+        'colors': [c.to_dict() for c in colors]
+    }
+
+    sku_prefix = f"{tp.supplier_type[:3].upper()}_{tp.id}_"
+    variants = [
+        {
+            'supplier': tp.supplier_type,
+            'product': tp.product_name,
+            'size': size,
+            'color': color.display_name or color.color_name,
+            'sku': f"{sku_prefix}{size}_{color.color_name}".replace(' ', '_')
+        }
+        for size, color in itertools.product(tp.selected_sizes or ['One Size'], colors)
+    ]
+
+    return product_info, variants
+
+
+def _cache_key(row):
+    """Preview cache key of a template or template product, unique across deletes."""
+    return row.id, row.created_at, row.version
+
+
+def _cache_get(cache, key):
+    with _preview_cache_lock:
+        value = cache.get(key)
+        if value is not None:
+            cache.move_to_end(key)
+        return value
+
+
+def _cache_put(cache, key, value, max_size):
+    with _preview_cache_lock:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > max_size:
+            cache.popitem(last=False)
+
+
 def duplicate_template(template, new_name=None):
     """
     Duplicate a template with all its products and colors.
@@ -324,6 +559,7 @@ def duplicate_template(template, new_name=None):
         default_tags=template.default_tags.copy() if template.default_tags else [],
         default_price_markup=template.default_price_markup,
         default_price_fixed=template.default_price_fixed,
+        price_ending=template.price_ending,
         target_platforms=template.target_platforms.copy() if template.target_platforms else [],
         etsy_category=template.etsy_category,
         shopify_category=template.shopify_category,
@@ -332,36 +568,422 @@ def duplicate_template(template, new_name=None):
     db.session.add(new_template)
     db.session.flush()  # Get ID for new template
 
-    # Copy products
-    for tp in template.template_products.all():
-        new_tp = TemplateProduct(
-            template_id=new_template.id,
-            supplier_product_id=tp.supplier_product_id,
-            supplier_type=tp.supplier_type,
-            external_product_id=tp.external_product_id,
-            product_name=tp.product_name,
-            product_type=tp.product_type,
-            selected_sizes=tp.selected_sizes.copy() if tp.selected_sizes else [],
-            price_override=tp.price_override,
-            price_markup=tp.price_markup,
-            display_order=tp.display_order,
-            is_active=tp.is_active
-        )
-        db.session.add(new_tp)
-        db.session.flush()
-
-        # Copy colors
-        for color in tp.colors.all():
-            from app.models import TemplateColor
-            new_color = TemplateColor(
-                template_product_id=new_tp.id,
-                color_name=color.color_name,
-                color_hex=color.color_hex,
-                supplier_color_id=color.supplier_color_id,
-                display_name=color.display_name,
-                is_active=color.is_active
-            )
-            db.session.add(new_color)
+    # Copy products in one bulk insert, then colors with INSERT ... SELECT
+    source_products = TemplateProduct.query.filter_by(
+        template_id=template.id
+    ).order_by(TemplateProduct.id).all()
+
+    new_ids = _insert_template_products([
+        dict(_template_product_row(tp), template_id=new_template.id)
+        for tp in source_products
+    ])
+    _copy_template_colors(dict(zip((tp.id for tp in source_products), new_ids)))
 
     db.session.commit()
     return new_template
+
+
+# Template document fields
+TEMPLATE_FIELDS = [
+    'name', 'description', 'default_title', 'default_description',
+    'default_tags', 'default_price_markup', 'default_price_fixed', 'price_ending',
+    'target_platforms', 'etsy_category', 'shopify_category', 'is_active'
+]
+TEMPLATE_PRODUCT_FIELDS = [
+    'supplier_product_id', 'supplier_type', 'external_product_id',
+    'product_name', 'product_type', 'selected_sizes',
+    'price_override', 'price_markup', 'display_order', 'is_active'
+]
+TEMPLATE_COLOR_FIELDS = [
+    'color_name', 'color_hex', 'supplier_color_id', 'display_name', 'is_active'
+]
+
+# Document field -> accepted value types (null is accepted unless the
+# column is required)
+_NUMBER = (int, float)
+DOCUMENT_FIELD_TYPES = {
+    'id': int,
+    'name': str, 'description': str, 'default_title': str, 'default_description': str,
+    'default_tags': list, 'default_price_markup': _NUMBER, 'default_price_fixed': _NUMBER,
+    'price_ending': _NUMBER, 'target_platforms': list, 'etsy_category': str,
+    'shopify_category': str, 'is_active': bool,
+    'supplier_product_id': int, 'supplier_type': str, 'external_product_id': str,
+    'product_name': str, 'product_type': str, 'selected_sizes': list,
+    'price_override': _NUMBER, 'price_markup': _NUMBER, 'display_order': int,
+    'color_name': str, 'color_hex': str, 'supplier_color_id': str, 'display_name': str
+}
+REQUIRED_DOCUMENT_FIELDS = {'name', 'supplier_type', 'product_name', 'color_name'}
+
+
+def apply_template_document(template, document, user_id):
+    """
+    Replace a template's products and colors with a full document.
+
+    The document is diffed against the stored rows and the resulting
+    inserts, updates and deletes are applied with bulk statements in a
+    single transaction. Products (and a product's colors) are only touched
+    when the document includes the 'products' (or 'colors') key; listed
+    rows with an 'id' are updated, rows without one are inserted and
+    stored rows missing from the list are deleted.
+
+    Args:
+        template: ListingTemplate model instance
+        document: Template document dictionary
+        user_id: Owner's user ID (for supplier validation)
+
+    Returns:
+        Dict with counts of inserted, updated and deleted rows
+
+    Raises:
+        ValueError: If the document is malformed or references other rows
+    """
+    _validate_document(document)
+
+    stats = {
+        'products_inserted': 0, 'products_updated': 0, 'products_deleted': 0,
+        'colors_inserted': 0, 'colors_updated': 0, 'colors_deleted': 0
+    }
+
+    try:
+        for field in TEMPLATE_FIELDS:
+            if field in document:
+                setattr(template, field, document[field])
+
+        if 'products' in document:
+            _apply_product_documents(template, document['products'] or [], user_id, stats)
+
+        bump_template_version(template)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return stats
+
+
+def _validate_document(document):
+    """
+    Check a template document's structure and value types before any row changes.
+
+    Raises:
+        ValueError: If the document is malformed
+    """
+    if not isinstance(document, dict):
+        raise ValueError("Template document must be an object")
+    _validate_fields(document, TEMPLATE_FIELDS, 'Template')
+
+    product_docs = document.get('products') or []
+    if not isinstance(product_docs, list):
+        raise ValueError("products must be a list")
+
+    for position, doc in enumerate(product_docs, start=1):
+        if not isinstance(doc, dict):
+            raise ValueError(f"Product {position} must be an object")
+        _validate_fields(doc, ['id', *TEMPLATE_PRODUCT_FIELDS], f"Product {position}")
+
+        color_docs = doc.get('colors') or []
+        if not isinstance(color_docs, list):
+            raise ValueError(f"Product {position}: colors must be a list")
+        for color_position, color_doc in enumerate(color_docs, start=1):
+            label = f"Product {position} color {color_position}"
+            if not isinstance(color_doc, dict):
+                raise ValueError(f"{label} must be an object")
+            _validate_fields(color_doc, ['id', *TEMPLATE_COLOR_FIELDS], label)
+            if color_doc.get('id') is None and not (color_doc.get('color_name') or '').strip():
+                raise ValueError(f"{label}: color_name is required")
+
+
+def _validate_fields(doc, fields, label):
+    """Check the types of a document object's known fields."""
+    for field in fields:
+        if field not in doc:
+            continue
+        value = doc[field]
+        if value is None:
+            if field in REQUIRED_DOCUMENT_FIELDS:
+                raise ValueError(f"{label}: {field} is required")
+            continue
+        types = DOCUMENT_FIELD_TYPES[field]
+        # JSON true/false are not numbers
+        if not isinstance(value, types) or (isinstance(value, bool) and types is not bool):
+            raise ValueError(f"{label}: invalid {field}")
+
+
+def _apply_product_documents(template, product_docs, user_id, stats):
+    """Diff product documents against stored products and apply the changes."""
+    stored = {
+        tp.id: tp for tp in TemplateProduct.query.filter_by(template_id=template.id)
+    }
+    stored_colors = {tp_id: {} for tp_id in stored}
+    if stored:
+        colors = TemplateColor.query.filter(TemplateColor.template_product_id.in_(stored.keys()))
+        for color in colors:
+            stored_colors[color.template_product_id][color.id] = color
+
+    connections = {
+        c.supplier_type: c for c in SupplierConnection.query.filter_by(
+            user_id=user_id,
+            is_connected=True
+        )
+    }
+    supplier_products = _resolve_supplier_products(
+        {doc.get('supplier_product_id') for doc in product_docs}
+        | {tp.supplier_product_id for tp in stored.values()},
+        connections
+    )
+
+    product_inserts, product_updates, new_product_colors = [], [], []
+    color_inserts, color_updates, color_deletes = [], [], []
+    touched = set()
+    kept = set()
+
+    for position, doc in enumerate(product_docs, start=1):
+        row = {field: doc[field] for field in TEMPLATE_PRODUCT_FIELDS if field in doc}
+
+        product_id = doc.get('id')
+        if product_id is None:
+            external_id = _check_supplier_product(
+                f"Product {position}", row.get('supplier_type'), row.get('supplier_product_id'),
+                connections, supplier_products
+            )
+            if external_id is not None:
+                row['external_product_id'] = external_id
+
+            row.setdefault('product_name', '')
+            row.setdefault('selected_sizes', [])
+            row.setdefault('display_order', position)
+            row.setdefault('is_active', True)
+            for field in TEMPLATE_PRODUCT_FIELDS:
+                row.setdefault(field, None)
+            row['template_id'] = template.id
+            product_inserts.append(row)
+            new_product_colors.append(doc.get('colors') or [])
+            continue
+
+        tp = stored.get(product_id)
+        if tp is None or product_id in kept:
+            raise ValueError(f"Product {product_id} does not belong to this template")
+        kept.add(product_id)
+
+        changes = {field: value for field, value in row.items() if getattr(tp, field) != value}
+        if 'supplier_type' in changes or 'supplier_product_id' in changes:
+            external_id = _check_supplier_product(
+                f"Product {position}", row.get('supplier_type', tp.supplier_type),
+                row.get('supplier_product_id', tp.supplier_product_id), connections, supplier_products
+            )
+            if external_id is not None and external_id != tp.external_product_id:
+                changes['external_product_id'] = external_id
+        if changes:
+            changes['id'] = product_id
+            product_updates.append(changes)
+            touched.add(product_id)
+
+        if 'colors' in doc:
+            if _diff_colors(product_id, doc['colors'] or [], stored_colors[product_id],
+                            color_inserts, color_updates, color_deletes):
+                touched.add(product_id)
+
+    deleted_products = [tp_id for tp_id in stored if tp_id not in kept]
+
+    # Apply deletes first, then updates and inserts
+    if deleted_products:
+        db.session.execute(
+            db.delete(TemplateColor).where(TemplateColor.template_product_id.in_(deleted_products)),
+            execution_options={'synchronize_session': False}
+        )
+        db.session.execute(
+            db.delete(TemplateProduct).where(TemplateProduct.id.in_(deleted_products)),
+            execution_options={'synchronize_session': False}
+        )
+    if color_deletes:
+        db.session.execute(
+            db.delete(TemplateColor).where(TemplateColor.id.in_(color_deletes)),
+            execution_options={'synchronize_session': False}
+        )
+    if product_updates:
+        db.session.execute(db.update(TemplateProduct), product_updates)
+    if color_updates:
+        db.session.execute(db.update(TemplateColor), color_updates)
+    if touched:
+        db.session.execute(
+            db.update(TemplateProduct).where(TemplateProduct.id.in_(touched)).values(
+                version=TemplateProduct.version + 1
+            ),
+            execution_options={'synchronize_session': False}
+        )
+
+    new_ids = _insert_template_products(product_inserts)
+    for new_id, colors in zip(new_ids, new_product_colors):
+        for color_doc in colors:
+            color_inserts.append(_color_insert_row(new_id, color_doc))
+    _insert_template_colors(color_inserts)
+
+    stats['products_inserted'] += len(product_inserts)
+    stats['products_updated'] += len(product_updates)
+    stats['products_deleted'] += len(deleted_products)
+    stats['colors_inserted'] += len(color_inserts)
+    stats['colors_updated'] += len(color_updates)
+    stats['colors_deleted'] += len(color_deletes)
+
+
+def _diff_colors(product_id, color_docs, stored, inserts, updates, deletes):
+    """
+    Diff color documents for one product against its stored colors.
+
+    Returns:
+        True if anything changed
+    """
+    kept = set()
+    changed = False
+
+    for color_doc in color_docs:
+        color_id = color_doc.get('id')
+        if color_id is None:
+            inserts.append(_color_insert_row(product_id, color_doc))
+            changed = True
+            continue
+
+        color = stored.get(color_id)
+        if color is None or color_id in kept:
+            raise ValueError(f"Color {color_id} does not belong to product {product_id}")
+        kept.add(color_id)
+
+        changes = {
+            field: color_doc[field] for field in TEMPLATE_COLOR_FIELDS
+            if field in color_doc and getattr(color, field) != color_doc[field]
+        }
+        if changes:
+            changes['id'] = color_id
+            updates.append(changes)
+            changed = True
+
+    removed = [color_id for color_id in stored if color_id not in kept]
+    deletes.extend(removed)
+    return changed or bool(removed)
+
+
+def _color_insert_row(product_id, color_doc):
+    """Build an insert row for a new template color."""
+    color_name = (color_doc.get('color_name') or '').strip()
+    if not color_name:
+        raise ValueError("color_name is required")
+
+    row = {field: color_doc[field] for field in TEMPLATE_COLOR_FIELDS if field in color_doc}
+    row['color_name'] = color_name
+    row['template_product_id'] = product_id
+    row.setdefault('is_active', True)
+    for field in TEMPLATE_COLOR_FIELDS:
+        row.setdefault(field, None)
+    return row
+
+
+def _resolve_supplier_products(supplier_product_ids, connections):
+    """
+    Look up referenced supplier products.
+
+    Only products from the user's connected suppliers are resolved.
+
+    Returns:
+        Dict of supplier product ID -> (connection ID, supplier's external ID)
+    """
+    supplier_product_ids = {sp_id for sp_id in supplier_product_ids if sp_id is not None}
+    if not supplier_product_ids or not connections:
+        return {}
+
+    rows = db.session.query(
+        SupplierProduct.id, SupplierProduct.supplier_connection_id, SupplierProduct.supplier_product_id
+    ).filter(
+        SupplierProduct.id.in_(supplier_product_ids),
+        SupplierProduct.supplier_connection_id.in_([c.id for c in connections.values()])
+    )
+    return {sp_id: (connection_id, external_id) for sp_id, connection_id, external_id in rows}
+
+
+def _check_supplier_product(label, supplier_type, supplier_product_id, connections, supplier_products):
+    """
+    Check that a template product's supplier is connected and its product is theirs.
+
+    Returns:
+        The supplier product's external ID, or None without a supplier product
+
+    Raises:
+        ValueError: Supplier missing or not connected, or unknown supplier product
+    """
+    if not supplier_type:
+        raise ValueError(f"{label}: supplier_type is required")
+    connection = connections.get(supplier_type)
+    if connection is None:
+        raise ValueError(f"{label}: {supplier_type} is not connected")
+
+    if supplier_product_id is None:
+        return None
+    resolved = supplier_products.get(supplier_product_id)
+    if resolved is None or resolved[0] != connection.id:
+        raise ValueError(f"{label}: supplier product {supplier_product_id} not found for {supplier_type}")
+    return resolved[1]
+
+
+def _template_product_row(tp):
+    """Get a template product's copyable columns as an insert row."""
+    return {
+        'supplier_product_id': tp.supplier_product_id,
+        'supplier_type': tp.supplier_type,
+        'external_product_id': tp.external_product_id,
+        'product_name': tp.product_name,
+        'product_type': tp.product_type,
+        'selected_sizes': list(tp.selected_sizes) if tp.selected_sizes else [],
+        'price_override': tp.price_override,
+        'price_markup': tp.price_markup,
+        'display_order': tp.display_order,
+        'is_active': tp.is_active
+    }
+
+
+def _insert_template_products(rows):
+    """
+    Insert template products with one bulk statement.
+
+    Returns:
+        New IDs in the same order as rows
+    """
+    if not rows:
+        return []
+
+    result = db.session.execute(
+        db.insert(TemplateProduct).returning(TemplateProduct.id, sort_by_parameter_order=True),
+        rows
+    )
+    return result.scalars().all()
+
+
+def _insert_template_colors(rows):
+    """Insert template colors with one bulk statement."""
+    if rows:
+        db.session.execute(db.insert(TemplateColor), rows)
+
+
+def _copy_template_colors(product_id_map):
+    """
+    Copy colors between template products with a single INSERT ... SELECT.
+
+    Args:
+        product_id_map: Dict of source TemplateProduct.id -> target TemplateProduct.id
+    """
+    if not product_id_map:
+        return
+
+    columns = ['color_name', 'color_hex', 'supplier_color_id', 'display_name', 'is_active']
+    source = db.select(
+        db.case(product_id_map, value=TemplateColor.template_product_id),
+        *(getattr(TemplateColor, c) for c in columns),
+        db.literal(datetime.utcnow())
+    ).where(
+        TemplateColor.template_product_id.in_(product_id_map.keys())
+    ).order_by(TemplateColor.id)
+
+    db.session.execute(
+        db.insert(TemplateColor).from_select(
+            ['template_product_id', *columns, 'created_at'],
+            source
+        )
+    )
@@ -0,0 +1,195 @@
+"""
+OAuth token manager.
+Refreshes shop and supplier access tokens shortly before they expire, one
+refresh per token at a time across threads and workers, and lets services
+retry a call once with a refreshed token after a 401.
+"""
+import threading
+from datetime import datetime, timedelta
+from flask import current_app, has_app_context
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+from app import db
+from app.services.oauth import (
+    refresh_etsy_token, refresh_gelato_token, refresh_printful_token, refresh_printify_token
+)
+
+# Shop or supplier type -> token refresh function (Shopify tokens do not expire)
+REFRESHERS = {
+    'etsy': refresh_etsy_token,
+    'gelato': refresh_gelato_token,
+    'printify': refresh_printify_token,
+    'printful': refresh_printful_token
+}
+
+# Columns written by a refresh
+TOKEN_COLUMNS = ('access_token', 'refresh_token', 'token_expires_at')
+
+# (table, row ID) -> lock held while refreshing that row's token
+_refresh_locks = {}
+_refresh_locks_lock = threading.Lock()
+
+
+def ensure_fresh_token(owner, stale_token=None):
+    """
+    Get an access token that is not about to expire.
+
+    Tokens within TOKEN_REFRESH_MARGIN seconds of token_expires_at, or
+    equal to stale_token, are refreshed. One thread per process refreshes
+    a row at a time, and the row is reloaded under a row lock first, so a
+    token another worker refreshed meanwhile is reused instead of being
+    refreshed again.
+
+    The refresh is saved in its own session, leaving the caller's
+    transaction untouched; callers must not hold uncommitted changes to
+    the owner's row.
+
+    Args:
+        owner: Shop or SupplierConnection instance
+        stale_token: Token a supplier just rejected with a 401
+
+    Returns:
+        Access token, unchanged when it cannot be refreshed
+    """
+    refresh = REFRESHERS.get(_owner_type(owner))
+    if not refresh or not owner.refresh_token:
+        return owner.access_token
+    if stale_token is None and not _expiring(owner):
+        return owner.access_token
+
+    with _refresh_lock(owner):
+        if _single_connection():
+            # In-memory SQLite has no second connection: the token is saved
+            # with the caller's next commit
+            _refresh_row(owner, refresh, stale_token)
+            return owner.access_token
+
+        with Session(db.engine, expire_on_commit=False) as session:
+            row = session.get(type(owner), owner.id, with_for_update=True)
+            if row is None:
+                return owner.access_token
+            refreshed = _refresh_row(row, refresh, stale_token)
+            tokens = {column: getattr(row, column) for column in TOKEN_COLUMNS}
+            try:
+                session.commit()  # Releases the row lock
+            except SQLAlchemyError as e:
+                session.rollback()
+                current_app.logger.warning(
+                    f"Saving refreshed token failed for {owner.__tablename__} {owner.id}: {str(e)}"
+                )
+                if refreshed:
+                    # Rotated refresh tokens must not be lost: save with the caller's commit
+                    for column, value in tokens.items():
+                        setattr(owner, column, value)
+                return owner.access_token
+
+        # Update the caller's copy without marking it changed
+        for column, value in tokens.items():
+            set_committed_value(owner, column, value)
+        return owner.access_token
+
+
+def token_refresher(owner):
+    """
+    Build the 401 callback passed to a service as token_refresher.
+
+    The callback refreshes only on the thread holding the owner's app
+    context; fan-out threads get None and keep the 401, and the caller
+    refreshes before its next batch.
+
+    Args:
+        owner: Shop or SupplierConnection instance
+
+    Returns:
+        Function of the rejected token returning a new token or None, or
+        None when the owner's tokens cannot be refreshed
+    """
+    if not REFRESHERS.get(_owner_type(owner)) or not owner.refresh_token:
+        return None
+
+    owner_thread = threading.get_ident()
+
+    def refresh(stale_token):
+        if threading.get_ident() != owner_thread or not has_app_context():
+            return None
+        if stale_token != owner.access_token:  # An API key was rejected
+            return None
+        token = ensure_fresh_token(owner, stale_token=stale_token)
+        return token if token != stale_token else None
+
+    return refresh
+
+
+def supplier_api_token(connection):
+    """
+    Get the bearer token of a Printify or Printful connection.
+
+    Args:
+        connection: SupplierConnection instance
+
+    Returns:
+        The connection's API key, or its fresh OAuth access token
+    """
+    return connection.api_key or ensure_fresh_token(connection)
+
+
+def _owner_type(owner):
+    """Shop or supplier type of a token owner."""
+    return getattr(owner, 'shop_type', None) or getattr(owner, 'supplier_type', None)
+
+
+def _refresh_row(row, refresh, stale_token):
+    """
+    Refresh a row's token unless it is fresh or was refreshed meanwhile.
+
+    Returns:
+        True if the row's token columns were updated
+    """
+    if stale_token is None and not _expiring(row):
+        return False
+    if stale_token is not None and row.access_token != stale_token:
+        # Refreshed by another thread or worker since the call was sent
+        return False
+
+    try:
+        token_data = refresh(row.refresh_token)
+    except Exception as e:
+        current_app.logger.warning(
+            f"Token refresh failed for {row.__tablename__} {row.id}: {str(e)}"
+        )
+        return False
+
+    expires_in = token_data.get('expires_in')
+    row.access_token = token_data.get('access_token', row.access_token)
+    # Providers that rotate refresh tokens return a new one
+    row.refresh_token = token_data.get('refresh_token') or row.refresh_token
+    row.token_expires_at = (
+        datetime.utcnow() + timedelta(seconds=expires_in)
+        if expires_in else None
+    )
+    return True
+
+
+def _single_connection():
+    """Check whether the database is in-memory SQLite, reachable over one connection only."""
+    url = db.engine.url
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+
+def _expiring(owner):
+    """Check whether a token expires within the refresh margin."""
+    if owner.token_expires_at is None:
+        return False
+    margin = current_app.config.get('TOKEN_REFRESH_MARGIN', 300)
+    return owner.token_expires_at - datetime.utcnow() <= timedelta(seconds=margin)
+
+
+def _refresh_lock(owner):
+    """Get the lock serializing refreshes of a row's token in this process."""
+    key = (owner.__tablename__, owner.id)
+    with _refresh_locks_lock:
+        lock = _refresh_locks.get(key)
+        if lock is None:
+            lock = _refresh_locks[key] = threading.Lock()
+        return lock
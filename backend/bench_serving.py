@@ -0,0 +1,183 @@
+"""
+Load test for the serving modes.
+Serves the supplier connect route, which waits on the supplier API and then
+writes to the database, from one gunicorn worker (one core) with sync and
+gevent workers, and reports the concurrent users each sustains.
+Run: python bench_serving.py [supplier_latency_seconds] [p95_slo_seconds]
+Requires gunicorn, gevent and httpx.
+"""
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Concurrent users tried per worker class, stopping at the first level over the SLO
+LEVELS = [1, 2, 5, 10, 25, 50, 100, 200]
+LEVEL_SECONDS = 10
+
+STORE_BODY = json.dumps({'code': 200, 'result': {'id': 1, 'name': 'Bench store'}}).encode()
+
+
+def bench_app():
+    """App factory for the gunicorn workers, pointed at the local supplier."""
+    from app import create_app, limiter
+    from app.services.suppliers.printful import PrintfulService
+
+    app = create_app(os.getenv('FLASK_ENV', 'production'))
+    PrintfulService.BASE_URL = os.environ['BENCH_SUPPLIER_URL']
+    limiter.enabled = False
+    return app
+
+
+def serve_supplier(latency):
+    """Run a supplier API answering every call after a delay; returns its URL."""
+    async def handle(reader, writer):
+        try:
+            while True:
+                head = await reader.readuntil(b'\r\n\r\n')
+                length = 0
+                for line in head.decode('latin-1').split('\r\n'):
+                    if line.lower().startswith('content-length:'):
+                        length = int(line.split(':', 1)[1])
+                if length:
+                    await reader.readexactly(length)
+
+                await asyncio.sleep(latency)
+                writer.write(
+                    b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n'
+                    b'Content-Length: %d\r\n\r\n%s' % (len(STORE_BODY), STORE_BODY)
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    loop = asyncio.new_event_loop()
+    server = loop.run_until_complete(asyncio.start_server(handle, '127.0.0.1', 0, backlog=1024))
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+
+
+def seed_users(count):
+    """Create one user per simulated client; returns their access tokens."""
+    from flask_jwt_extended import create_access_token
+    from app import create_app, db
+    from app.models import User
+
+    app = create_app('production')
+    with app.app_context():
+        tokens = []
+        for i in range(count):
+            user = User(email=f'bench-{i}@example.com')
+            db.session.add(user)
+            db.session.flush()
+            tokens.append(create_access_token(identity=str(user.id)))
+        db.session.commit()
+    return tokens
+
+
+def start_server(worker_class, env):
+    """Start one gunicorn worker of a class; returns (process, base URL)."""
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--workers', '1',
+         '--bind', f'127.0.0.1:{port}', '--log-level', 'warning', 'bench_serving:bench_app()'],
+        cwd=BACKEND_DIR, env={**env, 'SERVER_WORKER_CLASS': worker_class}
+    )
+    url = f'http://127.0.0.1:{port}'
+    for _ in range(100):
+        try:
+            httpx.get(f'{url}/api/health', timeout=1)
+            return process, url
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f'{worker_class} server did not start')
+
+
+async def run_level(url, tokens, users, seconds):
+    """Run users in closed loops against the connect route; returns per-request (latency, ok)."""
+    results = []
+    stop_at = time.monotonic() + seconds
+
+    async with httpx.AsyncClient(base_url=url, timeout=120,
+                                 limits=httpx.Limits(max_connections=users)) as client:
+        async def user(i):
+            headers = {'Authorization': f'Bearer {tokens[i]}'}
+            while time.monotonic() < stop_at:
+                started = time.monotonic()
+                try:
+                    response = await client.post(
+                        '/api/suppliers/printful/connect', headers=headers, json={'api_key': f'bench-key-{i}'}
+                    )
+                    ok = response.is_success
+                except httpx.HTTPError:
+                    ok = False
+                results.append((time.monotonic() - started, ok))
+
+        await asyncio.gather(*(user(i) for i in range(users)))
+    return results
+
+
+def bench(worker_class, env, tokens, slo):
+    """Step up concurrent users until p95 latency exceeds the SLO; returns users sustained."""
+    process, url = start_server(worker_class, env)
+    sustained = 0
+    try:
+        print(f"{worker_class} worker")
+        print(f"  {'users':>5}  {'req/s':>7}  {'p50':>6}  {'p95':>6}  errors")
+        for users in LEVELS:
+            results = asyncio.run(run_level(url, tokens, users, LEVEL_SECONDS))
+            latencies = sorted(latency for latency, _ in results)
+            errors = sum(1 for _, ok in results if not ok)
+            p50 = latencies[len(latencies) // 2]
+            p95 = latencies[int(len(latencies) * 0.95)]
+            print(f"  {users:>5}  {len(results) / LEVEL_SECONDS:7.1f}  {p50:6.2f}  {p95:6.2f}  {errors}")
+
+            if p95 > slo or errors:
+                break
+            sustained = users
+    finally:
+        process.terminate()
+        process.wait()
+    return sustained
+
+
+def main():
+    latency = float(sys.argv[1]) if len(sys.argv) > 1 else 0.2
+    slo = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    os.environ.update({
+        'DATABASE_URL': f'sqlite:///{db_path}',
+        'FLASK_ENV': 'production',
+        'BENCH_SUPPLIER_URL': serve_supplier(latency),
+        'SUPPLIER_SHARED_DIR': tempfile.mkdtemp()
+    })
+    tokens = seed_users(max(LEVELS))
+
+    print(f"Supplier latency {latency:.2f}s, p95 SLO {slo:.2f}s, {LEVEL_SECONDS}s per level, "
+          f"load generator on the same host")
+    results = {worker_class: bench(worker_class, dict(os.environ), tokens, slo)
+               for worker_class in ('sync', 'gevent')}
+
+    print("Concurrent users per core within the SLO:")
+    for worker_class, users in results.items():
+        print(f"  {worker_class:<7} {users}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Microbenchmark for the SKU classifier.
+Compares the compiled classifier with a per-rule re.search loop.
+Run: python bench_sku_classifier.py [count]
+"""
+import random
+import re
+import sys
+import time
+
+from app.services.sku_classifier import DEFAULT_CLASSIFIER, SUPPLIER_RULES, PRODUCT_TYPE_RULES
+
+
+def make_skus(count, seed=42):
+    """Build a realistic mix of supplier-prefixed, generic and unknown SKUs."""
+    rng = random.Random(seed)
+    prefixes = ['GEL_', 'gelato-', 'PFY_', 'printify_', 'PFL-', 'PF_', 'shop-', 'custom_', '']
+    products = ['gildan18000', 'gildan_18500', 'bella-3001', 'comfort_colors_1717',
+                'next_level_3600', 'mug11oz', 'poster-a3', 'tote']
+    colors = ['BLK', 'WHT', 'NVY', 'RED', 'HTHR-GRY']
+    sizes = ['S', 'M', 'L', 'XL', '2XL']
+
+    return [
+        f"{rng.choice(prefixes)}{rng.choice(products)}-{rng.choice(colors)}-{rng.choice(sizes)}-{rng.randrange(10000)}"
+        for _ in range(count)
+    ]
+
+
+def classify_loop(skus):
+    """Reference implementation: one re.search per rule per SKU."""
+    results = []
+    for sku in skus:
+        sku_lower = sku.lower()
+        supplier = label = product_type = None
+        for pattern, rule_supplier, rule_label in SUPPLIER_RULES:
+            if re.search(pattern, sku_lower):
+                supplier, label = rule_supplier, rule_label
+                break
+        for pattern, rule_product_type in PRODUCT_TYPE_RULES:
+            if re.search(pattern, sku_lower):
+                product_type = rule_product_type
+                break
+        results.append((supplier, label, product_type))
+    return results
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    skus = make_skus(count)
+    print(f"Classifying {count:,} SKUs ({len(set(skus)):,} distinct)")
+
+    start = time.perf_counter()
+    expected = classify_loop(skus)
+    loop_time = time.perf_counter() - start
+    print(f"  re.search loop:      {loop_time:7.2f}s  {count / loop_time:12,.0f} SKUs/s")
+
+    start = time.perf_counter()
+    actual = DEFAULT_CLASSIFIER.classify(skus)
+    classifier_time = time.perf_counter() - start
+    print(f"  compiled classifier: {classifier_time:7.2f}s  {count / classifier_time:12,.0f} SKUs/s")
+
+    mismatches = sum(1 for a, b in zip(actual, expected) if tuple(a) != b)
+    print(f"  speedup: {loop_time / classifier_time:.1f}x, mismatches: {mismatches}")
+
+
+if __name__ == '__main__':
+    main()
@@ -19,6 +19,17 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///pod_manager.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Serving: 'sync' workers handle one request at a time, 'gevent' workers
+    # up to SERVER_WORKER_CONNECTIONS, switching while requests wait on I/O
+    SERVER_WORKER_CLASS = os.getenv('SERVER_WORKER_CLASS', 'sync')
+    SERVER_WORKER_CONNECTIONS = int(os.getenv('SERVER_WORKER_CONNECTIONS', 256))
+
+    # Database connections per process; requests hold one while waiting on
+    # suppliers, so gevent workers need a larger pool
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 20 if SERVER_WORKER_CLASS == 'gevent' else 5))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 30 if SERVER_WORKER_CLASS == 'gevent' else 10))
+    DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', 30))
+
     # JWT
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'jwt-secret-key-change-in-production')
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=1)
@@ -67,6 +78,85 @@ class Config:
     RATELIMIT_DEFAULT = "200 per day"
     RATELIMIT_STORAGE_URL = "memory://"
 
+    # Template pricing: cents ending applied to marked-up prices (None = plain rounding)
+    TEMPLATE_PRICE_ENDING = 0.99
+
+    # Number of template previews cached per process
+    TEMPLATE_PREVIEW_CACHE_SIZE = 256
+
+    # Batch template publishing
+    PUBLISH_MAX_WORKERS = int(os.getenv('PUBLISH_MAX_WORKERS', 4))
+    PUBLISH_SHOP_RATE_LIMITS = {  # Listings per second per shop
+        'etsy': 2.0,
+        'shopify': 1.0
+    }
+    # Seconds without progress after which a queued or running job is
+    # failed as interrupted (its worker process died)
+    PUBLISH_JOB_STALE_SECONDS = int(os.getenv('PUBLISH_JOB_STALE_SECONDS', 600))
+
+    # Seconds product type mappings are cached per process
+    PRODUCT_TYPE_CACHE_TTL = 60
+
+    # Seconds supplier price quotes are reused for stored comparisons
+    SUPPLIER_QUOTE_TTL = int(os.getenv('SUPPLIER_QUOTE_TTL', 6 * 3600))
+
+    # Shipping rate tables: refresh age in seconds and destinations loaded up front
+    SHIPPING_RATE_TTL = int(os.getenv('SHIPPING_RATE_TTL', 24 * 3600))
+    SHIPPING_COUNTRIES = ['US', 'CA', 'GB', 'DE', 'FR', 'NL', 'IT', 'ES', 'AU']
+    # Seconds a destination a supplier returned no rate for is not asked again
+    SHIPPING_MISS_TTL = int(os.getenv('SHIPPING_MISS_TTL', 3600))
+
+    # Printify print providers
+    PRINTIFY_PROVIDER_WORKERS = int(os.getenv('PRINTIFY_PROVIDER_WORKERS', 8))
+    PRINTIFY_MAX_HANDLING_DAYS = int(os.getenv('PRINTIFY_MAX_HANDLING_DAYS', 0)) or None  # Shipping SLA
+
+    # Concurrent Printful shipping quote requests
+    PRINTFUL_SHIPPING_WORKERS = int(os.getenv('PRINTFUL_SHIPPING_WORKERS', 8))
+
+    # Supplier API calls: timeouts and total seconds per comparison request
+    SUPPLIER_CONNECT_TIMEOUT = float(os.getenv('SUPPLIER_CONNECT_TIMEOUT', 3.05))
+    SUPPLIER_READ_TIMEOUT = float(os.getenv('SUPPLIER_READ_TIMEOUT', 20))
+    SUPPLIER_REQUEST_DEADLINE = float(os.getenv('SUPPLIER_REQUEST_DEADLINE', 10))
+
+    # Supplier circuit breaker: opens when the error or slow-call rate over
+    # the last calls is reached, then probes again after the open period
+    SUPPLIER_BREAKER_WINDOW = 20
+    SUPPLIER_BREAKER_MIN_CALLS = 10
+    SUPPLIER_BREAKER_ERROR_RATE = 0.5
+    SUPPLIER_SLOW_CALL_SECONDS = 5
+    SUPPLIER_BREAKER_SLOW_RATE = 0.8
+    SUPPLIER_BREAKER_OPEN_SECONDS = 30
+
+    # Identical supplier GETs in flight share one call; workers coalesce
+    # through lock files in the shared directory (unset: per process only).
+    # The directory holds response bodies, so it is created private to the
+    # app's user
+    SUPPLIER_COALESCE_GETS = os.getenv('SUPPLIER_COALESCE_GETS', 'true').lower() == 'true'
+    SUPPLIER_SHARED_DIR = os.getenv('SUPPLIER_SHARED_DIR')
+
+    # Catalog response bodies and ETag/Last-Modified validators for conditional GETs
+    # (unset: supplier-cache in the instance folder). Bodies are trusted on a
+    # 304, so the directory must be private to the app's user
+    SUPPLIER_HTTP_CACHE_DIR = os.getenv('SUPPLIER_HTTP_CACHE_DIR')
+
+    # Seconds before token_expires_at that OAuth access tokens are refreshed
+    TOKEN_REFRESH_MARGIN = int(os.getenv('TOKEN_REFRESH_MARGIN', 300))
+
+    # Async supplier and marketplace clients: pooled connections per process,
+    # calls in flight per API and (calls per second, burst) per API
+    ASYNC_HTTP_MAX_CONNECTIONS = int(os.getenv('ASYNC_HTTP_MAX_CONNECTIONS', 200))
+    ASYNC_HTTP_MAX_IN_FLIGHT = int(os.getenv('ASYNC_HTTP_MAX_IN_FLIGHT', 100))
+    ASYNC_HTTP_RATE_LIMITS = {
+        'printify': (10, 100),
+        'printful': (2, 120),
+        'gelato': (10, 50),
+        'etsy': (10, 10),
+        'shopify': (2, 40)
+    }
+
+    # Seconds compiled user SKU rules are cached per process
+    SKU_RULES_CACHE_TTL = 60
+
 
 class DevelopmentConfig(Config):
     """Development configuration."""
@@ -0,0 +1,40 @@
+"""
+Gunicorn configuration.
+Run: FLASK_ENV=production gunicorn -c gunicorn.conf.py run:app
+
+SERVER_WORKER_CLASS=gevent serves each worker's requests cooperatively:
+while one request waits on a supplier, marketplace or database, the
+worker serves others. Sync workers handle one request at a time.
+"""
+import multiprocessing
+import os
+
+from config import Config
+
+bind = f"0.0.0.0:{os.getenv('PORT', 5000)}"
+worker_class = Config.SERVER_WORKER_CLASS
+
+if worker_class == 'gevent':
+    # One cooperative worker per core keeps every core busy
+    workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+    worker_connections = Config.SERVER_WORKER_CONNECTIONS
+else:
+    workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+
+# Workers import the app after gevent patches the standard library
+preload_app = False
+
+
+def post_fork(server, worker):
+    """Make psycopg2 queries cooperative in gevent workers."""
+    if worker_class != 'gevent':
+        return
+    try:
+        from psycogreen.gevent import patch_psycopg
+    except ImportError:  # SQLite or psycopg without psycogreen: queries block the worker
+        return
+    patch_psycopg()